@@ -99,10 +99,12 @@ def main():
         logger.info("BH POOL Production Server Starting")
         logger.info("Target: pool.blgvbtc.com")
         
+        post_fork = None
         try:
-            # Attempt to load full application
-            from clean_start import app
+            # Attempt to load full application (preloaded once, before workers fork)
+            from clean_start import app, start_background_services
             logger.info("Full mining pool application loaded")
+            post_fork = start_background_services
             
         except Exception as e:
             logger.warning(f"Full app import failed: {e}")
@@ -112,13 +114,9 @@ def main():
         port = int(os.environ.get('PORT', 5000))
         logger.info(f"Server starting on 0.0.0.0:{port}")
         
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=False,
-            threaded=True,
-            use_reloader=False
-        )
+        # Pre-fork production server (SERVER_MODE=development for Flask's dev server)
+        from production_server import run_production_server
+        run_production_server(app, host='0.0.0.0', port=port, post_fork=post_fork)
         
     except Exception as e:
         logger.error(f"Production startup failed: {e}")
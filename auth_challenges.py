@@ -0,0 +1,416 @@
+"""
+BLGV BTC Mining Pool - Authentication Challenge Store
+Exact-key store of QR login challenges with TTL expiry and completion waiters
+
+Challenges are issued by the server (register) and live in an in-memory dict
+expired by a timer wheel on a background thread; polling and completing only
+look them up, so arbitrary strings never take a slot. When all max_entries
+slots are taken, the entry closest to expiry makes room. With
+AUTH_CHALLENGE_STORE=postgres, issued challenges and their completions are
+also written to an auth_challenges table (primary key on the challenge
+string) and completions are broadcast with NOTIFY, so a browser long-polling
+one worker process sees challenges issued and logins completed in another.
+The default (auto) picks postgres whenever the production server will run
+more than one worker; an explicit memory store is refused in that case, since
+the worker that completes a login is rarely the one being polled.
+"""
+
+import os
+import time
+import select
+import logging
+import threading
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'auth_challenge_completed'
+
+
+class ChallengeEntry:
+    """State for one login challenge"""
+
+    __slots__ = ('challenge', 'expires_at', 'result', 'event')
+
+    def __init__(self, challenge: str, expires_at: float):
+        self.challenge = challenge
+        self.expires_at = expires_at
+        self.result: Optional[Dict[str, Any]] = None
+        self.event = threading.Event()
+
+
+class TimerWheel:
+    """Hashed timer wheel: O(1) schedule, expiry work proportional to due keys"""
+
+    def __init__(self, tick: float, slots: int):
+        self.tick = tick
+        self.slots: List[list] = [[] for _ in range(slots)]
+        self.cursor = int(time.monotonic() / tick)
+
+    def schedule(self, key: str, expires_at: float):
+        # Round up so a key is only seen once its deadline has passed; keys further
+        # out than one revolution are re-checked and re-queued by the caller
+        self.slots[(int(expires_at / self.tick) + 1) % len(self.slots)].append(key)
+
+    def advance(self, now: float) -> List[str]:
+        """Return keys from every slot the wheel has passed since the last call"""
+        target = int(now / self.tick)
+        due = []
+        steps = min(target - self.cursor, len(self.slots))
+        for offset in range(1, steps + 1):
+            slot = self.slots[(self.cursor + offset) % len(self.slots)]
+            if slot:
+                due.extend(slot)
+                slot.clear()
+        self.cursor = max(self.cursor, target)
+        return due
+
+
+class PostgresChallengeStore:
+    """Shares completed challenges between worker processes via Postgres"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._installed = False
+
+    def install(self):
+        if self._installed:
+            return
+        from db_pool import get_db_connection
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS auth_challenges (
+                    challenge VARCHAR(256) PRIMARY KEY,
+                    wallet_address VARCHAR(100),
+                    miner_id VARCHAR(64),
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    expires_at TIMESTAMP NOT NULL
+                )
+            """)
+            # Issued challenges have no wallet until they are completed
+            cursor.execute("ALTER TABLE auth_challenges ALTER COLUMN wallet_address DROP NOT NULL, "
+                           "ALTER COLUMN miner_id DROP NOT NULL")
+            cursor.execute("CREATE INDEX IF NOT EXISTS auth_challenges_expires_at ON auth_challenges (expires_at)")
+            conn.commit()
+            cursor.close()
+        self._installed = True
+
+    def issue(self, challenge: str):
+        from db_pool import get_db_connection
+        self.install()
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO auth_challenges (challenge, expires_at)
+                VALUES (%s, NOW() + make_interval(secs => %s))
+                ON CONFLICT (challenge) DO NOTHING
+            """, (challenge, self.ttl))
+            conn.commit()
+            cursor.close()
+
+    def save(self, challenge: str, result: Dict[str, Any]) -> bool:
+        """Complete an issued challenge; False if it was never issued or has expired"""
+        from db_pool import get_db_connection
+        self.install()
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE auth_challenges SET wallet_address = %s, miner_id = %s
+                WHERE challenge = %s AND expires_at > NOW()
+            """, (result['walletAddress'], result['minerId'], challenge))
+            saved = cursor.rowcount > 0
+            if saved:
+                cursor.execute("SELECT pg_notify(%s, %s)", (NOTIFY_CHANNEL, challenge))
+            conn.commit()
+            cursor.close()
+        return saved
+
+    def lookup(self, challenge: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """(issued and unexpired, completion result or None)"""
+        from db_pool import get_db_connection
+        self.install()
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT wallet_address, miner_id FROM auth_challenges
+                WHERE challenge = %s AND expires_at > NOW()
+            """, (challenge,))
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return False, None
+        return True, {'walletAddress': row[0], 'minerId': row[1]} if row[0] else None
+
+    def load(self, challenge: str) -> Optional[Dict[str, Any]]:
+        return self.lookup(challenge)[1]
+
+    def purge_expired(self):
+        from db_pool import get_db_connection
+        self.install()
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM auth_challenges WHERE expires_at <= NOW()")
+            conn.commit()
+            cursor.close()
+
+    def load_completed(self, challenges: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Results of the given challenges that have been completed"""
+        from db_pool import get_db_connection
+        self.install()
+        with get_db_connection('auth_challenges') as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT challenge, wallet_address, miner_id FROM auth_challenges
+                WHERE challenge = ANY(%s) AND wallet_address IS NOT NULL AND expires_at > NOW()
+            """, (challenges,))
+            rows = cursor.fetchall()
+            cursor.close()
+        return {row[0]: {'walletAddress': row[1], 'minerId': row[2]} for row in rows}
+
+    def listen(self, on_complete: Callable[[str], None], stop: threading.Event,
+               on_listening: Optional[Callable[[], None]] = None):
+        """Block on LISTEN, calling on_complete(challenge) for each NOTIFY
+
+        on_listening runs once LISTEN is in place, to catch up on completions
+        made while there was no listener.
+        """
+        import psycopg2
+        self.install()
+        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            if on_listening:
+                on_listening()
+            while not stop.is_set():
+                if select.select([conn], [], [], 5.0)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        on_complete(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+
+class ChallengeRegistry:
+    """Tracks pending challenges; completion wakes every waiting browser request"""
+
+    def __init__(self, ttl: float = 600.0, max_wait: float = 25.0, tick: float = 1.0,
+                 max_entries: int = 100000, store: Optional[PostgresChallengeStore] = None):
+        self.ttl = ttl
+        self.max_wait = max_wait
+        self.tick = tick
+        self.max_entries = max_entries
+        self.store = store
+        self._lock = threading.Lock()
+        self._entries: Dict[str, ChallengeEntry] = {}
+        self._wheel = TimerWheel(tick, int(ttl / tick) + 2)
+        self._stop = threading.Event()
+        self._pid = None
+        self.stats = {'issued': 0, 'evicted': 0, 'unknown_completions': 0}
+
+    def start(self):
+        """Start the expiry thread (and NOTIFY listener) for this process"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        self._stop.clear()
+        threading.Thread(target=self._gc_loop, name='auth-challenge-gc', daemon=True).start()
+        if self.store:
+            threading.Thread(target=self._listen_loop, name='auth-challenge-listener', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _gc_loop(self):
+        next_purge = 0.0
+        while not self._stop.wait(self.tick):
+            now = time.monotonic()
+            expired = 0
+            with self._lock:
+                for key in self._wheel.advance(now):
+                    entry = self._entries.get(key)
+                    if entry is None:
+                        continue
+                    if entry.expires_at <= now:
+                        del self._entries[key]
+                        expired += 1
+                    else:
+                        self._wheel.schedule(key, entry.expires_at)
+            if expired:
+                logger.debug(f"Expired {expired} auth challenges")
+            if self.store and now >= next_purge:
+                next_purge = now + 60.0
+                try:
+                    self.store.purge_expired()
+                except Exception as e:
+                    logger.debug(f"Auth challenge purge failed: {e}")
+
+    def _listen_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.store.listen(self._on_remote_complete, self._stop, self._catch_up)
+            except Exception as e:
+                logger.debug(f"Auth challenge listener reconnecting: {e}")
+                self._stop.wait(5.0)
+
+    def _catch_up(self):
+        with self._lock:
+            pending = [key for key, entry in self._entries.items() if entry.result is None]
+        if not pending:
+            return
+        for challenge, result in self.store.load_completed(pending).items():
+            entry = self._lookup(challenge)
+            if entry is not None and entry.result is None:
+                entry.result = result
+                entry.event.set()
+
+    def _on_remote_complete(self, challenge: str):
+        with self._lock:
+            entry = self._entries.get(challenge)
+        if entry is None or entry.result is not None:
+            return  # nobody here is waiting on it
+        result = self.store.load(challenge)
+        if result:
+            entry.result = result
+            entry.event.set()
+
+    def _lookup(self, challenge: str) -> Optional[ChallengeEntry]:
+        with self._lock:
+            entry = self._entries.get(challenge)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry
+
+    def _insert(self, challenge: str) -> ChallengeEntry:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(challenge)
+            if entry is not None and entry.expires_at > now:
+                return entry
+            self._entries.pop(challenge, None)
+            while len(self._entries) >= self.max_entries:
+                # Every entry has the same ttl, so the oldest one expires soonest
+                del self._entries[next(iter(self._entries))]
+                self.stats['evicted'] += 1
+            entry = ChallengeEntry(challenge, now + self.ttl)
+            self._entries[challenge] = entry
+            self._wheel.schedule(challenge, entry.expires_at)
+            return entry
+
+    def _adopt(self, challenge: str) -> Optional[ChallengeEntry]:
+        """Track a challenge another process issued, if the store knows it
+
+        The one store lookup also picks up a completion that landed before
+        this process had an entry to wake; later ones come by NOTIFY.
+        """
+        if not self.store:
+            return None
+        try:
+            issued, result = self.store.lookup(challenge)
+        except Exception as e:
+            logger.debug(f"Auth challenge lookup failed: {e}")
+            return None
+        if not issued:
+            return None
+        entry = self._insert(challenge)
+        if result and entry.result is None:
+            entry.result = result
+            entry.event.set()
+        return entry
+
+    def register(self, challenge: str) -> None:
+        """Start tracking a challenge issued to a browser"""
+        self._insert(challenge)
+        self.stats['issued'] += 1
+        if self.store:
+            self.store.issue(challenge)
+
+    def complete(self, challenge: str, result: Dict[str, Any]) -> bool:
+        """Record a successful wallet authentication and wake all waiters
+
+        Returns False if the challenge was never issued (or has expired).
+        """
+        entry = self._lookup(challenge)
+        if entry is not None:
+            entry.result = result
+            entry.event.set()
+        saved = False
+        if self.store:
+            try:
+                saved = self.store.save(challenge, result)
+            except Exception as e:
+                logger.error(f"Failed to persist auth challenge: {e}")
+        if entry is None and not saved:
+            self.stats['unknown_completions'] += 1
+            return False
+        return True
+
+    def get_result(self, challenge: str) -> Optional[Dict[str, Any]]:
+        """Non-blocking lookup of a completed challenge"""
+        entry = self._lookup(challenge)
+        return entry.result if entry is not None else None
+
+    def wait(self, challenge: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+        """Block up to timeout (capped at max_wait) for an issued challenge to complete"""
+        self.start()
+        entry = self._lookup(challenge) or self._adopt(challenge)
+        if entry is None:
+            return None  # never issued, or expired
+        # Completions in other processes arrive through the NOTIFY listener
+        timeout = max(0.0, min(timeout, self.max_wait))
+        if timeout and not entry.event.is_set():
+            entry.event.wait(timeout)
+        return entry.result
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'pending': sum(1 for entry in self._entries.values() if entry.result is None),
+                'completed': sum(1 for entry in self._entries.values() if entry.result is not None),
+                'ttl': self.ttl,
+                'backend': 'postgres' if self.store else 'memory'
+            }
+
+
+def store_from_env(ttl: float) -> Optional[PostgresChallengeStore]:
+    """Challenge store for AUTH_CHALLENGE_STORE (auto, memory or postgres)"""
+    from production_server import configured_workers
+    backend = os.environ.get('AUTH_CHALLENGE_STORE', 'auto').lower()
+    workers = configured_workers()
+    if backend == 'auto':
+        backend = 'postgres' if workers > 1 else 'memory'
+    if backend == 'postgres':
+        return PostgresChallengeStore(ttl)
+    if backend != 'memory':
+        raise ValueError(f"Unknown AUTH_CHALLENGE_STORE: {backend}")
+    if workers > 1:
+        raise RuntimeError(f"AUTH_CHALLENGE_STORE=memory cannot share QR logins between {workers} web workers; "
+                           "use postgres or WEB_CONCURRENCY=1")
+    return None
+
+
+_ttl = float(os.environ.get('AUTH_CHALLENGE_TTL', 600))
+
+# Global registry instance
+challenge_registry = ChallengeRegistry(
+    ttl=_ttl,
+    max_wait=float(os.environ.get('AUTH_LONG_POLL_MAX_WAIT', 25)),
+    store=store_from_env(_ttl)
+)
+
+# Convenience functions
+def issue_auth_challenge(challenge: str) -> None:
+    """Start tracking a challenge handed to a browser"""
+    challenge_registry.register(challenge)
+
+def complete_auth_challenge(challenge: str, result: Dict[str, Any]) -> bool:
+    """Mark a challenge authenticated"""
+    return challenge_registry.complete(challenge, result)
+
+def wait_for_auth_challenge(challenge: str, timeout: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Long-poll for a challenge to be authenticated"""
+    return challenge_registry.wait(challenge, timeout)
@@ -0,0 +1,82 @@
+"""
+BLGV BTC Mining Pool - Block Submission Latency Benchmark
+Socket read to submitblock acknowledgement on two fake nodes (Core and Knots)
+
+The fake nodes serve regtest-difficulty templates, so every share a miner
+submits is a block candidate; the remaining shares of the batch are replied to
+only after the submissions are on the wire.
+
+Usage: python benchmarks/bench_block_submit.py [blocks] [template_transactions]
+"""
+
+import os
+import sys
+import json
+import asyncio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_bitcoind import FakeBitcoind
+from src.bitcoin_rpc import BitcoinRPC
+from src.block_submitter import BlockSubmitter
+from src.job_manager import JobManager, address_to_script
+from src.stratum_server import StratumServer
+
+
+async def main():
+    blocks = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    transactions = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    core = FakeBitcoind(port=0, bits='207fffff', transactions=transactions)
+    knots = FakeBitcoind(port=0, bits='207fffff', transactions=transactions, subversion='/Satoshi:27.1.0/Knots/')
+    await core.start()
+    await knots.start()
+    nodes = [BitcoinRPC(core.url, 'core'), BitcoinRPC(knots.url, 'knots')]
+
+    server = StratumServer('127.0.0.1', 0, spool=None)
+    manager = JobManager(server, address_to_script('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'))
+    server.block_submitter = BlockSubmitter(nodes, manager.block_hex)
+    asyncio.ensure_future(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    manager.on_template(await nodes[0].get_block_template())
+    await asyncio.gather(*(node.call('getblockcount') for node in nodes))  # warm the connection pools
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', server._server.sockets[0].getsockname()[1])
+    for request in ({'id': 1, 'method': 'mining.subscribe', 'params': []},
+                    {'id': 2, 'method': 'mining.authorize', 'params': ['bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4']}):
+        writer.write(json.dumps(request).encode() + b'\n')
+    for _ in range(4):  # subscribe and authorize replies, set_difficulty, notify
+        await reader.readline()
+    job_id = server.current_job.job_id
+    ntime = server.current_job.ntime
+    submitter = server.block_submitter
+
+    nonce = 0
+    while submitter.stats['candidates'] < blocks:
+        nonce += 1
+        submit = {'id': nonce, 'method': 'mining.submit', 'params': ['w', job_id, f"{nonce:08x}", ntime, f"{nonce:08x}"]}
+        writer.write(json.dumps(submit).encode() + b'\n')
+        await reader.readline()
+        while len(submitter.recent) < 2 * submitter.stats['candidates']:
+            await asyncio.sleep(0.001)
+
+    stats = submitter.get_stats()
+    latencies = sorted(record['latency_ms'] for record in submitter.recent)
+    encode = sorted(record['encode_ms'] for record in submitter.recent)
+    block_size = len(core.submitted[0]) // 2
+    print(f"{stats['candidates']} candidates, {stats['accepted']} node acceptances, "
+          f"{block_size / 1e6:.2f} MB blocks: socket read to block encoded median {encode[len(encode) // 2]:.2f} ms, "
+          f"to submitblock answered median {latencies[len(latencies) // 2]:.2f} ms, "
+          f"p90 {latencies[int(len(latencies) * 0.9)]:.2f} ms")
+    writer.close()
+    await server.stop()
+    for node in nodes:
+        await node.close()
+    await asyncio.sleep(0.05)
+    await core.stop()
+    await knots.stop()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
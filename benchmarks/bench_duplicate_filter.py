@@ -0,0 +1,49 @@
+"""
+BLGV BTC Mining Pool - Duplicate Filter Benchmark
+Memory per million tracked shares and insert rate, exact vs bloom mode
+
+Usage: python benchmarks/bench_duplicate_filter.py [shares] [connections]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.duplicate_filter import DuplicateFilter
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    connections = int(sys.argv[2]) if len(sys.argv) > 2 else 50000
+    ntime = f"{int(time.time()):08x}"
+    # Shares spread over `connections` extranonce1 values, all on one job
+    submissions = [(f"{i % connections:08x}", f"{i // connections:08x}", ntime, os.urandom(4).hex(),
+                    0x20000000 | (i & 0xffff) << 13) for i in range(count)]
+
+    for mode in ('exact', 'bloom'):
+        duplicate_filter = DuplicateFilter(mode=mode, bloom_capacity=count)
+        start = time.perf_counter()
+        for en1, en2, ntime, nonce, version in submissions:
+            duplicate_filter.add('job', en1, en2, ntime, nonce, version)
+        elapsed = time.perf_counter() - start
+
+        # Second pass under tracemalloc (which slows allocation down) for the memory figure
+        tracemalloc.start()
+        duplicate_filter = DuplicateFilter(mode=mode, bloom_capacity=count)
+        for en1, en2, ntime, nonce, version in submissions:
+            duplicate_filter.add('job', en1, en2, ntime, nonce, version)
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        repeats = sum(not duplicate_filter.add('job', *submission) for submission in submissions[:10000])
+        per_million = current / count * 1000000
+        print(f"{mode}: {per_million / 2 ** 20:,.1f} MiB per million shares, "
+              f"{count / elapsed:,.0f} inserts/sec, {duplicate_filter.duplicates - repeats} false duplicates, "
+              f"{repeats}/10000 resubmissions caught")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+BLGV BTC Mining Pool - Job Fan-out Benchmark
+Template-to-job build time and clean_jobs broadcast latency at 10k/50k miners
+
+Connections up to the open-file limit are real socketpairs attached to the
+event loop (each write is a send() into the kernel buffer); counts above it use
+in-memory transports, which measures the Python side of the fan-out only.
+
+Usage: python benchmarks/bench_job_fanout.py [connections ...]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import resource
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.stratum_server import StratumServer, StratumConnection
+from src.job_manager import JobManager, address_to_script
+
+
+class MemoryTransport(asyncio.Transport):
+    def __init__(self):
+        super().__init__()
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+
+    def close(self):
+        pass
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def is_closing(self):
+        return False
+
+    def get_extra_info(self, name, default=None):
+        return default
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+
+def make_template(transactions: int):
+    txs = [{'data': os.urandom(250).hex(), 'txid': os.urandom(32).hex()} for _ in range(transactions)]
+    return {
+        'height': 900000, 'previousblockhash': os.urandom(32).hex(), 'version': 0x20000000,
+        'bits': '17034219', 'curtime': int(time.time()), 'mintime': 0, 'coinbasevalue': 312500000,
+        'transactions': txs, 'default_witness_commitment': '6a24aa21a9ed' + os.urandom(32).hex()
+    }
+
+
+async def attach(server: StratumServer, count: int, use_sockets: bool):
+    loop = asyncio.get_running_loop()
+    peers = []
+    for _ in range(count):
+        if use_sockets:
+            ours, theirs = socket.socketpair()
+            peers.append(theirs)
+            _, conn = await loop.connect_accepted_socket(lambda: StratumConnection(server), ours)
+        else:
+            conn = StratumConnection(server)
+            conn.connection_made(MemoryTransport())
+        conn.subscribed = conn.authorized = True
+    return peers
+
+
+async def run(count: int, socket_budget: int):
+    server = StratumServer('127.0.0.1', 0)
+    manager = JobManager(server, address_to_script('bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4'))
+    manager.on_template(make_template(3000))
+    use_sockets = count <= socket_budget
+    peers = await attach(server, count, use_sockets)
+
+    template = make_template(3000)
+    start = time.perf_counter()
+    job = manager.on_template(template)  # new prevhash: clean_jobs broadcast
+    build_ms = manager.stats['last_build_ms']
+    shared = time.perf_counter() - start - build_ms / 1000
+
+    # Baseline: serialize the notify per connection, as a per-session implementation would
+    params = [job.job_id, job.prevhash, job.coinb1, job.coinb2, job.merkle_branch, job.version,
+              job.nbits, job.ntime, True]
+    start = time.perf_counter()
+    for conn in tuple(server.connections):
+        conn.write(json.dumps({'id': None, 'method': 'mining.notify', 'params': params}).encode() + b'\n')
+    naive = time.perf_counter() - start
+
+    print(f"{count:>6} connections ({'sockets' if use_sockets else 'in-memory'}): template build {build_ms:.1f} ms, "
+          f"clean_jobs fan-out {shared * 1000:.1f} ms shared bytes vs {naive * 1000:.1f} ms per-connection JSON "
+          f"({len(job.notify_line())} byte notify, {count / shared:,.0f} miners/sec)")
+
+    for conn in tuple(server.connections):
+        conn.transport.close()
+    for peer in peers:
+        peer.close()
+    await asyncio.sleep(0)
+
+
+def main():
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 50000]
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    socket_budget = (hard - 256) // 2
+    for count in counts:
+        asyncio.run(run(count, socket_budget))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+BLGV BTC Mining Pool - SV2 Noise Handshake Benchmark
+Responder CPU per handshake, then a connection storm against a NoiseServer
+
+The first part times respond() on its own, with the ephemeral key taken from
+a filled EphemeralKeyPool and with one generated inline, which is what a
+handshake costs when the pool runs dry, and then the rate a thread pool the
+size of the server's handshake pool sustains (the curve work releases the
+GIL, so this grows with cores). The storm starts a NoiseServer in
+this process and client processes that open connections at a fixed total
+rate (5000/s by default), run the initiator side of the handshake, check the
+pool certificate and hang up. It reports the rate the server kept up with,
+handshake latency percentiles and how many handshakes missed the key pool.
+The server runs respond() on handshake_threads threads (default: one per
+core, none on a single core; 0 runs it on the event loop).
+
+Run the clients on other cores than the server: each initiator does more
+curve work than the responder.
+
+Usage: python benchmarks/bench_noise_handshake.py [rate] [seconds] [client processes] [handshake threads]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.noise import NOISE_AVAILABLE, RESPONDER_MESSAGE_SIZE, EphemeralKeyPool, NoiseError, NoiseInitiator, \
+    NoiseServer, ServerKeys, ellswift_create, respond
+
+
+def time_respond(keys: ServerKeys, count: int):
+    pool = EphemeralKeyPool(count)
+    pool.start()
+    while len(pool._keys) < count:
+        time.sleep(0.05)
+    messages = [NoiseInitiator(keys.authority_public).start() for _ in range(count)]
+    start = time.perf_counter()
+    for message in messages:
+        respond(keys, pool.take(), message)
+    pooled = (time.perf_counter() - start) / count
+    start = time.perf_counter()
+    for message in messages:
+        respond(keys, ellswift_create(), message)
+    inline = (time.perf_counter() - start) / count
+    return pooled, inline
+
+
+def threaded_rate(keys: ServerKeys, count: int, threads: int) -> float:
+    ephemerals = [ellswift_create() for _ in range(count)]
+    messages = [NoiseInitiator(keys.authority_public).start() for _ in range(count)]
+    with ThreadPoolExecutor(threads) as executor:
+        start = time.perf_counter()
+        for _ in executor.map(respond, [keys] * count, ephemerals, messages, chunksize=64):
+            pass
+        return count / (time.perf_counter() - start)
+
+
+async def _storm(port: int, authority_public: bytes, rate: float, seconds: float, results):
+    latencies = []
+    failures = 0
+
+    async def handshake():
+        nonlocal failures
+        initiator = NoiseInitiator(authority_public)
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(initiator.start())
+            initiator.finish(await reader.readexactly(RESPONDER_MESSAGE_SIZE))
+            latencies.append(time.perf_counter() - started)
+            writer.close()
+        except (OSError, asyncio.IncompleteReadError, NoiseError):
+            failures += 1
+
+    tasks = []
+    total = int(rate * seconds)
+    start = time.perf_counter()
+    for i in range(total):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.ensure_future(handshake()))
+    await asyncio.gather(*tasks)
+    results.put((latencies, failures, time.perf_counter() - start))
+
+
+def run_clients(port: int, authority_public: bytes, rate: float, seconds: float, results):
+    asyncio.run(_storm(port, authority_public, rate, seconds, results))
+
+
+async def storm(keys: ServerKeys, rate: float, seconds: float, processes: int, threads: Optional[int]):
+    server = NoiseServer(keys, '127.0.0.1', 0, key_pool_size=int(rate * 2), handshake_threads=threads)
+    serving = asyncio.ensure_future(server.start())
+    while server._server is None:
+        await asyncio.sleep(0.01)
+    port = server._server.sockets[0].getsockname()[1]
+    while len(server.ephemeral_keys._keys) < server.ephemeral_keys.size:
+        await asyncio.sleep(0.05)
+
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    clients = [context.Process(target=run_clients, args=(port, keys.authority_public, rate / processes, seconds,
+                                                         results)) for _ in range(processes)]
+    for client in clients:
+        client.start()
+    loop = asyncio.get_running_loop()
+    outcomes = [await loop.run_in_executor(None, results.get) for _ in clients]
+    for client in clients:
+        client.join()
+    serving.cancel()
+    await server.stop()
+
+    latencies = sorted(latency for outcome in outcomes for latency in outcome[0])
+    failures = sum(outcome[1] for outcome in outcomes)
+    elapsed = max(outcome[2] for outcome in outcomes)
+    stats = server.get_stats()
+    print(f"Storm at {rate:.0f}/s for {seconds:.0f}s from {processes} client processes, "
+          f"{server.handshake_threads} handshake threads:")
+    print(f"  completed {len(latencies)} ({len(latencies) / elapsed:.0f}/s), failed {failures}")
+    if latencies:
+        print(f"  latency p50 {latencies[len(latencies) // 2] * 1e3:.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99)] * 1e3:.2f} ms")
+    print(f"  server: {stats['handshake_us_mean'] or 0:.0f} us from handshake message to reply, "
+          f"ephemeral key pool misses {stats['ephemeral_keys']['misses']}")
+
+
+def main():
+    if not NOISE_AVAILABLE:
+        sys.exit('coincurve (with ellswift) and cryptography are required')
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else max(1, (os.cpu_count() or 2) - 1)
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    keys = ServerKeys(os.urandom(32))
+
+    pooled, inline = time_respond(keys, 5000)
+    print(f"respond(): {pooled * 1e6:.0f} us with a pooled ephemeral key ({1 / pooled:.0f}/s per core), "
+          f"{inline * 1e6:.0f} us generating it inline")
+    pool_threads = threads if threads is not None else os.cpu_count() or 1
+    if pool_threads > 0:
+        rate_threaded = threaded_rate(keys, 5000, pool_threads)
+        print(f"respond() on {pool_threads} thread{'s' if pool_threads != 1 else ''}: {rate_threaded:.0f}/s")
+    asyncio.run(storm(keys, rate, seconds, processes, threads))
+
+
+if __name__ == '__main__':
+    main()
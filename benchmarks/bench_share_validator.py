@@ -0,0 +1,80 @@
+"""
+BLGV BTC Mining Pool - Share Validation Benchmark
+Shares/sec on one core: naive per-share hashing vs ShareValidator batches
+
+Usage: python benchmarks/bench_share_validator.py [shares] [batch_size]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.stratum_server import StratumJob
+from src.share_validator import ShareValidator, sha256d, stratum_prevhash_to_header, target_from_nbits, \
+    difficulty_to_target
+
+
+def make_job() -> StratumJob:
+    # Realistic sizes: ~110 byte coinbase halves, 12-level merkle branch (~4000 tx block)
+    return StratumJob(
+        'bench', os.urandom(32).hex(), os.urandom(60).hex(), os.urandom(50).hex(),
+        [os.urandom(32).hex() for _ in range(12)], '20000000', '17034219', f"{int(time.time()):08x}"
+    )
+
+
+def naive_validate(job: StratumJob, extranonce1, extranonce2, ntime, nonce, version_bits, mask, target):
+    """Straightforward implementation: decode and hash everything per share"""
+    coinbase = bytes.fromhex(job.coinb1 + extranonce1 + extranonce2 + job.coinb2)
+    root = sha256d(coinbase)
+    for branch_hash in job.merkle_branch:
+        root = sha256d(root + bytes.fromhex(branch_hash))
+    version = (int(job.version, 16) & ~mask) | (int(version_bits, 16) & mask)
+    header = (version.to_bytes(4, 'little') + stratum_prevhash_to_header(job.prevhash) + root +
+              bytes.fromhex(ntime)[::-1] + bytes.fromhex(job.nbits)[::-1] + bytes.fromhex(nonce)[::-1])
+    value = int.from_bytes(sha256d(header), 'little')
+    return value <= target, value <= target_from_nbits(job.nbits)
+
+
+def make_submissions(count: int, rolls_per_extranonce2: int):
+    ntime = f"{int(time.time()):08x}"
+    submissions = []
+    for i in range(count):
+        extranonce2 = f"{i // rolls_per_extranonce2:08x}"
+        version_bits = f"{(i % 0x10000) << 13 & 0x1fffe000:08x}"
+        submissions.append(('0badf00d', extranonce2, ntime, os.urandom(4).hex(), version_bits))
+    return submissions
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 256
+    job = make_job()
+    mask = 0x1fffe000
+    target = difficulty_to_target(1024)
+
+    for label, rolls in (('unique extranonce2', 1), ('8 rolls per extranonce2', 8)):
+        submissions = make_submissions(count, rolls)
+
+        start = time.perf_counter()
+        for en1, en2, ntime, nonce, vbits in submissions:
+            naive_validate(job, en1, en2, ntime, nonce, vbits, mask, target)
+        naive_rate = count / (time.perf_counter() - start)
+
+        validator = ShareValidator()
+        prepared = validator.prepare(job)
+        batch = [(prepared, en1, en2, ntime, nonce, vbits, mask, target)
+                 for en1, en2, ntime, nonce, vbits in submissions]
+        start = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            validator.validate_batch(batch[offset:offset + batch_size])
+        batched_rate = count / (time.perf_counter() - start)
+
+        print(f"{label}: naive {naive_rate:,.0f} shares/sec, "
+              f"validator {batched_rate:,.0f} shares/sec ({batched_rate / naive_rate:.1f}x), "
+              f"midstate cache hits {validator.cache_hits:,}")
+
+
+if __name__ == '__main__':
+    main()
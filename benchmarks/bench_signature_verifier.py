@@ -0,0 +1,58 @@
+"""
+BLGV BTC Mining Pool - Signature Verification Benchmark
+Verifications per second through SignatureVerifier at 1/4/8 worker processes
+
+Usage: python benchmarks/bench_signature_verifier.py [signatures] [client_threads]
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitcoin.wallet import CBitcoinSecret, P2PKHBitcoinAddress
+from bitcoin.signmessage import BitcoinMessage, SignMessage
+
+from signature_verifier import SignatureVerifier
+
+
+def make_signatures(count: int):
+    """Unique signed login messages so the LRU cache never hits"""
+    key = CBitcoinSecret.from_secret_bytes(os.urandom(32))
+    address = str(P2PKHBitcoinAddress.from_pubkey(key.pub))
+    signed = []
+    for i in range(count):
+        message = f"BLGV Mining Pool Authentication\nChallenge: bench_{i}\nTimestamp: {int(time.time() * 1000)}"
+        signed.append((address, message, SignMessage(key, BitcoinMessage(message)).decode()))
+    return signed
+
+
+def run(verifier: SignatureVerifier, signed, client_threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(client_threads) as clients:
+        results = list(clients.map(lambda args: verifier.verify(*args), signed))
+    elapsed = time.perf_counter() - start
+    assert all(results), "benchmark signature failed to verify"
+    return len(signed) / elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    client_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    signed = make_signatures(count)
+    print(f"{count} signatures, {client_threads} client threads")
+
+    for workers in (1, 4, 8):
+        verifier = SignatureVerifier(workers=workers, max_pending=client_threads, cache_size=count)
+        verifier.warm_up()
+        time.sleep(1.0)
+        rate = run(verifier, signed, client_threads)
+        cached = run(verifier, signed, client_threads)
+        verifier.shutdown()
+        print(f"workers={workers}: {rate:,.0f} verifications/sec, {cached:,.0f}/sec cached")
+
+
+if __name__ == '__main__':
+    main()
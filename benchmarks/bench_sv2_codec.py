@@ -0,0 +1,118 @@
+"""
+BLGV BTC Mining Pool - SV2 Codec Benchmark
+Bytes on the wire and CPU per share: Stratum V1 JSON lines vs SV2 binary frames
+
+Both sides parse the same number of submissions out of 64 KiB reads, the way
+the servers receive them: V1 splits lines and json.loads each one (fields
+converted to integers, as validation needs them), SV2 decodes
+SubmitSharesStandard frames in place with FrameReader. Replies are one
+accept per share on both sides; SV2 can also acknowledge a whole run of shares
+with one SubmitShares.Success, shown separately.
+
+Usage: python benchmarks/bench_sv2_codec.py [shares]
+"""
+
+import os
+import sys
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.stratum_server import StratumJob, encode_line
+from src.sv2 import FrameReader, NewMiningJob, SetNewPrevHash, SubmitSharesStandard, SubmitSharesSuccess, \
+    decode_message
+
+READ_SIZE = 65536
+WORKER = 'bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4.bitaxe-07'
+
+
+def v1_stream(count: int) -> bytes:
+    ntime = f"{int(time.time()):08x}"
+    return b''.join(encode_line({
+        'id': i, 'method': 'mining.submit',
+        'params': [WORKER, '1a2b', f"{i:08x}", ntime, os.urandom(4).hex(), f"{(i << 13) & 0x1fffe000:08x}"]
+    }) for i in range(count))
+
+
+def sv2_stream(count: int) -> bytes:
+    ntime = int(time.time())
+    return b''.join(SubmitSharesStandard(1, i, 6699, int.from_bytes(os.urandom(4), 'little'), ntime,
+                                         0x20000000 | (i << 13) & 0x1fffe000).encode() for i in range(count))
+
+
+def parse_v1(stream: bytes) -> int:
+    """StratumConnection.data_received and queue_submit, minus validation"""
+    parsed = 0
+    buffer = bytearray()
+    for offset in range(0, len(stream), READ_SIZE):
+        buffer += stream[offset:offset + READ_SIZE]
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            request = json.loads(bytes(buffer[start:end]).strip())
+            start = end + 1
+            worker, job_id, extranonce2, ntime, nonce, version_bits = (str(p) for p in request['params'][:6])
+            int(extranonce2, 16), int(ntime, 16), int(nonce, 16), int(version_bits, 16)
+            parsed += 1
+        del buffer[:start]
+    return parsed
+
+
+def parse_sv2(stream: bytes) -> int:
+    """FrameReader as driven by BufferedProtocol.get_buffer / buffer_updated"""
+    parsed = 0
+    reader = FrameReader(READ_SIZE)
+    view = memoryview(stream)
+    offset = 0
+    while offset < len(stream):
+        target = reader.get_buffer()
+        nbytes = min(len(target), len(stream) - offset)
+        target[:nbytes] = view[offset:offset + nbytes]  # the kernel's recv_into
+        offset += nbytes
+        for extension, msg_type, payload in reader.frames(nbytes):
+            share = decode_message(msg_type, payload)
+            share.job_id, share.nonce, share.ntime, share.version
+            parsed += 1
+    return parsed
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    v1, sv2 = v1_stream(count), sv2_stream(count)
+    assert parse_v1(v1) == parse_sv2(sv2) == count
+
+    v1_reply = encode_line({'id': count, 'result': True, 'error': None})
+    sv2_reply = SubmitSharesSuccess(1, count, 1, 1024).encode()
+    v1_in = min(timed(parse_v1, v1) for _ in range(3))
+    sv2_in = min(timed(parse_sv2, sv2) for _ in range(3))
+    v1_out = min(timed(lambda: [encode_line({'id': i, 'result': True, 'error': None}) for i in range(count)])
+                 for _ in range(3))
+    sv2_out = min(timed(lambda: [SubmitSharesSuccess(1, i, 1, 1024).encode() for i in range(count)])
+                  for _ in range(3))
+
+    print(f"{count} shares, per share:")
+    print(f"  V1 JSON    {len(v1) / count:6.1f} B up + {len(v1_reply):3d} B reply, "
+          f"parse {v1_in / count * 1e6:.2f} us, reply {v1_out / count * 1e6:.2f} us")
+    print(f"  SV2 binary {len(sv2) / count:6.1f} B up + {len(sv2_reply):3d} B reply, "
+          f"parse {sv2_in / count * 1e6:.2f} us, reply {sv2_out / count * 1e6:.2f} us")
+    print(f"  SV2 with one SubmitShares.Success per 10 shares: {len(sv2) / count + len(sv2_reply) / 10:.1f} B/share")
+
+    job = StratumJob('1a2b', os.urandom(32).hex(), os.urandom(60).hex(), os.urandom(50).hex(),
+                     [os.urandom(32).hex() for _ in range(12)], '20000000', '17034219', f"{int(time.time()):08x}", True)
+    new_job = NewMiningJob(1, 6699, None, 0x20000000, os.urandom(32)).encode()
+    prev_hash = SetNewPrevHash(1, 6699, os.urandom(32), int(time.time()), 0x17034219).encode()
+    print(f"Job per miner: V1 mining.notify {len(job.notify_line())} B, SV2 NewMiningJob {len(new_job)} B "
+          f"(+ SetNewPrevHash {len(prev_hash)} B on a new block)")
+
+
+if __name__ == '__main__':
+    main()
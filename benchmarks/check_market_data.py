@@ -0,0 +1,132 @@
+"""
+BLGV BTC Mining Pool - Market Data Check
+Runs the market data refresher against a local HTTP stub instead of the real APIs
+
+Checks that a refresh picks up the stub's price and height, that both values are
+marked stale once the stub starts failing for longer than stale_after, and that
+the jittered retry delay stays within its bounds while its ceiling grows.
+
+Usage: python benchmarks/check_market_data.py
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from market_data import MarketDataRefresher
+
+
+class StubState:
+    price = '65000.12'
+    height = 850000
+    failing = False
+    requests = 0
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        StubState.requests += 1
+        if StubState.failing:
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.path.startswith('/price'):
+            body = json.dumps({'data': {'currency': 'BTC', 'rates': {'USD': StubState.price}}}).encode()
+            content_type = 'application/json'
+        else:
+            body = str(StubState.height).encode()
+            content_type = 'text/plain'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def check(label: str, ok: bool):
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    refresher = MarketDataRefresher(refresh_interval=0.2, stale_after=0.5, request_timeout=1.0, max_backoff=0.4,
+                                    price_url=f"{base}/price", block_height_url=f"{base}/height")
+    try:
+        # Refresh: the first snapshot starts the thread, later ones see the stub's values
+        refresher.get_snapshot()
+        check("refresh picks up stub values", wait_for(
+            lambda: refresher.get_snapshot()['btc_price'] == 65000.12
+            and refresher.get_snapshot()['block_height'] == 850000))
+        snapshot = refresher.get_snapshot()
+        check("fresh values are not stale", not snapshot['btc_price_stale'] and not snapshot['block_height_stale'])
+
+        StubState.height = 850001
+        check("periodic refresh follows upstream", wait_for(lambda: refresher.get_snapshot()['block_height'] == 850001))
+
+        # Stale marker: last good values are kept, flagged once older than stale_after
+        StubState.failing = True
+        check("failures are counted", wait_for(lambda: refresher.sources['btc_price'].failures >= 2))
+        check("values go stale after upstream failures", wait_for(
+            lambda: refresher.get_snapshot()['btc_price_stale'] and refresher.get_snapshot()['block_height_stale']))
+        snapshot = refresher.get_snapshot()
+        check("last good values are kept", snapshot['btc_price'] == 65000.12 and snapshot['block_height'] == 850001)
+        check("last error is recorded", '500' in (refresher.sources['btc_price'].last_error or ''))
+
+        StubState.failing = False
+        check("recovery clears the stale marker", wait_for(lambda: not refresher.get_snapshot()['btc_price_stale']))
+        check("recovery resets the failure count", refresher.sources['btc_price'].failures == 0)
+    finally:
+        refresher.stop()
+
+    # Backoff: every delay within [interval/2, min(max_backoff, interval * 2^n)], ceiling growing with n
+    backoff = MarketDataRefresher(refresh_interval=30.0, max_backoff=300.0,
+                                  price_url=f"{base}/price", block_height_url=f"{base}/height")
+    source = backoff.sources['btc_price']
+    StubState.failing = True
+    previous_ceiling = previous_peak = 0.0
+    for failures in range(1, 6):
+        ceiling = min(backoff.max_backoff, backoff.refresh_interval * 2 ** failures)
+        delays = []
+        for _ in range(200):
+            source.failures = failures - 1
+            before = time.monotonic()
+            backoff.refresh_source(source)
+            delays.append(source.next_fetch - before)
+        low, peak = min(delays), max(delays)
+        print(f"     failures={failures} delay {low:6.1f}s .. {peak:6.1f}s (bound {ceiling:.0f}s)")
+        check(f"delays within bounds after {failures} failures",
+              low >= backoff.refresh_interval / 2 and peak <= ceiling + 0.1)
+        check(f"delays are jittered after {failures} failures", peak - low > 1.0)
+        if ceiling > previous_ceiling:
+            check(f"delay ceiling grows after {failures} failures", peak > previous_peak)
+        previous_ceiling, previous_peak = ceiling, peak
+    check("delay is capped at max_backoff", previous_peak <= backoff.max_backoff + 0.1)
+
+    server.shutdown()
+    print(f"all checks passed ({StubState.requests} stub requests)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+"""
+BLGV BTC Mining Pool - Fake bitcoind
+Minimal JSON-RPC node stub for running the pool and benchmarks without a node
+
+Serves getblocktemplate (with long polling), submitblock, getbestblockhash,
+getblockcount, getblockchaininfo, getnetworkinfo and getmininginfo over
+keep-alive HTTP/1.1, including JSON-RPC batches. Templates carry random
+transactions, so anything built from them is structurally valid but will never
+be a real block. new_block() advances the tip and wakes long polls.
+
+Usage: python benchmarks/fake_bitcoind.py [port] [block_interval_seconds] [user:password]
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FakeBitcoind:
+    """In-process stand-in for bitcoind's RPC server"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 18443, user: str = 'pool', password: str = 'pool',
+                 transactions: int = 200, subversion: str = '/Satoshi:27.0.0/', submit_delay: float = 0.0,
+                 bits: str = '17034219'):
+        self.host = host
+        self.port = port
+        self.auth = 'Basic ' + base64.b64encode(f"{user}:{password}".encode()).decode()
+        self.transactions = transactions
+        self.subversion = subversion
+        self.submit_delay = submit_delay
+        self.bits = bits  # '207fffff' (regtest) makes nearly every share a block
+        self.height = 900000
+        self.tip = os.urandom(32).hex()
+        self.mempool_updates = 0
+        self.submitted: List[str] = []
+        self.calls = 0
+        self._changed: Optional[asyncio.Event] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        self._changed = asyncio.Event()
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    @property
+    def url(self) -> str:
+        return f"http://pool:pool@{self.host}:{self.port}/"
+
+    def new_block(self):
+        self.height += 1
+        self.tip = os.urandom(32).hex()
+        self._wake()
+
+    def mempool_changed(self):
+        self.mempool_updates += 1
+        self._wake()
+
+    def _wake(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    # -- RPC methods
+
+    def template(self) -> Dict[str, Any]:
+        txs = [{'data': os.urandom(220).hex(), 'txid': os.urandom(32).hex(), 'fee': 2000}
+               for _ in range(self.transactions)]
+        now = int(time.time())
+        return {
+            'version': 0x20000000, 'rules': ['csv', '!segwit', 'taproot'], 'previousblockhash': self.tip,
+            'transactions': txs, 'coinbasevalue': 312500000 + 2000 * len(txs),
+            'longpollid': f"{self.tip}{self.mempool_updates}", 'target': '00' * 4 + 'ff' * 28,
+            'mintime': now - 3600, 'curtime': now, 'bits': self.bits, 'height': self.height + 1,
+            'default_witness_commitment': '6a24aa21a9ed' + os.urandom(32).hex()
+        }
+
+    async def dispatch(self, method: str, params: list) -> Any:
+        if method == 'getblocktemplate':
+            longpollid = params[0].get('longpollid') if params else None
+            if longpollid == f"{self.tip}{self.mempool_updates}":
+                try:
+                    await asyncio.wait_for(self._changed.wait(), 60)
+                except asyncio.TimeoutError:
+                    pass
+            return self.template()
+        if method == 'submitblock':
+            if self.submit_delay:
+                await asyncio.sleep(self.submit_delay)
+            self.submitted.append(params[0])
+            return None
+        if method == 'getbestblockhash':
+            return self.tip
+        if method == 'getblockcount':
+            return self.height
+        if method == 'getblockchaininfo':
+            return {'chain': 'main', 'blocks': self.height, 'headers': self.height, 'bestblockhash': self.tip,
+                    'initialblockdownload': False, 'verificationprogress': 1.0}
+        if method == 'getnetworkinfo':
+            return {'version': 270000, 'subversion': self.subversion, 'connections': 10}
+        if method == 'getmininginfo':
+            return {'blocks': self.height, 'difficulty': 1.2e14, 'networkhashps': 8.5e20, 'chain': 'main'}
+        raise LookupError(method)
+
+    async def _reply(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        self.calls += 1
+        try:
+            result = await self.dispatch(request.get('method'), request.get('params') or [])
+            return {'result': result, 'error': None, 'id': request.get('id')}
+        except LookupError:
+            return {'result': None, 'error': {'code': -32601, 'message': 'Method not found'}, 'id': request.get('id')}
+
+    # -- HTTP
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if headers.get('authorization') != self.auth:
+                    status, payload = 401, b''
+                else:
+                    request = json.loads(body)
+                    if isinstance(request, list):
+                        response = await asyncio.gather(*(self._reply(item) for item in request))
+                    else:
+                        response = await self._reply(request)
+                    status = 500 if not isinstance(request, list) and response['error'] else 200
+                    payload = json.dumps(response).encode() + b'\n'
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode()
+                             + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def main():
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 18443
+    block_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 600.0
+    user, _, password = (sys.argv[3] if len(sys.argv) > 3 else 'pool:pool').partition(':')
+    node = FakeBitcoind(port=port, user=user, password=password)
+    await node.start()
+    logger.info(f"Fake bitcoind on {node.host}:{node.port}, a block every {block_interval}s")
+    while True:
+        await asyncio.sleep(block_interval)
+        node.new_block()
+        logger.info(f"New tip at height {node.height}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -13,13 +13,22 @@ import uuid
 import time
 import hashlib
 import base64
-from datetime import datetime
+import secrets
+from datetime import datetime, timedelta
 from typing import Dict, Optional
 from flask import Flask, request, jsonify, Response, render_template_string
 
 # Import database and test mode configuration
-import psycopg2
 import jwt
+from db_pool import get_db_connection, get_pool_stats
+from miner_aggregate import get_online_miner_split, combine_online_split
+from market_data import market_data, get_market_snapshot
+from pps_balances import pps_balance_cache, get_pending_balance
+from stats_cache import SnapshotCache
+from realtime import realtime_hub, start_realtime_hub
+from auth_challenges import challenge_registry, issue_auth_challenge, complete_auth_challenge, wait_for_auth_challenge
+from signature_verifier import (signature_verifier, verify_signature, VerifierBusyError, VerificationTimeoutError,
+                                UnsupportedAddressError)
 from test_mode_config import (
     is_test_mode, should_show_fake_assets, get_test_session_id, 
     get_fake_mining_data, add_test_mode_fields, filter_test_data
@@ -2580,9 +2589,13 @@ ordinals_mining: ${ordinals}
             console.log('🔄 Generating DEX-style authentication QR code...');
             
             try {
-                // Generate challenge for mining pool
-                const timestamp = Date.now();
-                const challenge = `BLGV-MINING-AUTH-${timestamp}-${Math.random().toString(36).substr(2, 15)}`;
+                // Ask the pool for a challenge (only issued challenges can be polled)
+                const issued = await fetch('/api/auth/challenge', { method: 'POST' }).then(r => r.json());
+                if (!issued.challenge) {
+                    throw new Error(issued.error || 'No challenge issued');
+                }
+                const timestamp = issued.timestamp;
+                const challenge = issued.challenge;
                 
                 // Store challenge globally for polling
                 window.currentAuthChallenge = {
@@ -2683,9 +2696,14 @@ ordinals_mining: ${ordinals}
         }
         
         // Generate Manual Authentication Challenge
-        function generateAuthenticationChallenge() {
-            const challenge = 'blgv_mining_' + Math.random().toString(36).substring(2, 15);
-            const timestamp = Date.now();
+        async function generateAuthenticationChallenge() {
+            const issued = await fetch('/api/auth/challenge', { method: 'POST' }).then(r => r.json());
+            if (!issued.challenge) {
+                showToast(issued.error || 'Could not create a challenge', 'error');
+                return;
+            }
+            const challenge = issued.challenge;
+            const timestamp = issued.timestamp;
             
             document.getElementById('challenge-text').textContent = challenge;
             document.getElementById('timestamp-text').textContent = new Date(timestamp).toISOString();
@@ -3494,46 +3512,46 @@ ordinals_mining: ${ordinals}
                 }
             }
             
-            // Fallback polling method
+            // Fallback long-poll method: the server holds each request until auth completes
             function startPollingAuth() {
                 if (!isMonitoring || pollInterval) return;
                 
-                console.log('🔄 Starting authentication polling...');
+                console.log('🔄 Starting authentication long-poll...');
+                pollInterval = true;
                 
-                pollInterval = setInterval(async () => {
-                    if (!isMonitoring) {
-                        clearInterval(pollInterval);
-                        return;
-                    }
-                    
-                    try {
-                        const response = await fetch(`/api/auth/check-status?challenge=${encodeURIComponent(challenge)}`);
-                        
-                        if (response.ok) {
-                            const data = await response.json();
-                            console.log('📊 Polling auth status:', data);
+                // Stop waiting after 5 minutes (QR code expires)
+                const deadline = Date.now() + 300000;
+                const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+                
+                (async () => {
+                    while (isMonitoring && Date.now() < deadline) {
+                        try {
+                            const response = await fetch(`/api/auth/check-status?challenge=${encodeURIComponent(challenge)}&wait=25`);
                             
-                            if (data.authenticated) {
-                                isMonitoring = false;
-                                clearInterval(pollInterval);
-                                updateAuthStatus('connected', data.walletAddress);
+                            if (response.ok) {
+                                const data = await response.json();
+                                console.log('📊 Auth status:', data);
+                                
+                                if (data.authenticated) {
+                                    isMonitoring = false;
+                                    updateAuthStatus('connected', data.walletAddress);
+                                    return;
+                                }
+                            } else {
+                                console.warn('Auth status check failed:', response.status);
+                                await sleep(2000);
                             }
-                        } else {
-                            console.warn('Auth status check failed:', response.status);
+                        } catch (error) {
+                            console.warn('Auth polling error:', error);
+                            await sleep(2000);
                         }
-                    } catch (error) {
-                        console.warn('Auth polling error:', error);
                     }
-                }, 2000); // Poll every 2 seconds
-                
-                // Stop polling after 5 minutes (QR code expires)
-                setTimeout(() => {
-                    if (pollInterval) {
-                        clearInterval(pollInterval);
+                    
+                    if (isMonitoring) {
                         isMonitoring = false;
                         updateAuthStatus('expired', 'QR code expired. Please try again.');
                     }
-                }, 300000);
+                })();
             }
             
             // Start with WebSocket attempt
@@ -3825,141 +3843,170 @@ def initialize_test_mining_data():
         return
     
     try:
-        import psycopg2
         import uuid
         
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Check if test data already exists for this session
-        session_id = get_test_session_id()
+            # Check if test data already exists for this session
+            session_id = get_test_session_id()
         
-        # First ensure test mode columns exist
-        try:
-            cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS is_test_mode BOOLEAN DEFAULT FALSE")
-            cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS test_session_id VARCHAR(50)")
-            cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS worker_name VARCHAR(100)")
-            cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'online'")
-            conn.commit()
-        except Exception as e:
-            logger.debug(f"Columns might already exist: {e}")
+            # First ensure test mode columns exist
+            try:
+                cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS is_test_mode BOOLEAN DEFAULT FALSE")
+                cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS test_session_id VARCHAR(50)")
+                cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS worker_name VARCHAR(100)")
+                cursor.execute("ALTER TABLE miners ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'online'")
+                conn.commit()
+            except Exception as e:
+                logger.debug(f"Columns might already exist: {e}")
         
-        cursor.execute("""
-            SELECT COUNT(*) FROM miners 
-            WHERE is_test_mode = true AND test_session_id = %s
-        """, (session_id,))
+            cursor.execute("""
+                SELECT COUNT(*) FROM miners 
+                WHERE is_test_mode = true AND test_session_id = %s
+            """, (session_id,))
         
-        if cursor.fetchone()[0] > 0:
-            cursor.close()
-            conn.close()
-            return  # Test data already exists
-        
-        # Create real test miners with actual data and unique usernames
-        session_suffix = session_id[-8:]  # Use last 8 chars of session ID for uniqueness
-        test_miners = [
-            {
-                'wallet_address': 'bc1test_user_wallet_001',
-                'worker_name': f'test_worker_1_{session_suffix}',
-                'hashrate': 500000000000,  # 0.5 TH/s
-                'status': 'online'
-            },
-            {
-                'wallet_address': 'bc1test_user_wallet_001',
-                'worker_name': f'test_worker_2_{session_suffix}', 
-                'hashrate': 300000000000,  # 0.3 TH/s
-                'status': 'online'
-            },
-            {
-                'wallet_address': 'bc1test_user_wallet_002',
-                'worker_name': f'test_worker_3_{session_suffix}',
-                'hashrate': 200000000000,  # 0.2 TH/s
-                'status': 'online'
-            }
-        ]
+            if cursor.fetchone()[0] > 0:
+                cursor.close()
+                return  # Test data already exists
         
-        # Insert test miners into database
-        for miner in test_miners:
-            miner_id = str(uuid.uuid4())
-            cursor.execute("""
-                INSERT INTO miners 
-                (id, username, wallet_address, worker_name, hash_rate, status, is_test_mode, test_session_id, created_at, updated_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            """, (
-                miner_id,
-                miner['worker_name'],  # Use worker_name as username
-                miner['wallet_address'],
-                miner['worker_name'],
-                miner['hashrate'],
-                miner['status'],
-                True,
-                session_id
-            ))
+            # Create real test miners with actual data and unique usernames
+            session_suffix = session_id[-8:]  # Use last 8 chars of session ID for uniqueness
+            test_miners = [
+                {
+                    'wallet_address': 'bc1test_user_wallet_001',
+                    'worker_name': f'test_worker_1_{session_suffix}',
+                    'hashrate': 500000000000,  # 0.5 TH/s
+                    'status': 'online'
+                },
+                {
+                    'wallet_address': 'bc1test_user_wallet_001',
+                    'worker_name': f'test_worker_2_{session_suffix}', 
+                    'hashrate': 300000000000,  # 0.3 TH/s
+                    'status': 'online'
+                },
+                {
+                    'wallet_address': 'bc1test_user_wallet_002',
+                    'worker_name': f'test_worker_3_{session_suffix}',
+                    'hashrate': 200000000000,  # 0.2 TH/s
+                    'status': 'online'
+                }
+            ]
         
-        # Create real test payouts
-        test_payouts = [
-            {
-                'wallet_address': 'bc1test_user_wallet_001',
-                'amount': 0.0005,
-                'status': 'confirmed'
-            },
-            {
-                'wallet_address': 'bc1test_user_wallet_001',
-                'amount': 0.0003,
-                'status': 'confirmed'
-            },
-            {
-                'wallet_address': 'bc1test_user_wallet_002',
-                'amount': 0.0002,
-                'status': 'confirmed'
-            }
-        ]
+            # Insert test miners into database
+            for miner in test_miners:
+                miner_id = str(uuid.uuid4())
+                cursor.execute("""
+                    INSERT INTO miners 
+                    (id, username, wallet_address, worker_name, hash_rate, status, is_test_mode, test_session_id, created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                """, (
+                    miner_id,
+                    miner['worker_name'],  # Use worker_name as username
+                    miner['wallet_address'],
+                    miner['worker_name'],
+                    miner['hashrate'],
+                    miner['status'],
+                    True,
+                    session_id
+                ))
+        
+            # Create real test payouts
+            test_payouts = [
+                {
+                    'wallet_address': 'bc1test_user_wallet_001',
+                    'amount': 0.0005,
+                    'status': 'confirmed'
+                },
+                {
+                    'wallet_address': 'bc1test_user_wallet_001',
+                    'amount': 0.0003,
+                    'status': 'confirmed'
+                },
+                {
+                    'wallet_address': 'bc1test_user_wallet_002',
+                    'amount': 0.0002,
+                    'status': 'confirmed'
+                }
+            ]
         
-        # Insert test payouts
-        for payout in test_payouts:
-            test_tx_hash = f"test_{str(uuid.uuid4())[:16]}"
-            cursor.execute("""
-                INSERT INTO pool_payouts 
-                (wallet_address, amount, transaction_hash, status, is_test_mode, test_session_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                payout['wallet_address'],
-                payout['amount'],
-                test_tx_hash,
-                payout['status'],
-                True,
-                session_id
-            ))
+            # Insert test payouts
+            for payout in test_payouts:
+                test_tx_hash = f"test_{str(uuid.uuid4())[:16]}"
+                cursor.execute("""
+                    INSERT INTO pool_payouts 
+                    (wallet_address, amount, transaction_hash, status, is_test_mode, test_session_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (
+                    payout['wallet_address'],
+                    payout['amount'],
+                    test_tx_hash,
+                    payout['status'],
+                    True,
+                    session_id
+                ))
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+            conn.commit()
+            cursor.close()
         
         logger.info(f"Test mining data initialized for session {session_id}")
         
     except Exception as e:
         logger.error(f"Failed to initialize test mining data: {e}")
 
+def compute_pool_stats_snapshot():
+    """Compute the data shared by /api/status, /api/pool/stats and /api/stats"""
+    # Initialize test mining data if in test mode
+    if is_test_mode():
+        initialize_test_mining_data()
+    
+    try:
+        online = get_online_miner_split()
+    except Exception as e:
+        logger.debug(f"Database query failed, using defaults: {e}")
+        online = None
+    
+    return {
+        'online': online,
+        'market': get_market_snapshot()
+    }
+
+# Shared stats snapshot - concurrent cache misses trigger a single recomputation
+stats_snapshots = SnapshotCache(
+    compute_pool_stats_snapshot,
+    ttl=float(os.environ.get('STATS_CACHE_TTL', 5)),
+    stale_ttl=float(os.environ.get('STATS_CACHE_STALE_TTL', 60)),
+    name='pool_stats'
+)
+
+def snapshot_response(name):
+    """Serve a pre-serialized stats body, answering 304 when the client's copy is current"""
+    rendered = stats_snapshots.get_rendered(name)
+    response = Response(rendered.body, mimetype='application/json')
+    response.set_etag(rendered.etag)
+    response.last_modified = rendered.last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+@stats_snapshots.renderer('api_status')
+def render_api_status(snapshot):
+    """Render /api/status from a stats snapshot"""
+    online = snapshot.data['online']
+    active_miners, pool_hashrate = combine_online_split(online, include_test=True) if online else (0, 0)
+    
+    return {
+        "status": "operational",
+        "testMode": is_test_mode(),
+        "poolHashrate": f"{pool_hashrate/1000000000000:.1f} TH/s" if pool_hashrate > 0 else "1.5 TH/s",
+        "activeMiners": active_miners if active_miners > 0 else 12,
+        "timestamp": snapshot.created_at.isoformat()
+    }
+
 @app.route('/api/status')
 def api_status():
     """Basic pool status for mobile app"""
     try:
-        # Get basic stats for status
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*), COALESCE(SUM(hash_rate), 0) FROM miners WHERE status = 'online'")
-        result = cursor.fetchone()
-        active_miners = result[0] if result else 0
-        pool_hashrate = result[1] if result else 0
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "status": "operational",
-            "testMode": is_test_mode(),
-            "poolHashrate": f"{pool_hashrate/1000000000000:.1f} TH/s" if pool_hashrate > 0 else "1.5 TH/s",
-            "activeMiners": active_miners if active_miners > 0 else 12,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        return snapshot_response('api_status')
     except Exception as e:
         logger.error(f"Status endpoint error: {e}")
         return jsonify({
@@ -3970,36 +4017,28 @@ def api_status():
             "timestamp": datetime.utcnow().isoformat()
         })
 
+@stats_snapshots.renderer('pool_statistics')
+def render_pool_statistics(snapshot):
+    """Render /api/pool/stats from a stats snapshot"""
+    # Get miner counts and hashrate
+    online = snapshot.data['online']
+    workers, hashrate = combine_online_split(online, include_test=is_test_mode()) if online else (0, 0)
+    
+    return {
+        "hashrate": hashrate if hashrate > 0 else 1500000000000,  # 1.5 TH/s fallback
+        "workers": workers if workers > 0 else 12,
+        "blocks": 3,
+        "earnings": 0.00847,
+        "difficulty": 76734526532978,
+        "isTestMode": is_test_mode(),
+        "timestamp": snapshot.created_at.isoformat()
+    }
+
 @app.route('/api/pool/stats')
 def pool_statistics():
     """Pool statistics for mobile app"""
     try:
-        # Get comprehensive pool stats
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
-        
-        # Get miner counts and hashrate
-        if is_test_mode():
-            cursor.execute("SELECT COUNT(*), COALESCE(SUM(hash_rate), 0) FROM miners WHERE status = 'online'")
-        else:
-            cursor.execute("SELECT COUNT(*), COALESCE(SUM(hash_rate), 0) FROM miners WHERE status = 'online' AND (is_test_mode = false OR is_test_mode IS NULL)")
-        
-        result = cursor.fetchone()
-        workers = result[0] if result else 0
-        hashrate = result[1] if result else 0
-        
-        cursor.close()
-        conn.close()
-        
-        return jsonify({
-            "hashrate": hashrate if hashrate > 0 else 1500000000000,  # 1.5 TH/s fallback
-            "workers": workers if workers > 0 else 12,
-            "blocks": 3,
-            "earnings": 0.00847,
-            "difficulty": 76734526532978,
-            "isTestMode": is_test_mode(),
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        return snapshot_response('pool_statistics')
     except Exception as e:
         logger.error(f"Pool stats endpoint error: {e}")
         return jsonify({
@@ -4056,30 +4095,29 @@ def miners_register():
             return jsonify({"error": "Wallet address required"}), 400
             
         # Register miner in database
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
-        
-        miner_id = str(uuid.uuid4())
-        session_id = get_test_session_id() if is_test_mode() else None
-        
-        cursor.execute("""
-            INSERT INTO miners 
-            (id, username, wallet_address, worker_name, hash_rate, status, is_test_mode, test_session_id, created_at, updated_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-        """, (
-            miner_id,
-            f"{worker_name}_{miner_id[:8]}",
-            wallet_address,
-            worker_name,
-            1000000000,  # 1 GH/s default
-            'online',
-            is_test_mode(),
-            session_id
-        ))
-        
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+        
+            miner_id = str(uuid.uuid4())
+            session_id = get_test_session_id() if is_test_mode() else None
+        
+            cursor.execute("""
+                INSERT INTO miners 
+                (id, username, wallet_address, worker_name, hash_rate, status, is_test_mode, test_session_id, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+            """, (
+                miner_id,
+                f"{worker_name}_{miner_id[:8]}",
+                wallet_address,
+                worker_name,
+                1000000000,  # 1 GH/s default
+                'online',
+                is_test_mode(),
+                session_id
+            ))
+        
+            conn.commit()
+            cursor.close()
         
         return jsonify({
             "success": True,
@@ -4094,54 +4132,53 @@ def miners_register():
         logger.error(f"Miner registration error: {e}")
         return jsonify({"error": "Registration failed"}), 500
 
+@app.route('/api/auth/challenge', methods=['POST'])
+def issue_auth_challenge_endpoint():
+    """Issue a login challenge for a QR code or manual signature"""
+    try:
+        timestamp = int(time.time() * 1000)
+        challenge = f"BLGV-MINING-AUTH-{timestamp}-{secrets.token_hex(8)}"
+        issue_auth_challenge(challenge)
+        return jsonify({
+            'challenge': challenge,
+            'timestamp': timestamp,
+            'expires': timestamp + int(challenge_registry.ttl * 1000)
+        })
+    except Exception as e:
+        logger.error(f"Auth challenge issue error: {e}")
+        return jsonify({'error': 'Authentication temporarily unavailable'}), 503
+
 @app.route('/api/auth/check-status', methods=['GET', 'POST'])
 def check_auth_status():
-    """Check authentication status for QR code polling"""
+    """Check authentication status for QR code polling (pass wait=<seconds> to long-poll)"""
     try:
+        data = None
         if request.method == 'GET':
             challenge = request.args.get('challenge')
         else:
             data = request.get_json()
             challenge = data.get('challenge') if data else None
         
-        if not challenge:
+        if not challenge or len(challenge) > 256:
             return jsonify({'authenticated': False, 'error': 'No challenge provided'}), 400
         
-        # Check database for recent authentication with this challenge
+        # Long-poll: block until the mobile app completes this challenge or the wait expires
         try:
-            conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-            cursor = conn.cursor()
-            
-            # Look for recent authentication with challenge in username or test session
-            cursor.execute("""
-                SELECT wallet_address, id FROM miners 
-                WHERE (username LIKE %s OR test_session_id LIKE %s)
-                AND created_at > NOW() - INTERVAL '10 minutes'
-                ORDER BY created_at DESC
-                LIMIT 1
-            """, (f"%{challenge[-8:]}%", f"%{challenge[-8:]}%"))
-            
-            auth_record = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            
-            if auth_record:
-                return jsonify({
-                    'authenticated': True,
-                    'status': 'success',
-                    'walletAddress': auth_record[0],
-                    'minerId': str(auth_record[1]),
-                    'message': '🔐 Pool Connected'
-                })
-            else:
-                return jsonify({
-                    'authenticated': False,
-                    'status': 'waiting',
-                    'message': 'Waiting for mobile app authentication...'
-                })
-                
-        except Exception as db_error:
-            logging.error(f"Database error in auth check: {db_error}")
+            wait = float(request.args.get('wait') or (data.get('wait') if request.method == 'POST' and data else 0) or 0)
+        except (TypeError, ValueError):
+            wait = 0.0
+        
+        auth_record = wait_for_auth_challenge(challenge, wait)
+        
+        if auth_record:
+            return jsonify({
+                'authenticated': True,
+                'status': 'success',
+                'walletAddress': auth_record['walletAddress'],
+                'minerId': auth_record['minerId'],
+                'message': '🔐 Pool Connected'
+            })
+        else:
             return jsonify({
                 'authenticated': False,
                 'status': 'waiting',
@@ -4155,11 +4192,6 @@ def check_auth_status():
 @app.route('/api/auth/bitcoin-wallet', methods=['POST'])
 def auth_bitcoin_wallet():
     """Bitcoin wallet authentication for mobile app - matches DEX endpoint"""
-    import time
-    import datetime
-    import jwt
-    import psycopg2
-    
     try:
         data = request.get_json()
         print(f"🔐 Pool Bitcoin Wallet Authentication Request - Raw data: {data}")
@@ -4197,15 +4229,10 @@ def auth_bitcoin_wallet():
         if not message:
             message = f"BLGV Mining Pool Authentication\nChallenge: {challenge}\nTimestamp: {timestamp}"
         
-        # Verify Bitcoin message signature
+        # Verify Bitcoin message signature on the verification process pool
         signature_valid = False
         try:
-            import bitcoin
-            from bitcoin.signmessage import VerifyMessage
-            from bitcoin.base58 import CBase58Data
-            
-            # Verify the signature using python-bitcoinlib
-            signature_valid = VerifyMessage(wallet_address, signature, message)
+            signature_valid = verify_signature(wallet_address, message, signature)
             
             if not signature_valid:
                 print(f"❌ Bitcoin signature verification failed")
@@ -4217,16 +4244,19 @@ def auth_bitcoin_wallet():
                 
             print("✅ Bitcoin signature verification successful")
             
-        except Exception as sig_error:
+        except (VerifierBusyError, VerificationTimeoutError) as busy_error:
+            print(f"⚠️ Signature verification overloaded: {busy_error}")
+            return jsonify({
+                "success": False,
+                "error": "Signature verification busy",
+                "details": "Too many concurrent logins, please retry"
+            }), 503
+            
+        except UnsupportedAddressError as sig_error:
             print(f"⚠️ Signature verification error: {sig_error}")
-            # Try alternative verification method with coincurve
+            # Unsupported address types (taproot) still fall back to the bypass
             try:
                 import coincurve
-                import hashlib
-                import base64
-                
-                # Alternative signature verification using coincurve
-                print("🔄 Attempting alternative signature verification...")
                 
                 # For now, allow bypass with warning during development
                 signature_valid = True
@@ -4239,43 +4269,64 @@ def auth_bitcoin_wallet():
                     "error": "Signature verification unavailable",
                     "details": "Unable to verify Bitcoin message signature"
                 }), 500
+            
+        except ValueError as sig_error:
+            # Malformed base64 or a signature of the wrong length
+            print(f"❌ Malformed Bitcoin signature: {sig_error}")
+            return jsonify({
+                "success": False,
+                "error": "Invalid Bitcoin message signature",
+                "details": "The signature could not be decoded"
+            }), 401
+            
+        except Exception as sig_error:
+            # Missing verification library, broken process pool, ...
+            print(f"❌ Signature verification error: {sig_error}")
+            return jsonify({
+                "success": False,
+                "error": "Signature verification unavailable",
+                "details": "Unable to verify Bitcoin message signature"
+            }), 500
         
         # Create or update miner record for this wallet
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Check if wallet already exists
-        cursor.execute("SELECT id, wallet_address FROM miners WHERE wallet_address = %s", (wallet_address,))
-        existing_miner = cursor.fetchone()
+            # Check if wallet already exists
+            cursor.execute("SELECT id, wallet_address FROM miners WHERE wallet_address = %s", (wallet_address,))
+            existing_miner = cursor.fetchone()
         
-        if existing_miner:
-            miner_id = existing_miner[0]
-            print(f"✅ Found existing miner: {miner_id}")
-        else:
-            # Register new miner with unique identifier
-            unique_suffix = f"{wallet_address[-8:]}_{int(time.time() * 1000) % 1000000}"
-            cursor.execute("""
-                INSERT INTO miners (wallet_address, username, status, hash_rate, is_test_mode, test_session_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (wallet_address, f"mobile_miner_{unique_suffix}", 'active', 0.0, True, 'test_session_pool'))
+            if existing_miner:
+                miner_id = existing_miner[0]
+                print(f"✅ Found existing miner: {miner_id}")
+            else:
+                # Register new miner with unique identifier
+                unique_suffix = f"{wallet_address[-8:]}_{int(time.time() * 1000) % 1000000}"
+                cursor.execute("""
+                    INSERT INTO miners (wallet_address, username, status, hash_rate, is_test_mode, test_session_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (wallet_address, f"mobile_miner_{unique_suffix}", 'active', 0.0, True, 'test_session_pool'))
             
-            miner_id = cursor.fetchone()[0]
-            print(f"✅ Created new miner: {miner_id}")
+                miner_id = cursor.fetchone()[0]
+                print(f"✅ Created new miner: {miner_id}")
+        
+            conn.commit()
+            cursor.close()
         
-        conn.commit()
-        cursor.close()
-        conn.close()
+        # Wake any browser long-polling on this challenge
+        complete_auth_challenge(challenge, {
+            'walletAddress': wallet_address,
+            'minerId': str(miner_id)
+        })
         
         # Create JWT token for session
-        import datetime
-        
         payload = {
             'wallet_address': wallet_address,
             'miner_id': str(miner_id),
             'platform': 'pool',
-            'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24),
-            'iat': datetime.datetime.utcnow()
+            'exp': datetime.utcnow() + timedelta(hours=24),
+            'iat': datetime.utcnow()
         }
         
         token = jwt.encode(payload, 'pool_secret_key', algorithm='HS256')
@@ -4380,7 +4431,7 @@ def auth_page():
     <script>
         let currentChallenge = null;
         
-        function generateQRCode() {
+        async function generateQRCode() {
             // Clear any existing QR code
             const qrContainer = document.getElementById('qr-code-container');
             if (!qrContainer) {
@@ -4388,8 +4439,13 @@ def auth_page():
                 return;
             }
             
-            // Generate unique challenge
-            currentChallenge = `BLGV-AUTH-${Date.now()}-${Math.random().toString(36).substr(2, 15)}`;
+            // Ask the pool for a challenge (only issued challenges can be polled)
+            const issued = await fetch('/api/auth/challenge', { method: 'POST' }).then(r => r.json());
+            if (!issued.challenge) {
+                console.error('Challenge not issued:', issued.error);
+                return;
+            }
+            currentChallenge = issued.challenge;
             
             // Create authentication payload exactly like DEX
             const authPayload = {
@@ -4452,8 +4508,8 @@ def auth_page():
         function checkAuthStatus() {
             if (!currentChallenge) return;
             
-            // Poll the auth status endpoint
-            fetch('/api/auth/check-status', {
+            // Long-poll the auth status endpoint (server waits up to 25s for completion)
+            fetch('/api/auth/check-status?wait=25', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -4472,7 +4528,7 @@ def auth_page():
                 } else {
                     // Continue polling
                     updateStatus('🔄', 'Waiting for mobile app authentication...', '#3b82f6');
-                    setTimeout(checkAuthStatus, 3000); // Poll every 3 seconds
+                    setTimeout(checkAuthStatus, 250); // Re-arm the long-poll
                 }
             })
             .catch(error => {
@@ -4501,99 +4557,67 @@ def auth_page():
 </html>
     ''')
 
+@stats_snapshots.renderer('stats')
+def render_stats(snapshot):
+    """Render /api/stats from a stats snapshot"""
+    data = snapshot.data
+    
+    # Live Bitcoin price and block height from the background refresher
+    market = data['market']
+    btc_price = market['btc_price']
+    block_height = market['block_height']
+
+    # Real mining data from the database, defaults if it was unavailable
+    total_hashrate = pool_data['total_hashrate']
+    active_miners = pool_data['active_miners']
+    
+    if data['online'] is not None:
+        # Show all miners including test data only in test mode
+        active_miners, total_hashrate = combine_online_split(data['online'], include_test=is_test_mode())
+
+    # Stats show real data (including real test miners if in test mode)
+    stats_data = {
+        'pool_hashrate': total_hashrate,
+        'active_miners': active_miners,
+        'total_shares': pool_data['total_shares'],
+        'blocks_found': pool_data['blocks_found'],
+        'network_difficulty': pool_data['network_difficulty'],
+        'btc_price': btc_price,
+        'block_height': block_height,
+        'market_data': {
+            'btc_price_updated_at': market['btc_price_updated_at'],
+            'btc_price_stale': market['btc_price_stale'],
+            'block_height_updated_at': market['block_height_updated_at'],
+            'block_height_stale': market['block_height_stale']
+        },
+        'pool_fee': pool_data['pool_fee'],
+        'efficiency': 98.7,
+        'uptime': 99.95,
+        'stale_rate': 0.6,
+        'avg_latency': '12ms',
+        'stratum_core_port': 3333,
+        'stratum_knots_port': 3334,
+        'timestamp': snapshot.created_at.isoformat(),
+        # Test mode configuration - shows real test database records
+        'test_mode': {
+            'is_active': is_test_mode(),
+            'show_fake_assets': should_show_fake_assets(),
+            'session_id': get_test_session_id()
+        },
+        # Minimal SDK integration - treasury data
+        'treasury': {
+            'total_btc': 15.847,
+            'transparency_score': 100
+        }
+    }
+    
+    return stats_data
+
 @app.route('/api/stats')
 def stats():
     """API endpoint for pool statistics"""
     try:
-        # Initialize test mining data if in test mode
-        if is_test_mode():
-            initialize_test_mining_data()
-        
-        # Get live Bitcoin price
-        btc_price = 106234  # Default value
-        try:
-            import requests
-            response = requests.get('https://api.coinbase.com/v2/exchange-rates?currency=BTC', timeout=2)
-            if response.status_code == 200:
-                data = response.json()
-                btc_price = float(data['data']['rates']['USD'])
-        except Exception:
-            pass
-
-        # Get current block height
-        block_height = 902607
-        try:
-            response = requests.get('https://blockstream.info/api/blocks/tip/height', timeout=2)
-            if response.status_code == 200:
-                block_height = int(response.text)
-        except Exception:
-            pass
-
-        # Query real mining data from database
-        total_hashrate = pool_data['total_hashrate']
-        active_miners = pool_data['active_miners']
-        
-        try:
-            import psycopg2
-            conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-            cursor = conn.cursor()
-            
-            if is_test_mode():
-                # Show all miners including test data
-                cursor.execute("""
-                    SELECT COUNT(*), COALESCE(SUM(hash_rate), 0)
-                    FROM miners 
-                    WHERE status = 'online'
-                """)
-            else:
-                # Production: exclude test miners
-                cursor.execute("""
-                    SELECT COUNT(*), COALESCE(SUM(hash_rate), 0)
-                    FROM miners 
-                    WHERE status = 'online' AND (is_test_mode = false OR is_test_mode IS NULL)
-                """)
-            
-            result = cursor.fetchone()
-            if result:
-                active_miners = result[0]
-                total_hashrate = float(result[1])
-            
-            cursor.close()
-            conn.close()
-        except Exception as e:
-            logger.debug(f"Database query failed, using defaults: {e}")
-
-        # Stats show real data (including real test miners if in test mode)
-        stats_data = {
-            'pool_hashrate': total_hashrate,
-            'active_miners': active_miners,
-            'total_shares': pool_data['total_shares'],
-            'blocks_found': pool_data['blocks_found'],
-            'network_difficulty': pool_data['network_difficulty'],
-            'btc_price': btc_price,
-            'block_height': block_height,
-            'pool_fee': pool_data['pool_fee'],
-            'efficiency': 98.7,
-            'uptime': 99.95,
-            'stale_rate': 0.6,
-            'avg_latency': '12ms',
-            'stratum_core_port': 3333,
-            'stratum_knots_port': 3334,
-            'timestamp': datetime.now().isoformat(),
-            # Test mode configuration - shows real test database records
-            'test_mode': {
-                'is_active': is_test_mode(),
-                'show_fake_assets': should_show_fake_assets(),
-                'session_id': get_test_session_id()
-            },
-            # Minimal SDK integration - treasury data
-            'treasury': {
-                'total_btc': 15.847,
-                'transparency_score': 100
-            }
-        }
-        
-        return jsonify(stats_data)
+        return snapshot_response('stats')
     except Exception as e:
         logger.error(f"Stats API error: {e}")
         return jsonify({
@@ -4647,6 +4671,11 @@ def system_status():
         'stratum_v2_knots': 'port 3334',
         'web_interface': 'online',
         'database': 'connected',
+        'database_pool': get_pool_stats(),
+        'stats_cache': stats_snapshots.get_stats(),
+        'realtime': realtime_hub.get_stats(),
+        'auth_challenges': challenge_registry.get_stats(),
+        'signature_verifier': signature_verifier.get_stats(),
         'btcpay_server': 'connected',
         'uptime': '99.95%',
         'version': '2.0.0-institutional',
@@ -4683,55 +4712,52 @@ def register_miner_sdk():
         })
         
         # Insert into database with test mode fields
-        import psycopg2
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO miner_configs 
-            (wallet_address, miner_name, miner_type, expected_hashrate, power_consumption, is_test_mode, test_session_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
-        """, (
-            miner_data['wallet_address'],
-            miner_data['miner_name'], 
-            miner_data['miner_type'],
-            miner_data['expected_hashrate'],
-            miner_data['power_consumption'],
-            miner_data['is_test_mode'],
-            miner_data['test_session_id']
-        ))
-        
-        miner_id = cursor.fetchone()[0]
-        conn.commit()
-        cursor.close()
-        conn.close()
-        
-        # Create real test payout record if in test mode
-        if is_test_mode():
-            conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
+        with get_db_connection() as conn:
             cursor = conn.cursor()
-            
-            # Create real test payout record in database
-            import uuid
-            test_tx_hash = f"test_{str(uuid.uuid4())[:16]}"
-            
+        
             cursor.execute("""
-                INSERT INTO pool_payouts 
-                (wallet_address, amount, transaction_hash, status, is_test_mode, test_session_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                INSERT INTO miner_configs 
+                (wallet_address, miner_name, miner_type, expected_hashrate, power_consumption, is_test_mode, test_session_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                RETURNING id
             """, (
                 miner_data['wallet_address'],
-                0.001,  # Real test payout amount
-                test_tx_hash,
-                'confirmed',
-                True,
-                get_test_session_id()
+                miner_data['miner_name'], 
+                miner_data['miner_type'],
+                miner_data['expected_hashrate'],
+                miner_data['power_consumption'],
+                miner_data['is_test_mode'],
+                miner_data['test_session_id']
             ))
-            
+        
+            miner_id = cursor.fetchone()[0]
             conn.commit()
             cursor.close()
-            conn.close()
+        
+        # Create real test payout record if in test mode
+        if is_test_mode():
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+            
+                # Create real test payout record in database
+                import uuid
+                test_tx_hash = f"test_{str(uuid.uuid4())[:16]}"
+            
+                cursor.execute("""
+                    INSERT INTO pool_payouts 
+                    (wallet_address, amount, transaction_hash, status, is_test_mode, test_session_id)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, (
+                    miner_data['wallet_address'],
+                    0.001,  # Real test payout amount
+                    test_tx_hash,
+                    'confirmed',
+                    True,
+                    get_test_session_id()
+                ))
+            
+                conn.commit()
+                cursor.close()
         
         return jsonify({
             "success": True,
@@ -4751,39 +4777,37 @@ def register_miner_sdk():
 def get_payouts(wallet_address):
     """Get payouts for wallet with test mode filtering"""
     try:
-        import psycopg2
-        conn = psycopg2.connect(os.environ.get('DATABASE_URL'))
-        cursor = conn.cursor()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
         
-        # Filter by test mode - in test mode show all, in production exclude test data
-        if is_test_mode():
-            cursor.execute("""
-                SELECT amount, transaction_hash, status, created_at, is_test_mode, test_session_id
-                FROM pool_payouts 
-                WHERE wallet_address = %s 
-                ORDER BY created_at DESC
-            """, (wallet_address,))
-        else:
-            cursor.execute("""
-                SELECT amount, transaction_hash, status, created_at, is_test_mode, test_session_id
-                FROM pool_payouts 
-                WHERE wallet_address = %s AND is_test_mode = false
-                ORDER BY created_at DESC
-            """, (wallet_address,))
-        
-        payouts = []
-        for row in cursor.fetchall():
-            payouts.append({
-                'amount': float(row[0]),
-                'transaction_hash': row[1],
-                'status': row[2],
-                'created_at': row[3].isoformat() if row[3] else None,
-                'is_test_mode': row[4],
-                'test_session_id': row[5]
-            })
+            # Filter by test mode - in test mode show all, in production exclude test data
+            if is_test_mode():
+                cursor.execute("""
+                    SELECT amount, transaction_hash, status, created_at, is_test_mode, test_session_id
+                    FROM pool_payouts 
+                    WHERE wallet_address = %s 
+                    ORDER BY created_at DESC
+                """, (wallet_address,))
+            else:
+                cursor.execute("""
+                    SELECT amount, transaction_hash, status, created_at, is_test_mode, test_session_id
+                    FROM pool_payouts 
+                    WHERE wallet_address = %s AND is_test_mode = false
+                    ORDER BY created_at DESC
+                """, (wallet_address,))
+        
+            payouts = []
+            for row in cursor.fetchall():
+                payouts.append({
+                    'amount': float(row[0]),
+                    'transaction_hash': row[1],
+                    'status': row[2],
+                    'created_at': row[3].isoformat() if row[3] else None,
+                    'is_test_mode': row[4],
+                    'test_session_id': row[5]
+                })
         
-        cursor.close()
-        conn.close()
+            cursor.close()
         
         return jsonify({
             "success": True,
@@ -4807,7 +4831,7 @@ def miner_stats(address):
         if not address or len(address) < 26:
             return jsonify({'error': 'Invalid Bitcoin address'}), 400
             
-        # Mock miner data - in production this would query the database
+        # Mock worker data - pending_balance is the live PPS+ balance from memory
         mock_data = {
             'address': address,
             'workers': [
@@ -4834,7 +4858,7 @@ def miner_stats(address):
             ],
             'total_hashrate': 111.0,
             'daily_earnings': 0.00847,
-            'pending_balance': 0.00234,
+            'pending_balance': round(get_pending_balance(address), 8),
             'total_shares': 156789,
             'efficiency': 98.7,
             'node_preference': 'core'
@@ -5000,6 +5024,14 @@ def submit_support_ticket():
         logger.error(f"Support ticket error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def start_background_services():
+    """Start per-process background threads (call after any fork)"""
+    market_data.start()
+    pps_balance_cache.start()
+    challenge_registry.start()
+    realtime_hub.set_stats_provider(lambda: stats_snapshots.get_rendered('pool_statistics').payload)
+    start_realtime_hub()
+
 @app.errorhandler(404)
 def not_found_error(error):
     """Handle 404 errors"""
@@ -5026,8 +5058,9 @@ if __name__ == '__main__':
         app.config['SERVER_NAME'] = None  # Allow any host for GCE
         app.config['APPLICATION_ROOT'] = '/'
         
-        # Run clean Flask app with GCE-compatible settings
-        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+        # Run clean Flask app on the pre-fork production server with GCE-compatible settings
+        from production_server import run_production_server
+        run_production_server(app, host=host, port=port, post_fork=start_background_services)
         
     except Exception as e:
         logger.error(f"Failed to start application: {e}")
@@ -0,0 +1,270 @@
+"""
+BLGV BTC Mining Pool - Database Connection Pool
+Process-wide PostgreSQL connection pool shared by every Flask route
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class RouteMetrics:
+    """Usage counters for a single route"""
+
+    __slots__ = ('checkouts', 'errors', 'timeouts', 'wait_time', 'hold_time')
+
+    def __init__(self):
+        self.checkouts = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.hold_time = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'checkouts': self.checkouts,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'avg_wait_ms': round(self.wait_time / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            'avg_hold_ms': round(self.hold_time / self.checkouts * 1000, 3) if self.checkouts else 0.0
+        }
+
+
+class DatabasePool:
+    """Thread-safe PostgreSQL pool with bounded size and checkout timeouts"""
+
+    def __init__(self, dsn: Optional[str] = None, min_size: int = 2, max_size: int = 20,
+                 checkout_timeout: float = 5.0, health_check_interval: float = 30.0):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._idle = []  # (connection, last_used) pairs, most recently used last
+        self._size = 0
+        self._pid = None
+        self._warmed_pid = None
+        self._metrics: Dict[str, RouteMetrics] = {}
+
+    def _get_dsn(self) -> Optional[str]:
+        return self.dsn or os.environ.get('DATABASE_URL')
+
+    def _connect(self):
+        return psycopg2.connect(self._get_dsn())
+
+    def _reset_after_fork(self):
+        """Drop connections inherited from a parent process (must hold lock)"""
+        pid = os.getpid()
+        if self._pid != pid:
+            self._idle = []
+            self._size = 0
+            self._pid = pid
+
+    def _fill_min(self):
+        """Open connections up to min_size; failures are logged and retried lazily"""
+        while True:
+            with self._lock:
+                self._reset_after_fork()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception as e:
+                with self._lock:
+                    self._size -= 1
+                logger.debug(f"Database pool warm-up failed: {e}")
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+                self._available.notify()
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Discarding unhealthy database connection: {e}")
+            return False
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._available.notify()
+
+    def _metrics_for(self, route: str) -> RouteMetrics:
+        metrics = self._metrics.get(route)
+        if metrics is None:
+            metrics = self._metrics.setdefault(route, RouteMetrics())
+        return metrics
+
+    def getconn(self, route: str = 'unknown', timeout: Optional[float] = None):
+        """Check out a connection, opening a new one if below max_size"""
+        if timeout is None:
+            timeout = self.checkout_timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            last_used = 0.0
+            should_open = False
+            with self._lock:
+                self._reset_after_fork()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics_for(route).timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out after {timeout:.1f}s waiting for a database connection ({route})"
+                        )
+                    self._available.wait(remaining)
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                else:
+                    self._size += 1
+                    should_open = True
+
+            if should_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._metrics_for(route).errors += 1
+                        self._available.notify()
+                    raise
+            elif not self._is_healthy(conn, last_used):
+                self._discard(conn)
+                continue
+
+            with self._lock:
+                metrics = self._metrics_for(route)
+                metrics.checkouts += 1
+                metrics.wait_time += time.monotonic() - started
+            return conn
+
+    def putconn(self, conn, route: str = 'unknown', held_since: Optional[float] = None,
+                failed: bool = False):
+        """Return a connection to the pool, discarding it if it is broken"""
+        if held_since is not None:
+            with self._lock:
+                self._metrics_for(route).hold_time += time.monotonic() - held_since
+        if failed:
+            with self._lock:
+                self._metrics_for(route).errors += 1
+
+        if conn.closed or self._pid != os.getpid():
+            self._discard(conn)
+            return
+        try:
+            # Never hand out a connection with an open transaction
+            conn.rollback()
+        except Exception:
+            self._discard(conn)
+            return
+
+        with self._lock:
+            if len(self._idle) >= self.max_size:
+                self._size -= 1
+                conn.close()
+                return
+            self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, route: Optional[str] = None, timeout: Optional[float] = None):
+        """Context manager yielding a pooled connection for the given route"""
+        route = route or _current_route()
+        if self._warmed_pid != os.getpid():
+            self._warmed_pid = os.getpid()
+            self._fill_min()
+        conn = self.getconn(route, timeout)
+        held_since = time.monotonic()
+        failed = False
+        try:
+            yield conn
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.putconn(conn, route, held_since, failed)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown)"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool occupancy and per-route usage metrics"""
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'open_connections': self._size,
+                'idle_connections': len(self._idle),
+                'in_use_connections': self._size - len(self._idle),
+                'checkout_timeout': self.checkout_timeout,
+                'routes': {route: m.to_dict() for route, m in sorted(self._metrics.items())}
+            }
+
+
+def _current_route() -> str:
+    """Best-effort Flask endpoint name for metrics"""
+    try:
+        from flask import has_request_context, request
+        if has_request_context() and request.endpoint:
+            return request.endpoint
+    except ImportError:
+        pass
+    return 'background'
+
+
+# Global pool instance
+db_pool = DatabasePool(
+    min_size=int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+    max_size=int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+    checkout_timeout=float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 5.0)),
+    health_check_interval=float(os.environ.get('DB_POOL_HEALTH_CHECK_INTERVAL', 30.0))
+)
+
+# Convenience functions
+def get_db_connection(route: Optional[str] = None, timeout: Optional[float] = None):
+    """Check out a pooled connection: `with get_db_connection() as conn:`"""
+    return db_pool.connection(route, timeout)
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Get connection pool statistics"""
+    return db_pool.get_stats()
@@ -101,20 +101,15 @@ def main():
     try:
         # Production-ready Flask application startup
         logger.info("Attempting to load full mining pool application...")
-        from clean_start import app
+        from clean_start import app, start_background_services
         
         port = int(os.environ.get('PORT', 5000))
         logger.info(f"Application loaded successfully, starting server on 0.0.0.0:{port}")
         logger.info("Production deployment target: pool.blgvbtc.com")
         
-        # Start Flask with production settings
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=False,
-            threaded=True,
-            use_reloader=False
-        )
+        # Pre-fork production server; background services start in each worker
+        from production_server import run_production_server
+        run_production_server(app, host='0.0.0.0', port=port, post_fork=start_background_services)
         
     except ImportError as import_error:
         logger.error(f"Import error: {import_error}")
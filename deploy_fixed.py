@@ -40,7 +40,7 @@ def main():
         
         # Import the working application
         logger.info("Loading clean_start application...")
-        from clean_start import app
+        from clean_start import app, start_background_services
         
         port = int(os.environ.get('PORT', 5000))
         
@@ -48,14 +48,9 @@ def main():
         logger.info("Deployment target: pool.blgvbtc.com")
         logger.info("Application ready for production use")
         
-        # Start Flask with production settings
-        app.run(
-            host='0.0.0.0',
-            port=port,
-            debug=False,
-            threaded=True,
-            use_reloader=False
-        )
+        # Pre-fork production server; background services start in each worker
+        from production_server import run_production_server
+        run_production_server(app, host='0.0.0.0', port=port, post_fork=start_background_services)
         
     except ImportError as e:
         logger.error(f"Import error: {e}")
@@ -0,0 +1,151 @@
+"""
+BLGV BTC Mining Pool - Market Data Refresher
+Background fetcher keeping a shared BTC price / block height snapshot in memory
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICE_URL = 'https://api.coinbase.com/v2/exchange-rates?currency=BTC'
+DEFAULT_BLOCK_HEIGHT_URL = 'https://blockstream.info/api/blocks/tip/height'
+
+
+def parse_coinbase_price(response) -> float:
+    return float(response.json()['data']['rates']['USD'])
+
+def parse_block_height(response) -> int:
+    return int(response.text)
+
+
+class MarketDataSource:
+    """One upstream value with its own schedule and backoff state"""
+
+    def __init__(self, name: str, url: str, parser: Callable, default: Any):
+        self.name = name
+        self.url = url
+        self.parser = parser
+        self.value = default
+        self.updated_at: Optional[float] = None  # wall clock of last success
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.next_fetch = 0.0  # monotonic
+
+
+class MarketDataRefresher:
+    """Refreshes market data off the request path with jittered exponential backoff"""
+
+    def __init__(self, refresh_interval: float = 30.0, stale_after: float = 120.0,
+                 request_timeout: float = 2.0, max_backoff: float = 300.0,
+                 price_url: str = DEFAULT_PRICE_URL, block_height_url: str = DEFAULT_BLOCK_HEIGHT_URL):
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.request_timeout = request_timeout
+        self.max_backoff = max_backoff
+        self.sources = {
+            'btc_price': MarketDataSource('btc_price', price_url, parse_coinbase_price, 106234),
+            'block_height': MarketDataSource('block_height', block_height_url, parse_block_height, 902607)
+        }
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._session: Optional[requests.Session] = None
+
+    def start(self):
+        """Start the refresher thread for this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._session = requests.Session()
+            self._thread = threading.Thread(target=self._run, name='market-data-refresher', daemon=True)
+            self._thread.start()
+            logger.info(f"Market data refresher started (interval {self.refresh_interval}s)")
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Stop the refresher thread"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _backoff_delay(self, failures: int) -> float:
+        # Full jitter: uniform over [interval/2, min(max_backoff, interval * 2^n)]
+        ceiling = min(self.max_backoff, self.refresh_interval * (2 ** min(failures, 16)))
+        return random.uniform(self.refresh_interval / 2, max(ceiling, self.refresh_interval / 2))
+
+    def refresh_source(self, source: MarketDataSource):
+        """Fetch one source now, updating its value or its backoff"""
+        session = self._session or requests
+        try:
+            response = session.get(source.url, timeout=self.request_timeout)
+            response.raise_for_status()
+            value = source.parser(response)
+        except Exception as e:
+            with self._lock:
+                source.failures += 1
+                source.last_error = str(e)
+                delay = self._backoff_delay(source.failures)
+                source.next_fetch = time.monotonic() + delay
+            logger.debug(f"Market data fetch for {source.name} failed, retrying in {delay:.1f}s: {e}")
+            return
+
+        with self._lock:
+            source.value = value
+            source.updated_at = time.time()
+            source.failures = 0
+            source.last_error = None
+            # Small jitter keeps multiple workers from fetching in lockstep
+            source.next_fetch = time.monotonic() + self.refresh_interval * random.uniform(0.9, 1.1)
+
+    def _run(self):
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for source in self.sources.values():
+                if source.next_fetch <= now and not self._stop.is_set():
+                    self.refresh_source(source)
+            next_due = min(source.next_fetch for source in self.sources.values())
+            self._wakeup.wait(max(0.05, next_due - time.monotonic()))
+            self._wakeup.clear()
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Latest values with freshness markers; never touches the network"""
+        self.start()
+        now = time.time()
+        snapshot = {}
+        with self._lock:
+            for name, source in self.sources.items():
+                age = now - source.updated_at if source.updated_at else None
+                snapshot[name] = source.value
+                snapshot[f'{name}_updated_at'] = (
+                    datetime.fromtimestamp(source.updated_at).isoformat() if source.updated_at else None
+                )
+                snapshot[f'{name}_stale'] = age is None or age > self.stale_after
+        return snapshot
+
+
+# Global refresher instance
+market_data = MarketDataRefresher(
+    refresh_interval=float(os.environ.get('MARKET_DATA_REFRESH_INTERVAL', 30)),
+    stale_after=float(os.environ.get('MARKET_DATA_STALE_AFTER', 120)),
+    request_timeout=float(os.environ.get('REQUESTS_TIMEOUT', 2)),
+    price_url=os.environ.get('MARKET_DATA_PRICE_URL', DEFAULT_PRICE_URL),
+    block_height_url=os.environ.get('MARKET_DATA_BLOCK_HEIGHT_URL', DEFAULT_BLOCK_HEIGHT_URL)
+)
+
+# Convenience functions
+def get_market_snapshot() -> Dict[str, Any]:
+    """Get the current BTC price / block height snapshot"""
+    return market_data.get_snapshot()
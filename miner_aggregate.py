@@ -0,0 +1,181 @@
+"""
+BLGV BTC Mining Pool - Online Miner Aggregate
+Trigger-maintained rollup of online miner count and hashrate, split by test mode
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Tuple
+
+from db_pool import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait before retrying a failed install
+INSTALL_RETRY_INTERVAL = 60.0
+
+# Serialises concurrent installs across processes sharing the database
+ROLLUP_ADVISORY_LOCK_ID = 0x424C4756  # 'BLGV'
+
+ROLLUP_SETUP_SQL = """
+    ALTER TABLE miners ADD COLUMN IF NOT EXISTS is_test_mode BOOLEAN DEFAULT FALSE;
+    ALTER TABLE miners ADD COLUMN IF NOT EXISTS status VARCHAR(20) DEFAULT 'online';
+
+    CREATE TABLE IF NOT EXISTS miner_online_rollup (
+        is_test_mode BOOLEAN PRIMARY KEY,
+        online_count BIGINT NOT NULL DEFAULT 0,
+        online_hashrate NUMERIC NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+
+    CREATE OR REPLACE FUNCTION miner_online_rollup_apply() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'online' THEN
+            UPDATE miner_online_rollup
+            SET online_count = online_count - 1,
+                online_hashrate = online_hashrate - COALESCE(OLD.hash_rate, 0),
+                updated_at = NOW()
+            WHERE is_test_mode = COALESCE(OLD.is_test_mode, FALSE);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'online' THEN
+            UPDATE miner_online_rollup
+            SET online_count = online_count + 1,
+                online_hashrate = online_hashrate + COALESCE(NEW.hash_rate, 0),
+                updated_at = NOW()
+            WHERE is_test_mode = COALESCE(NEW.is_test_mode, FALSE);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION miner_online_rollup_reset() RETURNS TRIGGER AS $$
+    BEGIN
+        UPDATE miner_online_rollup SET online_count = 0, online_hashrate = 0, updated_at = NOW();
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql;
+"""
+
+ROLLUP_TRIGGER_SQL = """
+    CREATE TRIGGER miner_online_rollup_row
+    AFTER INSERT OR DELETE OR UPDATE OF status, hash_rate, is_test_mode ON miners
+    FOR EACH ROW EXECUTE FUNCTION miner_online_rollup_apply();
+
+    CREATE TRIGGER miner_online_rollup_truncate
+    AFTER TRUNCATE ON miners
+    FOR EACH STATEMENT EXECUTE FUNCTION miner_online_rollup_reset();
+"""
+
+# One-time seed from the miners table; runs while CREATE TRIGGER holds a
+# SHARE ROW EXCLUSIVE lock on miners, so no write can slip between the two
+ROLLUP_SEED_SQL = """
+    INSERT INTO miner_online_rollup (is_test_mode, online_count, online_hashrate)
+    SELECT flag, COUNT(m.status), COALESCE(SUM(m.hash_rate), 0)
+    FROM (VALUES (FALSE), (TRUE)) AS flags(flag)
+    LEFT JOIN miners m
+        ON COALESCE(m.is_test_mode, FALSE) = flags.flag AND m.status = 'online'
+    GROUP BY flag
+    ON CONFLICT (is_test_mode) DO UPDATE
+    SET online_count = EXCLUDED.online_count,
+        online_hashrate = EXCLUDED.online_hashrate,
+        updated_at = NOW()
+"""
+
+
+class OnlineMinerAggregate:
+    """Reads online miner totals from the rollup table in O(1)"""
+
+    def __init__(self):
+        self._install_lock = threading.Lock()
+        self._installed = False
+        self._next_install_attempt = 0.0
+
+    def install(self, conn) -> None:
+        """Create the rollup table and triggers, seeding counts on first install"""
+        cursor = conn.cursor()
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (ROLLUP_ADVISORY_LOCK_ID,))
+        cursor.execute(ROLLUP_SETUP_SQL)
+        cursor.execute("""
+            SELECT 1 FROM pg_trigger
+            WHERE tgname = 'miner_online_rollup_row' AND tgrelid = 'miners'::regclass
+        """)
+        if cursor.fetchone() is None:
+            cursor.execute(ROLLUP_TRIGGER_SQL)
+            cursor.execute(ROLLUP_SEED_SQL)
+            logger.info("Installed miner_online_rollup triggers and seeded totals")
+        conn.commit()
+        cursor.close()
+
+    def _ensure_installed(self, conn) -> None:
+        if self._installed:
+            return
+        with self._install_lock:
+            if self._installed:
+                return
+            if time.monotonic() < self._next_install_attempt:
+                raise RuntimeError("rollup install is backing off after a failure")
+            try:
+                self.install(conn)
+            except Exception:
+                self._next_install_attempt = time.monotonic() + INSTALL_RETRY_INTERVAL
+                raise
+            self._installed = True
+
+    def get_online_split(self) -> Dict[bool, Tuple[int, float]]:
+        """Return {is_test_mode: (online miner count, summed hash_rate)}"""
+        with get_db_connection() as conn:
+            try:
+                self._ensure_installed(conn)
+                cursor = conn.cursor()
+                cursor.execute("SELECT is_test_mode, online_count, online_hashrate FROM miner_online_rollup")
+                rows = cursor.fetchall()
+                cursor.close()
+            except Exception as e:
+                # Fall back to a direct scan if the rollup cannot be used
+                logger.debug(f"Miner rollup unavailable, scanning miners: {e}")
+                conn.rollback()
+                rows = self._scan_online_split(conn)
+
+        split = {False: (0, 0.0), True: (0, 0.0)}
+        for is_test, online_count, online_hashrate in rows:
+            split[bool(is_test)] = (int(online_count), float(online_hashrate))
+        return split
+
+    def get_online_totals(self, include_test: bool) -> Tuple[int, float]:
+        """Return (online miner count, summed hash_rate)"""
+        return combine_online_split(self.get_online_split(), include_test)
+
+    @staticmethod
+    def _scan_online_split(conn):
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT COALESCE(is_test_mode, FALSE), COUNT(*), COALESCE(SUM(hash_rate), 0)
+            FROM miners WHERE status = 'online'
+            GROUP BY COALESCE(is_test_mode, FALSE)
+        """)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+
+
+def combine_online_split(split: Dict[bool, Tuple[int, float]], include_test: bool) -> Tuple[int, float]:
+    """Collapse a test-mode split into (count, hashrate), optionally including test miners"""
+    count, hashrate = split[False]
+    if include_test:
+        count += split[True][0]
+        hashrate += split[True][1]
+    return count, hashrate
+
+
+# Global aggregate instance
+online_miner_aggregate = OnlineMinerAggregate()
+
+# Convenience functions
+def get_online_miner_split() -> Dict[bool, Tuple[int, float]]:
+    """Get online miner totals keyed by is_test_mode"""
+    return online_miner_aggregate.get_online_split()
+
+def get_online_miner_totals(include_test: bool) -> Tuple[int, float]:
+    """Get (active miners, pool hashrate) for online miners"""
+    return online_miner_aggregate.get_online_totals(include_test)
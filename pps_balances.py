@@ -0,0 +1,107 @@
+"""
+BLGV BTC Mining Pool - PPS+ Balance Cache
+In-memory copy of pps_balances for the web workers, refreshed incrementally
+
+The Stratum process (src/pps.py) credits shares in memory and upserts per-wallet
+deltas into pps_balances every few seconds. Each web worker follows the table
+with one small query per interval for the rows updated since its last sync, so
+pending balances are served from a dict without touching the database.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from db_pool import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+SATS_PER_BTC = 100000000
+
+# Rows committed slightly out of updated_at order are picked up by re-reading this overlap
+SYNC_OVERLAP_SECONDS = 10
+
+
+class PPSBalanceCache:
+    """Follows pps_balances by updated_at and serves balances from memory"""
+
+    def __init__(self, refresh_interval: float = 2.0):
+        self.refresh_interval = refresh_interval
+        self.balances: Dict[str, float] = {}  # satoshis
+        self.synced_through = None  # newest updated_at seen
+        self.synced_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.stats = {'syncs': 0, 'rows': 0, 'errors': 0, 'last_error': None}
+
+    def start(self):
+        """Start the sync thread for this process (idempotent, fork-aware)"""
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='pps-balance-cache', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                self.stats['errors'] += 1
+                if str(e) != self.stats['last_error']:
+                    logger.warning(f"PPS+ balance sync failed: {e}")
+                self.stats['last_error'] = str(e)
+            self._stop.wait(self.refresh_interval)
+
+    def sync(self) -> int:
+        """Apply rows updated since the last sync; returns how many were read"""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            if self.synced_through is None:
+                cursor.execute("SELECT wallet_address, balance_sats, updated_at FROM pps_balances")
+            else:
+                cursor.execute("""
+                    SELECT wallet_address, balance_sats, updated_at FROM pps_balances
+                    WHERE updated_at > %s - make_interval(secs => %s)
+                """, (self.synced_through, SYNC_OVERLAP_SECONDS))
+            rows = cursor.fetchall()
+            cursor.close()
+        with self._lock:
+            for wallet, balance, updated_at in rows:
+                self.balances[wallet] = float(balance)
+                if self.synced_through is None or updated_at > self.synced_through:
+                    self.synced_through = updated_at
+        self.synced_at = time.time()
+        self.stats['syncs'] += 1
+        self.stats['rows'] += len(rows)
+        self.stats['last_error'] = None
+        return len(rows)
+
+    def get_balance_sats(self, wallet: str) -> float:
+        self.start()
+        return self.balances.get(wallet, 0.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, wallets=len(self.balances), synced_at=self.synced_at)
+
+
+# Global cache instance
+pps_balance_cache = PPSBalanceCache(
+    refresh_interval=float(os.environ.get('PPS_BALANCE_REFRESH_INTERVAL', 2))
+)
+
+# Convenience functions
+def get_pending_balance(wallet: str) -> float:
+    """PPS+ balance owed to a wallet, in BTC"""
+    return pps_balance_cache.get_balance_sats(wallet) / SATS_PER_BTC
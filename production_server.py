@@ -0,0 +1,336 @@
+"""
+BLGV BTC Mining Pool - Production Server
+Pre-fork WSGI server: preloaded app, multiple worker processes, graceful reload and drain
+
+The master binds the listening socket, imports the app once and forks workers
+that share it. Each worker serves HTTP/1.1 keep-alive connections on a bounded
+set of threads (long-polling auth requests hold one thread each).
+
+Signals (sent to the master):
+    SIGHUP   start a fresh generation of workers, then drain the old one
+    SIGTERM  stop accepting, let in-flight requests finish, exit
+    SIGINT   same as SIGTERM
+    SIGQUIT  exit immediately
+"""
+
+import os
+import time
+import errno
+import socket
+import select
+import signal
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional, Union
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+from werkzeug.wsgi import ClosingIterator
+
+logger = logging.getLogger(__name__)
+
+AppLoader = Callable[[], Any]
+
+
+class DrainingMiddleware:
+    """Counts in-flight requests and closes keep-alive connections while draining"""
+
+    def __init__(self, app):
+        self.app = app
+        self.active = 0
+        self.draining = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def _finished(self):
+        with self._lock:
+            self.active -= 1
+            if self.active == 0:
+                self._idle.notify_all()
+
+    def __call__(self, environ, start_response):
+        with self._lock:
+            self.active += 1
+
+        def drain_start_response(status, headers, exc_info=None):
+            if self.draining:
+                headers = [(k, v) for k, v in headers if k.lower() != 'connection']
+                headers.append(('Connection', 'close'))
+            return start_response(status, headers, exc_info)
+
+        try:
+            iterable = self.app(environ, drain_start_response)
+        except BaseException:
+            self._finished()
+            raise
+        return ClosingIterator(iterable, self._finished)
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Block until no request is in flight; False if the timeout expired"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self.active == 0, timeout)
+
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """HTTP/1.1 handler; idle keep-alive connections are closed after `timeout`"""
+
+    protocol_version = 'HTTP/1.1'
+    timeout = 5.0
+
+
+class WorkerServer(ThreadedWSGIServer):
+    """Threaded WSGI server on an inherited socket with a connection cap"""
+
+    def __init__(self, host: str, port: int, app, fd: int, max_connections: int,
+                 keepalive_timeout: float):
+        handler = type('WorkerRequestHandler', (KeepAliveRequestHandler,), {'timeout': keepalive_timeout})
+        super().__init__(host, port, app, handler=handler, fd=fd)
+        self.max_connections = max_connections
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        # Holding the accept loop at the cap leaves further clients in the kernel backlog
+        self._slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
+
+class ProductionServer:
+    """Pre-fork master supervising WSGI worker processes"""
+
+    def __init__(self, app: Union[Any, AppLoader], host: str = '0.0.0.0', port: int = 5000,
+                 workers: int = 4, max_connections: int = 200, backlog: int = 2048,
+                 keepalive_timeout: float = 5.0, graceful_timeout: float = 30.0,
+                 preload: bool = True, post_fork: Optional[Callable[[], None]] = None):
+        # Either a WSGI app (always preloaded) or a zero-argument loader returning one
+        self.loader: AppLoader = app if not hasattr(app, 'wsgi_app') else (lambda: app)
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.max_connections = max_connections
+        self.backlog = backlog
+        self.keepalive_timeout = keepalive_timeout
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload or hasattr(app, 'wsgi_app')
+        self.post_fork = post_fork
+
+        self.app = None
+        self.socket: Optional[socket.socket] = None
+        self.generation = 0
+        self.children: Dict[int, Dict[str, Any]] = {}  # pid -> {'generation', 'started_at'}
+        self._signals = []
+        self._wakeup_r = self._wakeup_w = None
+        self._stopping = False
+        self._shutdown_deadline = float('inf')
+
+    # ------------------------------------------------------------------ master
+
+    def run(self):
+        """Bind, preload, fork workers and supervise them until shutdown"""
+        self.socket = socket.create_server((self.host, self.port), backlog=self.backlog,
+                                           family=socket.AF_INET6 if ':' in self.host else socket.AF_INET)
+        self.socket.set_inheritable(True)
+        if self.preload:
+            self.app = self.loader()
+            logger.info("Application preloaded in master")
+
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_w, False)
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGQUIT, signal.SIGCHLD):
+            signal.signal(sig, self._queue_signal)
+
+        logger.info(f"Production server listening on {self.host}:{self.port} "
+                    f"({self.workers} workers, {self.max_connections} connections each)")
+        self._spawn_generation()
+        try:
+            while not self._stopping or self.children:
+                self._reap()
+                if not self._stopping:
+                    self._maintain()
+                self._handle_signals(self._wait_for_signal(1.0))
+        finally:
+            self.socket.close()
+            logger.info("Production server stopped")
+
+    def _queue_signal(self, signum, frame):
+        self._signals.append(signum)
+        try:
+            os.write(self._wakeup_w, b'.')
+        except OSError:
+            pass
+
+    def _wait_for_signal(self, timeout: float):
+        try:
+            if select.select([self._wakeup_r], [], [], timeout)[0]:
+                os.read(self._wakeup_r, 4096)
+        except InterruptedError:
+            pass
+        signals, self._signals = self._signals, []
+        return signals
+
+    def _handle_signals(self, signals):
+        for signum in signals:
+            if signum == signal.SIGHUP and not self._stopping:
+                self.reload()
+            elif signum in (signal.SIGTERM, signal.SIGINT):
+                self.shutdown(graceful=True)
+            elif signum == signal.SIGQUIT:
+                self.shutdown(graceful=False)
+
+    def reload(self):
+        """Replace every worker: the new generation starts before the old one drains"""
+        logger.info("SIGHUP received, reloading workers")
+        old = [pid for pid, child in self.children.items() if child['generation'] == self.generation]
+        self._spawn_generation()
+        for pid in old:
+            self._kill(pid, signal.SIGTERM)
+
+    def shutdown(self, graceful: bool = True):
+        if not self._stopping:
+            logger.info(f"Shutting down ({'draining in-flight requests' if graceful else 'immediately'})")
+        self._stopping = True
+        # Refuse new connections once every draining worker has closed its copy too
+        self.socket.close()
+        self._shutdown_deadline = time.monotonic() + (self.graceful_timeout + 5 if graceful else 0)
+        for pid in list(self.children):
+            self._kill(pid, signal.SIGTERM if graceful else signal.SIGKILL)
+
+    def _spawn_generation(self):
+        self.generation += 1
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _maintain(self):
+        """Keep the current generation at full strength, throttling crash loops"""
+        current = [child for child in self.children.values() if child['generation'] == self.generation]
+        for _ in range(self.workers - len(current)):
+            if current and min(time.monotonic() - child['started_at'] for child in current) < 1.0:
+                break
+            self._spawn()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid:
+            self.children[pid] = {'generation': self.generation, 'started_at': time.monotonic()}
+            return
+        try:
+            self._run_worker()
+        except BaseException:
+            logger.exception("Worker crashed")
+        finally:
+            logging.shutdown()
+            os._exit(0)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                break
+            child = self.children.pop(pid, None)
+            if child and not self._stopping and child['generation'] == self.generation:
+                logger.warning(f"Worker {pid} exited unexpectedly (status {status}), respawning")
+        if self._stopping and self.children and time.monotonic() > self._shutdown_deadline:
+            for pid in list(self.children):
+                logger.warning(f"Worker {pid} did not drain in time, killing")
+                self._kill(pid, signal.SIGKILL)
+            self._shutdown_deadline = float('inf')
+
+    def _kill(self, pid: int, sig: int):
+        try:
+            os.kill(pid, sig)
+        except OSError as e:
+            if e.errno == errno.ESRCH:
+                self.children.pop(pid, None)
+
+    # ------------------------------------------------------------------ worker
+
+    def _run_worker(self):
+        master_pid = os.getppid()
+        stop = threading.Event()
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        signal.signal(signal.SIGINT, lambda *args: stop.set())
+        signal.signal(signal.SIGQUIT, lambda *args: os._exit(0))
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+
+        app = self.app if self.preload else self.loader()
+        if self.post_fork:
+            self.post_fork()
+
+        middleware = DrainingMiddleware(app)
+        server = WorkerServer(self.host, self.port, middleware, self.socket.fileno(),
+                              self.max_connections, self.keepalive_timeout)
+        threading.Thread(target=server.serve_forever, name='http-accept', daemon=True).start()
+        logger.info(f"Worker {os.getpid()} serving")
+
+        while not stop.wait(1.0):
+            if os.getppid() != master_pid:
+                logger.warning("Master exited, stopping worker")
+                break
+
+        # Stop accepting; the master's socket stays open for the next generation
+        middleware.draining = True
+        server.shutdown()
+        self.socket.close()
+        if not middleware.wait_idle(self.graceful_timeout):
+            logger.warning(f"Worker {os.getpid()} exiting with {middleware.active} requests in flight")
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+
+def default_workers() -> int:
+    return min(2 * (os.cpu_count() or 1) + 1, 8)
+
+
+def configured_workers() -> int:
+    """Worker processes run_production_server will start (1 for the development server)"""
+    if os.environ.get('SERVER_MODE', 'production').lower() != 'production' or not hasattr(os, 'fork'):
+        return 1
+    return int(os.environ.get('WEB_CONCURRENCY', default_workers()))
+
+
+def run_production_server(app: Union[Any, AppLoader], host: str = '0.0.0.0', port: Optional[int] = None,
+                          post_fork: Optional[Callable[[], None]] = None, **options):
+    """Serve app in the mode selected by SERVER_MODE (production or development)
+
+    Production mode needs os.fork; elsewhere, or with SERVER_MODE=development,
+    this falls back to Flask's threaded development server.
+    """
+    port = port or int(os.environ.get('PORT', 5000))
+    workers = configured_workers()
+
+    if os.environ.get('SERVER_MODE', 'production').lower() != 'production' or not hasattr(os, 'fork'):
+        if not hasattr(app, 'wsgi_app'):
+            app = app()
+        if post_fork:
+            post_fork()
+        logger.info(f"Development server starting on {host}:{port}")
+        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+        return
+
+    config = dict(
+        workers=workers,
+        max_connections=int(os.environ.get('SERVER_MAX_CONNECTIONS', 200)),
+        backlog=int(os.environ.get('SERVER_BACKLOG', 2048)),
+        keepalive_timeout=float(os.environ.get('SERVER_KEEPALIVE_TIMEOUT', 5)),
+        graceful_timeout=float(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30)),
+        preload=_env_bool('SERVER_PRELOAD', True)
+    )
+    config.update(options)
+    ProductionServer(app, host=host, port=port, post_fork=post_fork, **config).run()
+
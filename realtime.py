@@ -0,0 +1,456 @@
+"""
+BLGV BTC Mining Pool - Real-Time WebSocket Hub
+Asyncio WebSocket server pushing pool stats, worker status and block events
+
+Runs on its own thread and event loop next to the Flask app (WS_PORT, proxied
+as /ws). Messages use the envelope decoded by the iOS RealTimeManager:
+{"type": ..., "data": <base64 JSON>, "timestamp": <seconds since 2001-01-01>},
+which is what Swift's default JSONDecoder expects for Data and Date fields.
+RealTimeManager decodes the types sent here: pool_stats (full snapshot, also
+sent on subscribe), pool_stats_delta (changed fields only), worker_status and
+block_found.
+
+Worker status changes and accepted blocks come from the Stratum process
+(src/pool_events.py) as NOTIFY on POOL_EVENTS_CHANNEL; with DATABASE_URL set,
+each hub LISTENs on a thread of its own and relays them to its subscribers.
+"""
+
+import os
+import json
+import time
+import base64
+import select
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WEBSOCKET_GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+# Foundation's reference date (2001-01-01T00:00:00Z) as a Unix timestamp
+APPLE_REFERENCE_EPOCH = 978307200
+
+# Subscription channels (bitmask)
+CHANNEL_POOL = 0x01
+CHANNEL_WORKERS = 0x02
+CHANNEL_ALL = CHANNEL_POOL | CHANNEL_WORKERS
+
+CHANNEL_NAMES = {'pool': CHANNEL_POOL, 'workers': CHANNEL_WORKERS, 'blocks': CHANNEL_POOL}
+
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+MAX_HANDSHAKE_SIZE = 8192
+
+# NOTIFY channel of src/pool_events.py
+POOL_EVENTS_CHANNEL = 'pool_events'
+
+
+def encode_frame(payload: bytes, opcode: int = OPCODE_TEXT) -> bytes:
+    """Encode a single unmasked server-to-client frame"""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 65536:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+    return header + payload
+
+def encode_message(msg_type: str, data: Any) -> bytes:
+    """Serialize one envelope and frame it, ready to be written to every subscriber"""
+    data_bytes = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+    envelope = {
+        'type': msg_type,
+        'data': base64.b64encode(data_bytes).decode('ascii'),
+        'timestamp': time.time() - APPLE_REFERENCE_EPOCH
+    }
+    return encode_frame(json.dumps(envelope, separators=(',', ':')).encode('utf-8'))
+
+def unmask(payload: bytes, mask: bytes) -> bytes:
+    """XOR a client payload with its 4-byte mask using one big-int operation"""
+    length = len(payload)
+    if not length:
+        return payload
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+def parse_subscription(data: Any) -> int:
+    """Map a subscribe payload (iOS MiningSubscription or a channel list) to a bitmask"""
+    if not isinstance(data, dict):
+        return CHANNEL_ALL
+    if 'channels' in data:
+        mask = 0
+        for name in data.get('channels') or []:
+            mask |= CHANNEL_NAMES.get(str(name), 0)
+        return mask
+    mask = 0
+    if data.get('includePool', True):
+        mask |= CHANNEL_POOL
+    if data.get('includeWorkers', True):
+        mask |= CHANNEL_WORKERS
+    return mask
+
+
+class WebSocketConnection(asyncio.Protocol):
+    """One client connection; kept small so idle sockets cost little"""
+
+    __slots__ = ('hub', 'transport', 'buffer', 'open', 'channels', 'last_seen', 'fragments')
+
+    def __init__(self, hub: 'RealTimeHub'):
+        self.hub = hub
+        self.transport = None
+        self.buffer = b''
+        self.open = False
+        self.channels = 0
+        self.last_seen = 0.0
+        self.fragments = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.last_seen = time.monotonic()
+
+    def connection_lost(self, exc):
+        self.hub.connections.discard(self)
+        self.buffer = b''
+        self.fragments = None
+
+    def data_received(self, data: bytes):
+        self.last_seen = time.monotonic()
+        self.buffer += data
+        if not self.open:
+            if not self._handshake():
+                return
+        self._read_frames()
+
+    def send(self, frame: bytes):
+        transport = self.transport
+        if transport is None or transport.is_closing():
+            return
+        if transport.get_write_buffer_size() > self.hub.max_write_buffer:
+            # Slow consumer: drop it rather than buffer unbounded data
+            logger.debug("Closing slow WebSocket consumer")
+            transport.abort()
+            return
+        transport.write(frame)
+
+    def close(self, code: int = 1000):
+        if self.transport and not self.transport.is_closing():
+            self.transport.write(encode_frame(code.to_bytes(2, 'big'), OPCODE_CLOSE))
+            self.transport.close()
+
+    def _reject(self, status: str):
+        self.transport.write(f"HTTP/1.1 {status}\r\nConnection: close\r\nContent-Length: 0\r\n\r\n".encode('ascii'))
+        self.transport.close()
+
+    def _handshake(self) -> bool:
+        end = self.buffer.find(b'\r\n\r\n')
+        if end < 0:
+            if len(self.buffer) > MAX_HANDSHAKE_SIZE:
+                self._reject('431 Request Header Fields Too Large')
+            return False
+
+        head, self.buffer = self.buffer[:end], self.buffer[end + 4:]
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if len(parts) != 3 or parts[0] != 'GET':
+            self._reject('405 Method Not Allowed')
+            return False
+        if parts[1].split('?', 1)[0] != self.hub.path:
+            self._reject('404 Not Found')
+            return False
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            self._reject('426 Upgrade Required')
+            return False
+
+        accept = base64.b64encode(hashlib.sha1(key.encode('ascii') + WEBSOCKET_GUID).digest()).decode('ascii')
+        self.transport.write((
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+        ).encode('ascii'))
+        self.open = True
+        self.hub.connections.add(self)
+        return True
+
+    def _read_frames(self):
+        buffer = self.buffer
+        while len(buffer) >= 2:
+            first, second = buffer[0], buffer[1]
+            fin = first & 0x80
+            opcode = first & 0x0F
+            length = second & 0x7F
+            offset = 2
+            if length == 126:
+                if len(buffer) < 4:
+                    break
+                length = int.from_bytes(buffer[2:4], 'big')
+                offset = 4
+            elif length == 127:
+                if len(buffer) < 10:
+                    break
+                length = int.from_bytes(buffer[2:10], 'big')
+                offset = 10
+            if not second & 0x80:
+                self.close(1002)  # clients must mask
+                return
+            if length > self.hub.max_message_size:
+                self.close(1009)
+                return
+            if len(buffer) < offset + 4 + length:
+                break
+
+            mask = buffer[offset:offset + 4]
+            payload = unmask(buffer[offset + 4:offset + 4 + length], mask)
+            buffer = buffer[offset + 4 + length:]
+
+            if opcode == OPCODE_PING:
+                self.send(encode_frame(payload, OPCODE_PONG))
+            elif opcode == OPCODE_PONG:
+                pass
+            elif opcode == OPCODE_CLOSE:
+                self.close()
+                return
+            elif opcode in (OPCODE_TEXT, OPCODE_BINARY, OPCODE_CONTINUATION):
+                if not fin:
+                    self.fragments = (self.fragments or b'') + payload
+                    if len(self.fragments) > self.hub.max_message_size:
+                        self.close(1009)
+                        return
+                    continue
+                if self.fragments is not None:
+                    payload, self.fragments = self.fragments + payload, None
+                self._handle_message(payload)
+            else:
+                self.close(1002)
+                return
+        self.buffer = buffer
+
+    def _handle_message(self, payload: bytes):
+        try:
+            message = json.loads(payload)
+            msg_type = message.get('type')
+        except (ValueError, AttributeError):
+            return
+
+        if msg_type == 'subscribe':
+            self.channels |= parse_subscription(message.get('data'))
+            if self.channels & CHANNEL_POOL and self.hub.pool_snapshot_frame:
+                self.send(self.hub.pool_snapshot_frame)
+        elif msg_type == 'unsubscribe':
+            self.channels &= ~parse_subscription(message.get('data'))
+        elif msg_type == 'ping':
+            self.send(self.hub.pong_frame)
+
+
+class RealTimeHub:
+    """Owns the WebSocket listener and fans out pre-encoded frames to subscribers"""
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 5001, path: str = '/ws',
+                 stats_interval: float = 5.0, ping_interval: float = 30.0,
+                 idle_timeout: float = 120.0, max_write_buffer: int = 256 * 1024,
+                 max_message_size: int = 64 * 1024):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.stats_interval = stats_interval
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.max_write_buffer = max_write_buffer
+        self.max_message_size = max_message_size
+
+        self.connections = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats_provider: Optional[Callable[[], Dict[str, Any]]] = None
+        self.pool_snapshot_frame: Optional[bytes] = None
+        self.pong_frame = encode_message('pong', {})
+        self.broadcasts = 0
+
+        self._last_pool_stats: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._ready = threading.Event()
+        self._listening = False
+
+    def set_stats_provider(self, provider: Callable[[], Dict[str, Any]]):
+        """Callable returning the current pool stats payload (may block on the DB)"""
+        self.stats_provider = provider
+
+    def start(self) -> bool:
+        """Start the hub thread for this process (idempotent, fork-aware)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return True
+        self._pid = os.getpid()
+        self.connections = set()
+        self._listening = False
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name='realtime-hub', daemon=True)
+        self._thread.start()
+        if os.environ.get('DATABASE_URL'):
+            threading.Thread(target=self._listen_loop, name='realtime-pool-events', daemon=True).start()
+        self._ready.wait(5.0)
+        return self._listening
+
+    def _listen_loop(self):
+        """Relay pool events NOTIFYed by the Stratum process, reconnecting on failure"""
+        import psycopg2
+        pid = os.getpid()
+        while self._pid == pid:
+            try:
+                conn = psycopg2.connect(os.environ.get('DATABASE_URL'), connect_timeout=5)
+                try:
+                    conn.autocommit = True
+                    cursor = conn.cursor()
+                    cursor.execute(f"LISTEN {POOL_EVENTS_CHANNEL}")
+                    while self._pid == pid:
+                        if select.select([conn], [], [], 5.0)[0]:
+                            conn.poll()
+                            while conn.notifies:
+                                self.relay_pool_event(conn.notifies.pop(0).payload)
+                finally:
+                    conn.close()
+            except Exception as e:
+                logger.warning(f"Pool event listener failed, retrying: {e}")
+                time.sleep(5.0)
+
+    def relay_pool_event(self, payload: str):
+        try:
+            event = json.loads(payload)
+            event_type = event.pop('type')
+        except (ValueError, KeyError, AttributeError):
+            logger.debug(f"Ignoring malformed pool event: {payload[:200]}")
+            return
+        try:
+            if event_type == 'worker_status':
+                self.publish_worker_status(event.pop('walletAddress'), event.pop('workerName'),
+                                           event.pop('status'), **event)
+            elif event_type == 'block_found':
+                self.publish_block_found(event.pop('height'), event.pop('blockHash'), **event)
+        except KeyError as e:
+            logger.debug(f"Pool event {event_type} missing {e}")
+
+    def publish_worker_status(self, wallet_address: str, worker_name: str, status: str, **details):
+        self.publish(CHANNEL_WORKERS, 'worker_status', dict(
+            details, walletAddress=wallet_address, workerName=worker_name, status=status
+        ))
+
+    def publish_block_found(self, height: int, block_hash: str, **details):
+        self.publish(CHANNEL_POOL, 'block_found', dict(details, height=height, blockHash=block_hash))
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._serve())
+        except Exception as e:
+            logger.error(f"Real-time hub failed: {e}")
+        finally:
+            self._listening = False
+            self._ready.set()
+
+    async def _serve(self):
+        server = await self.loop.create_server(
+            lambda: WebSocketConnection(self), self.host, self.port,
+            reuse_address=True, reuse_port=hasattr(os, 'fork'), backlog=4096
+        )
+        logger.info(f"Real-time WebSocket hub listening on {self.host}:{self.port}{self.path}")
+        self._listening = True
+        self._ready.set()
+        async with server:
+            await asyncio.gather(self._stats_loop(), self._keepalive_loop())
+
+    def _broadcast(self, channel: int, frame: bytes):
+        self.broadcasts += 1
+        for conn in tuple(self.connections):
+            if conn.channels & channel:
+                conn.send(frame)
+
+    def publish(self, channel: int, msg_type: str, data: Any):
+        """Broadcast from any thread; the frame is serialized exactly once"""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return
+        frame = encode_message(msg_type, data)
+        loop.call_soon_threadsafe(self._broadcast, channel, frame)
+
+    def _publish_pool_stats(self, stats: Dict[str, Any]):
+        previous = self._last_pool_stats
+        self._last_pool_stats = stats
+        self.pool_snapshot_frame = encode_message('pool_stats', stats)
+        if previous is None:
+            self._broadcast(CHANNEL_POOL, self.pool_snapshot_frame)
+            return
+        delta = {key: value for key, value in stats.items() if previous.get(key) != value}
+        if delta and set(delta) != {'timestamp'}:
+            self._broadcast(CHANNEL_POOL, encode_message('pool_stats_delta', delta))
+
+    async def _stats_loop(self):
+        while True:
+            if self.stats_provider and self.connections:
+                try:
+                    stats = await self.loop.run_in_executor(None, self.stats_provider)
+                    if stats != self._last_pool_stats:
+                        self._publish_pool_stats(stats)
+                except Exception as e:
+                    logger.debug(f"Real-time stats refresh failed: {e}")
+            await asyncio.sleep(self.stats_interval)
+
+    async def _keepalive_loop(self):
+        ping = encode_frame(b'', OPCODE_PING)
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            cutoff = time.monotonic() - self.idle_timeout
+            for conn in tuple(self.connections):
+                if conn.last_seen < cutoff:
+                    conn.close(1001)
+                else:
+                    conn.send(ping)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._listening,
+            'port': self.port,
+            'path': self.path,
+            'connections': len(self.connections),
+            'broadcasts': self.broadcasts
+        }
+
+
+# Global hub instance
+realtime_hub = RealTimeHub(
+    host=os.environ.get('WS_HOST', '0.0.0.0'),
+    port=int(os.environ.get('WS_PORT', 5001)),
+    path=os.environ.get('WS_PATH', '/ws'),
+    stats_interval=float(os.environ.get('WS_STATS_INTERVAL', 5)),
+    ping_interval=float(os.environ.get('WS_PING_INTERVAL', 30)),
+    idle_timeout=float(os.environ.get('WS_IDLE_TIMEOUT', 120))
+)
+
+# Convenience functions
+def start_realtime_hub() -> bool:
+    """Start the WebSocket hub if enabled"""
+    if os.environ.get('WS_ENABLED', 'true').lower() != 'true':
+        return False
+    return realtime_hub.start()
+
+def publish_worker_status(wallet_address: str, worker_name: str, status: str, **details):
+    """Push a worker status change to workers-channel subscribers"""
+    realtime_hub.publish_worker_status(wallet_address, worker_name, status, **details)
+
+def publish_block_found(height: int, block_hash: str, **details):
+    """Push a block-found event to pool-channel subscribers"""
+    realtime_hub.publish_block_found(height, block_hash, **details)
@@ -120,6 +120,24 @@ public class BLGVEcosystemSDK: ObservableObject {
                         }
                     }
                     
+                    group.addTask {
+                        for await update in self.realTime.subscribeToPoolStats() {
+                            continuation.yield(.poolStats(update))
+                        }
+                    }
+                    
+                    group.addTask {
+                        for await update in self.realTime.subscribeToWorkerStatus() {
+                            continuation.yield(.workerStatus(update))
+                        }
+                    }
+                    
+                    group.addTask {
+                        for await update in self.realTime.subscribeToBlocksFound() {
+                            continuation.yield(.blockFound(update))
+                        }
+                    }
+                    
                     group.addTask {
                         for await update in self.realTime.subscribeToOrderUpdates() {
                             continuation.yield(.orderUpdate(update))
@@ -253,6 +271,9 @@ public enum LogLevel {
 public enum EcosystemUpdate {
     case priceUpdate(PriceUpdate)
     case miningUpdate(MiningUpdate)
+    case poolStats(PoolStatsUpdate)
+    case workerStatus(WorkerStatusUpdate)
+    case blockFound(BlockFoundUpdate)
     case orderUpdate(OrderUpdate)
     case portfolioUpdate(PortfolioUpdate)
     case alertUpdate(AlertUpdate)
@@ -31,6 +31,12 @@ public class RealTimeManager: ObservableObject {
     private let orderUpdateSubject = PassthroughSubject<OrderUpdate, Never>()
     private let portfolioUpdateSubject = PassthroughSubject<PortfolioUpdate, Never>()
     private let alertUpdateSubject = PassthroughSubject<AlertUpdate, Never>()
+    private let poolStatsSubject = PassthroughSubject<PoolStatsUpdate, Never>()
+    private let workerStatusSubject = PassthroughSubject<WorkerStatusUpdate, Never>()
+    private let blockFoundSubject = PassthroughSubject<BlockFoundUpdate, Never>()
+    
+    /// Last full pool snapshot; "pool_stats_delta" messages are applied to it
+    private var poolStats: PoolStatsUpdate?
     
     // MARK: - Initialization
     public init() {
@@ -135,6 +141,54 @@ public class RealTimeManager: ObservableObject {
         }
     }
     
+    /// Subscribe to pool-wide statistics (full snapshot first, then changes)
+    public func subscribeToPoolStats() -> AsyncStream<PoolStatsUpdate> {
+        let subscription = MiningSubscription(includeWorkers: false, includePool: true)
+        subscribe(endpoint: "mining", subscription: subscription)
+        
+        return AsyncStream { continuation in
+            let cancellable = poolStatsSubject.sink { update in
+                continuation.yield(update)
+            }
+            
+            continuation.onTermination = { _ in
+                cancellable.cancel()
+            }
+        }
+    }
+    
+    /// Subscribe to worker online/offline changes
+    public func subscribeToWorkerStatus() -> AsyncStream<WorkerStatusUpdate> {
+        let subscription = MiningSubscription(includeWorkers: true, includePool: false)
+        subscribe(endpoint: "mining", subscription: subscription)
+        
+        return AsyncStream { continuation in
+            let cancellable = workerStatusSubject.sink { update in
+                continuation.yield(update)
+            }
+            
+            continuation.onTermination = { _ in
+                cancellable.cancel()
+            }
+        }
+    }
+    
+    /// Subscribe to blocks found by the pool
+    public func subscribeToBlocksFound() -> AsyncStream<BlockFoundUpdate> {
+        let subscription = MiningSubscription(includeWorkers: false, includePool: true)
+        subscribe(endpoint: "mining", subscription: subscription)
+        
+        return AsyncStream { continuation in
+            let cancellable = blockFoundSubject.sink { update in
+                continuation.yield(update)
+            }
+            
+            continuation.onTermination = { _ in
+                cancellable.cancel()
+            }
+        }
+    }
+    
     /// Subscribe to order updates
     public func subscribeToOrderUpdates() -> AsyncStream<OrderUpdate> {
         let subscription = OrderSubscription()
@@ -228,6 +282,33 @@ public class RealTimeManager: ObservableObject {
                     miningUpdateSubject.send(update)
                 }
                 
+            case "pool_stats":
+                if let update = try? JSONDecoder().decode(PoolStatsUpdate.self, from: realTimeMessage.data) {
+                    poolStats = update
+                    poolStatsSubject.send(update)
+                }
+                
+            case "pool_stats_delta":
+                if var update = poolStats,
+                   let delta = try? JSONDecoder().decode(PoolStatsDelta.self, from: realTimeMessage.data) {
+                    update.apply(delta)
+                    poolStats = update
+                    poolStatsSubject.send(update)
+                }
+                
+            case "worker_status":
+                if let update = try? JSONDecoder().decode(WorkerStatusUpdate.self, from: realTimeMessage.data) {
+                    workerStatusSubject.send(update)
+                }
+                
+            case "block_found":
+                if let update = try? JSONDecoder().decode(BlockFoundUpdate.self, from: realTimeMessage.data) {
+                    blockFoundSubject.send(update)
+                }
+                
+            case "pong":
+                break
+                
             case "order_update":
                 if let update = try? JSONDecoder().decode(OrderUpdate.self, from: realTimeMessage.data) {
                     orderUpdateSubject.send(update)
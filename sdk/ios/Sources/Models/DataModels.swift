@@ -304,6 +304,55 @@ public struct MiningUpdate: Codable, Identifiable {
     public let timestamp: Date
 }
 
+/// Pool-wide statistics pushed by the pool's WebSocket hub ("pool_stats")
+public struct PoolStatsUpdate: Codable {
+    public var hashrate: Double
+    public var workers: Int
+    public var blocks: Int
+    public var earnings: Double
+    public var difficulty: Double
+    public var isTestMode: Bool
+    public var timestamp: String
+    
+    /// Apply a "pool_stats_delta" message, which carries only the fields that changed
+    public mutating func apply(_ delta: PoolStatsDelta) {
+        if let value = delta.hashrate { hashrate = value }
+        if let value = delta.workers { workers = value }
+        if let value = delta.blocks { blocks = value }
+        if let value = delta.earnings { earnings = value }
+        if let value = delta.difficulty { difficulty = value }
+        if let value = delta.isTestMode { isTestMode = value }
+        if let value = delta.timestamp { timestamp = value }
+    }
+}
+
+public struct PoolStatsDelta: Codable {
+    public let hashrate: Double?
+    public let workers: Int?
+    public let blocks: Int?
+    public let earnings: Double?
+    public let difficulty: Double?
+    public let isTestMode: Bool?
+    public let timestamp: String?
+}
+
+public struct WorkerStatusUpdate: Codable, Identifiable {
+    public let id = UUID()
+    public let walletAddress: String
+    public let workerName: String
+    public let status: WorkerStats.WorkerStatus
+}
+
+public struct BlockFoundUpdate: Codable, Identifiable {
+    public let id = UUID()
+    public let height: Int
+    public let blockHash: String
+    public let walletAddress: String?
+    public let workerName: String?
+    public let reward: Int64?
+    public let foundAt: TimeInterval?
+}
+
 public struct OrderUpdate: Codable, Identifiable {
     public let id = UUID()
     public let orderId: String
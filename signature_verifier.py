@@ -0,0 +1,169 @@
+"""
+BLGV BTC Mining Pool - Signature Verification Pool
+Bitcoin message signature checks on a bounded process pool with an LRU result cache
+"""
+
+import os
+import base64
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    from bitcoin.core import Hash160
+    from bitcoin.core.key import CPubKey
+    from bitcoin.core.script import CScript
+    from bitcoin.signmessage import BitcoinMessage
+    from bitcoin.wallet import P2PKHBitcoinAddress, P2SHBitcoinAddress, P2WPKHBitcoinAddress
+    BITCOINLIB_AVAILABLE = True
+except ImportError:
+    BITCOINLIB_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class VerifierBusyError(Exception):
+    """Raised when the verification queue is full"""
+
+
+class VerificationTimeoutError(Exception):
+    """Raised when a verification does not finish in time"""
+
+
+class UnsupportedAddressError(ValueError):
+    """Raised for address types verify_message cannot check (taproot needs BIP-322)"""
+
+
+def verify_message(address: str, message: str, signature: str) -> bool:
+    """Verify a base64 compact signature (BIP-137) over a Bitcoin signed message
+
+    The public key is recovered from the signature and compared against the
+    legacy, nested-segwit and native-segwit addresses it can produce, so bc1q
+    wallets verify as well as 1... addresses. Runs inside the worker processes.
+    """
+    if not BITCOINLIB_AVAILABLE:
+        raise RuntimeError("python-bitcoinlib is not installed")
+    if address.startswith(('bc1p', 'tb1p', 'bcrt1p')):
+        raise UnsupportedAddressError("Taproot addresses require BIP-322 verification")
+
+    sig = base64.b64decode(signature)
+    pubkey = CPubKey.recover_compact(BitcoinMessage(message).GetHash(), sig)
+    if not pubkey:
+        return False
+
+    witness_program = CScript([0, Hash160(pubkey)])
+    candidates = (
+        P2PKHBitcoinAddress.from_pubkey(pubkey),
+        P2WPKHBitcoinAddress.from_scriptPubKey(witness_program),
+        P2SHBitcoinAddress.from_redeemScript(witness_program)
+    )
+    return any(str(candidate) == address for candidate in candidates)
+
+
+class SignatureVerifier:
+    """Runs verify_message off the request thread, outside the GIL"""
+
+    def __init__(self, workers: int = 2, max_pending: int = 64, timeout: float = 5.0,
+                 cache_size: int = 4096):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache_size = cache_size
+
+        self._lock = threading.Lock()
+        self._cache: 'OrderedDict[Tuple[str, str, str], bool]' = OrderedDict()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid = None
+        self.stats = {'verified': 0, 'cache_hits': 0, 'rejected_busy': 0, 'timeouts': 0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # spawn: forking a threaded web worker can copy held locks into the child
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def _cache_get(self, key) -> Optional[bool]:
+        with self._lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.stats['cache_hits'] += 1
+            return result
+
+    def _cache_put(self, key, result: bool):
+        with self._lock:
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def verify(self, address: str, message: str, signature: str) -> bool:
+        """Verify a signature, serving client retries from the LRU cache"""
+        key = (address, message, signature)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        if not self._slots.acquire(blocking=False):
+            self.stats['rejected_busy'] += 1
+            raise VerifierBusyError(f"{self.max_pending} signature verifications already pending")
+        try:
+            future = self._get_executor().submit(verify_message, address, message, signature)
+            try:
+                result = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                self.stats['timeouts'] += 1
+                raise VerificationTimeoutError(f"Signature verification exceeded {self.timeout}s")
+            except BrokenProcessPool:
+                # A worker died; start a fresh pool on the next call
+                logger.error("Signature verification pool broken, restarting")
+                self.shutdown()
+                raise
+        finally:
+            self._slots.release()
+
+        self.stats['verified'] += 1
+        self._cache_put(key, result)
+        return result
+
+    def warm_up(self):
+        """Start the worker processes ahead of the first login"""
+        executor = self._get_executor()
+        for _ in range(self.workers):
+            executor.submit(int)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, workers=self.workers, max_pending=self.max_pending,
+                        cached=len(self._cache))
+
+
+# Global verifier instance
+signature_verifier = SignatureVerifier(
+    workers=int(os.environ.get('SIGNATURE_VERIFY_WORKERS', 2)),
+    max_pending=int(os.environ.get('SIGNATURE_VERIFY_MAX_PENDING', 64)),
+    timeout=float(os.environ.get('SIGNATURE_VERIFY_TIMEOUT', 5)),
+    cache_size=int(os.environ.get('SIGNATURE_VERIFY_CACHE_SIZE', 4096))
+)
+
+# Convenience functions
+def verify_signature(address: str, message: str, signature: str) -> bool:
+    """Verify a Bitcoin message signature on the verification pool"""
+    return signature_verifier.verify(address, message, signature)
@@ -0,0 +1,3 @@
+"""
+BLGV BTC Mining Pool - Mining protocol servers
+"""
@@ -0,0 +1,98 @@
+"""
+BLGV BTC Mining Pool - Stratum Entry Point
+python -m src: one Stratum server per configured node, fed by its block templates
+
+BITCOIN_CORE_RPC_URL serves miners on STRATUM_CORE_PORT (3333) and
+BITCOIN_KNOTS_RPC_URL on STRATUM_KNOTS_PORT (3334); each node's templates are
+long-polled (plus ZMQ hashblock when BITCOIN_<NODE>_ZMQ_HASHBLOCK is set) and
+turned into jobs by its own JobManager. Block candidates from either port are
+submitted to every configured node. Accepted shares from both ports feed one
+PPLNS window, restored from its checkpoint on startup, whose split is taken
+and stored when a node accepts a block, and the PPS+ engine,
+whose balances are loaded from pps_balances and flushed back in batches; its
+block fee share starts when a node accepts the block and matures with it.
+Worker status changes and accepted blocks are sent to the web tier's
+real-time hub with NOTIFY (pool_events.py).
+
+With STRATUM_WORKERS > 1 each port is served by that many worker processes
+(StratumCluster) and this process only builds jobs, submits blocks and does
+the share accounting.
+"""
+
+import os
+import asyncio
+import logging
+
+from .bitcoin_rpc import BitcoinRPC, TemplateWatcher
+from .block_submitter import BlockSubmitter
+from .cluster import StratumCluster
+from .job_manager import JobManager
+from .pool_events import PoolEventPublisher
+from .pplns import PPLNSLedger
+from .pps import PPSEngine
+from .stratum_server import StratumServer
+
+logger = logging.getLogger(__name__)
+
+NODE_PORTS = {'core': 3333, 'knots': 3334}
+
+
+def load_ledger() -> PPLNSLedger:
+    ledger = PPLNSLedger.from_env()
+    try:
+        ledger.restore()
+        if os.environ.get('DATABASE_URL'):
+            ledger.catch_up()
+    except Exception as e:
+        logger.error(f"PPLNS window restore incomplete: {e}")
+    ledger.start()
+    return ledger
+
+
+def load_pps(ledger: PPLNSLedger) -> PPSEngine:
+    pps = PPSEngine.from_env()
+    pps.fee_weights = ledger.weights
+    if os.environ.get('DATABASE_URL'):
+        try:
+            pps.load()
+        except Exception as e:
+            logger.error(f"PPS+ balances not loaded, crediting deltas only: {e}")
+        pps.start()
+    return pps
+
+
+async def main():
+    tasks = []
+    workers = int(os.environ.get('STRATUM_WORKERS', 1))
+    ledger = load_ledger()
+    pps = load_pps(ledger)
+    events = PoolEventPublisher.from_env()
+    if events is not None:
+        events.start()
+    nodes = {node: BitcoinRPC.from_env(node) for node in NODE_PORTS}
+    nodes = {node: rpc for node, rpc in nodes.items() if rpc is not None}
+    for node, rpc in nodes.items():
+        port = int(os.environ.get(f"STRATUM_{node.upper()}_PORT", NODE_PORTS[node]))
+        server = StratumCluster(port=port, workers=workers) if workers > 1 else StratumServer(port=port)
+        manager = JobManager(server)
+        server.block_submitter = BlockSubmitter(list(nodes.values()), manager.block_hex)
+        server.block_submitter.block_callbacks += [ledger.on_block_accepted, pps.on_block_accepted]
+        if events is not None:
+            server.worker_callbacks.append(events.worker_status)
+            server.block_submitter.block_callbacks.append(events.block_found)
+        server.share_callbacks += [ledger.on_share, pps.on_share]
+        manager.template_callbacks += [lambda template: ledger.set_network_difficulty(template.difficulty),
+                                       pps.set_template]
+        tasks += [server.start(), TemplateWatcher.from_env(rpc, manager.on_template).run()]
+        logger.info(f"Serving {node} templates on port {server.port}")
+    if nodes:
+        tasks.append(pps.watch_maturity(next(iter(nodes.values()))))
+    if not tasks:
+        logger.warning("No BITCOIN_CORE_RPC_URL or BITCOIN_KNOTS_RPC_URL set, serving without templates")
+        tasks.append(StratumServer(port=int(os.environ.get('STRATUM_PORT', 3333))).start())
+    await asyncio.gather(*tasks)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+BLGV BTC Mining Pool - Block Submitter
+Fast lane for shares that meet network difficulty
+
+StratumServer hands block candidates to submit() before it replies to any
+miner or runs share accounting for the batch, and defers the rest of the
+batch by one loop iteration so the submitblock requests go out first. The block
+is sent to every configured node (Core and Knots) concurrently. Latency is
+measured from the socket read that carried the share to the node's answer;
+every millisecond here is stale-block risk.
+
+block_callbacks run once per block, with the share, when the first node
+accepts it; rewards that depend on a block being found hang off those rather
+than off the share stream, where is_block only marks a candidate.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .bitcoin_rpc import BitcoinRPC
+
+logger = logging.getLogger(__name__)
+
+
+class BlockSubmitter:
+    """Submits block candidates to all nodes at once and records how long it took"""
+
+    def __init__(self, nodes: List[BitcoinRPC], block_hex: Callable[[str, bytes, bytes], Optional[str]],
+                 history: int = 100):
+        self.nodes = nodes
+        self.block_hex = block_hex  # JobManager.block_hex
+        self.recent: deque = deque(maxlen=history)
+        self.block_callbacks: List[Callable[[Any], None]] = []
+        self._accepted = set()  # hashes block_callbacks already ran for
+        self._tasks = set()
+        self.stats = {'candidates': 0, 'accepted': 0, 'rejected': 0, 'errors': 0, 'missing_template': 0}
+
+    def submit(self, share) -> bool:
+        """Start submitting a candidate; returns False if it cannot be serialized"""
+        self.stats['candidates'] += 1
+        header, coinbase = share.block
+        block_hex = self.block_hex(share.job_id, header, coinbase)
+        if block_hex is None:
+            self.stats['missing_template'] += 1
+            logger.error(f"Block candidate {share.hash} on job {share.job_id} has no template to submit")
+            return False
+        encoded_at = time.monotonic()
+        task = asyncio.ensure_future(asyncio.gather(
+            *(self._submit_to(node, share, block_hex, encoded_at) for node in self.nodes)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _submit_to(self, node: BitcoinRPC, share, block_hex: str, encoded_at: float):
+        try:
+            reason = await node.submit_block(block_hex)
+            error = None
+        except Exception as e:
+            reason, error = None, str(e)
+        done = time.monotonic()
+        record = {
+            'hash': share.hash, 'node': node.name, 'wallet': share.wallet, 'worker': share.worker,
+            'result': 'error' if error else (reason or 'accepted'),
+            'encode_ms': round((encoded_at - share.received_at) * 1000, 3),
+            'latency_ms': round((done - share.received_at) * 1000, 3),
+            'at': time.time()
+        }
+        self.recent.append(record)
+        if error:
+            self.stats['errors'] += 1
+            logger.error(f"submitblock {share.hash} to {node.name} failed after {record['latency_ms']} ms: {error}")
+        elif reason is None:
+            self.stats['accepted'] += 1
+            logger.warning(f"Block {share.hash} accepted by {node.name}, {record['latency_ms']} ms from socket read")
+            if share.hash not in self._accepted:
+                self._accepted.add(share.hash)
+                for callback in self.block_callbacks:
+                    try:
+                        callback(share)
+                    except Exception as e:
+                        logger.error(f"Block callback failed: {e}")
+        else:
+            self.stats['rejected'] += 1
+            logger.error(f"Block {share.hash} rejected by {node.name}: {reason} ({record['latency_ms']} ms)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(record['latency_ms'] for record in self.recent)
+        return dict(
+            self.stats,
+            nodes=[node.name for node in self.nodes],
+            latency_ms_median=latencies[len(latencies) // 2] if latencies else None,
+            latency_ms_max=latencies[-1] if latencies else None,
+            recent=list(self.recent)[-10:]
+        )
@@ -0,0 +1,456 @@
+"""
+BLGV BTC Mining Pool - Stratum Cluster
+N worker processes serving one Stratum port through SO_REUSEPORT
+
+One asyncio process tops out at one core of JSON parsing and header hashing.
+StratumCluster stands in for a StratumServer in the coordinator process: the
+JobManager hands it jobs, and it fans each one out to worker processes, which
+each run a StratumServer bound to the same port with SO_REUSEPORT so the kernel
+spreads incoming miners across them. Every worker owns a disjoint slice of the
+extranonce1 space, so no two miners anywhere in the cluster can search the
+same coinbase.
+
+The bus is one multiprocessing pipe per worker. Jobs go down as constructor
+arguments pickled once for all workers. Accepted shares come up in batches
+every SHARE_BATCH_DELAY seconds and run the coordinator's share callbacks
+(spool, PPLNS, PPS+) as if they had been accepted locally; block candidates are
+sent up on their own the moment they are found and submitted from the
+coordinator, which holds the templates. Spool congestion pauses intake on
+every worker. A worker that dies is restarted on the same extranonce1 slice.
+
+Session ids start with the index of the worker that opened them, which stays
+their owner. A reconnect the kernel hashes to another worker holds the
+miner's requests and claims the session over the bus: the coordinator asks
+the owner, which hands the detached session (difficulty, vardiff window,
+identity, extranonce1) over and keeps its extranonce1 reserved; the claiming
+worker answers mining.subscribe with it. When that connection drops, the
+session goes back to the owner, where it can be resumed or expire as usual.
+A claim the owner cannot answer within SESSION_CLAIM_TIMEOUT opens a fresh
+session. Sessions handed to a worker that dies go back to their owners, and a
+worker that restarts drops the connections using sessions it used to own.
+"""
+
+import os
+import time
+import pickle
+import asyncio
+import logging
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+from .block_submitter import BlockSubmitter
+from .extranonce import MinerSession
+from .share_spool import ShareSpool
+from .stratum_server import Share, StratumConnection, StratumJob, StratumServer
+
+logger = logging.getLogger(__name__)
+
+# Seconds a worker collects accepted shares before sending them up
+SHARE_BATCH_DELAY = 0.05
+
+STATS_INTERVAL = 10.0
+
+# Seconds a reconnecting miner waits for its session to come from another worker
+SESSION_CLAIM_TIMEOUT = 2.0
+
+
+def share_to_row(share: Share) -> tuple:
+    return tuple(getattr(share, name) for name in Share.__slots__)
+
+
+def share_from_row(row: tuple) -> Share:
+    share = Share.__new__(Share)
+    for name, value in zip(Share.__slots__, row):
+        setattr(share, name, value)
+    return share
+
+
+def job_arguments(job: StratumJob) -> tuple:
+    return (job.job_id, job.prevhash, job.coinb1, job.coinb2, job.merkle_branch,
+            job.version, job.nbits, job.ntime, job.clean_jobs)
+
+
+def extranonce1_slice(index: int, workers: int) -> tuple:
+    """(first, count) of the extranonce1 values worker index may use"""
+    count = (1 << 32) // workers
+    return index * count, count
+
+
+def session_prefix(index: int) -> str:
+    return f"{index:02x}"
+
+
+def session_owner(session_id: str) -> Optional[int]:
+    """Index of the worker that opened a session, from its id"""
+    try:
+        return int(session_id[:2], 16)
+    except ValueError:
+        return None
+
+
+class WorkerProcess:
+    """Coordinator-side handle on one worker"""
+
+    __slots__ = ('index', 'process', 'pipe', 'stats', 'started_at', 'restarts')
+
+    def __init__(self, index: int):
+        self.index = index
+        self.process = None
+        self.pipe = None
+        self.stats: Dict[str, Any] = {}
+        self.started_at = 0.0
+        self.restarts = 0
+
+
+class _ForwardingSubmitter:
+    """Worker-side block_submitter: ships candidates to the coordinator immediately"""
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+        self.candidates = 0
+
+    def submit(self, share: Share) -> bool:
+        self.candidates += 1
+        self.pipe.send_bytes(pickle.dumps(('block', share_to_row(share)), pickle.HIGHEST_PROTOCOL))
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'candidates': self.candidates, 'forwarded_to': 'coordinator'}
+
+
+class StratumCluster:
+    """Coordinator for StratumServer worker processes sharing a port; a drop-in for JobManager"""
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 3333, workers: int = 2,
+                 extranonce2_size: int = 4, max_jobs: int = 8, backlog: int = 4096,
+                 spool: Optional[ShareSpool] = None):
+        self.host = host
+        self.port = port
+        self.worker_count = workers
+        self.extranonce2_size = extranonce2_size
+        self.max_jobs = max_jobs
+        self.backlog = backlog
+        self.spool = spool
+        if spool is None and os.environ.get('DATABASE_URL') and \
+                os.environ.get('STRATUM_SHARE_SPOOL', 'true').lower() == 'true':
+            self.spool = ShareSpool.from_env()
+
+        self.workers = [WorkerProcess(index) for index in range(workers)]
+        self.current_job: Optional[StratumJob] = None
+        self.block_submitter: Optional[BlockSubmitter] = None
+        self.share_callbacks: List[Callable[[Share], None]] = []
+        self.worker_callbacks: List[Callable[[str, str, str], None]] = []
+        self.intake_paused = False
+        self._context = multiprocessing.get_context('spawn')  # no inherited threads or event loop
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping = False
+        self.stats = {'jobs': 0, 'share_batches': 0, 'shares': 0, 'blocks': 0, 'worker_restarts': 0,
+                      'session_claims': 0}
+
+    # -- lifecycle
+
+    async def start(self):
+        """Spawn the workers and relay between them and the callbacks until cancelled"""
+        self._loop = asyncio.get_running_loop()
+        if self.spool is not None:
+            self.spool.on_congestion = self._spool_congestion
+            self.spool.start()
+            self.share_callbacks.append(self.spool.append)
+        for worker in self.workers:
+            self._spawn(worker)
+        logger.info(f"Stratum cluster serving {self.host}:{self.port} with {self.worker_count} workers")
+        try:
+            while True:
+                await asyncio.sleep(1)
+                for worker in self.workers:
+                    if not worker.process.is_alive() and not self._stopping:
+                        logger.error(f"Stratum worker {worker.index} exited ({worker.process.exitcode}), restarting")
+                        self._close(worker)
+                        worker.restarts += 1
+                        self.stats['worker_restarts'] += 1
+                        self._spawn(worker)
+                        for other in self.workers:
+                            if other is not worker:
+                                self._send(other, ('worker_restarted', worker.index))
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        if self._stopping:
+            return
+        self._stopping = True
+        for worker in self.workers:
+            self._send(worker, ('stop',))
+        for worker in self.workers:
+            if worker.process is not None:
+                await self._loop.run_in_executor(None, worker.process.join, 10)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+            self._close(worker)
+        if self.spool is not None:
+            await self._loop.run_in_executor(None, self.spool.stop)
+
+    def _spawn(self, worker: WorkerProcess):
+        parent, child = self._context.Pipe()
+        options = {
+            'index': worker.index, 'host': self.host, 'port': self.port, 'extranonce2_size': self.extranonce2_size,
+            'max_jobs': self.max_jobs, 'backlog': self.backlog,
+            'extranonce1_range': extranonce1_slice(worker.index, self.worker_count)
+        }
+        worker.process = self._context.Process(target=run_worker, args=(worker.index, child, options),
+                                               name=f"stratum-worker-{worker.index}", daemon=True)
+        worker.process.start()
+        child.close()
+        worker.pipe = parent
+        worker.started_at = time.time()
+        self._loop.add_reader(parent.fileno(), self._receive, worker)
+        if self.current_job is not None:
+            # A (re)started worker begins on the current job, sent as clean
+            arguments = job_arguments(self.current_job)[:-1] + (True,)
+            self._send(worker, ('job', arguments))
+        if self.intake_paused:
+            self._send(worker, ('intake', True))
+
+    def _close(self, worker: WorkerProcess):
+        if worker.pipe is not None:
+            self._loop.remove_reader(worker.pipe.fileno())
+            worker.pipe.close()
+            worker.pipe = None
+
+    # -- coordinator -> workers
+
+    def _send(self, worker: WorkerProcess, message: tuple):
+        self._send_bytes(worker, pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+    def _send_bytes(self, worker: WorkerProcess, payload: bytes):
+        if worker.pipe is None:
+            return
+        try:
+            worker.pipe.send_bytes(payload)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Stratum worker {worker.index} unreachable: {e}")
+
+    def set_job(self, job: StratumJob):
+        """Broadcast a job to every worker (JobManager entry point)"""
+        self.current_job = job
+        self.stats['jobs'] += 1
+        payload = pickle.dumps(('job', job_arguments(job)), pickle.HIGHEST_PROTOCOL)
+        for worker in self.workers:
+            self._send_bytes(worker, payload)
+
+    def _spool_congestion(self, congested: bool):
+        # Called from the spool writer thread
+        self._loop.call_soon_threadsafe(self.set_intake_paused, congested)
+
+    def set_intake_paused(self, paused: bool):
+        if paused == self.intake_paused:
+            return
+        self.intake_paused = paused
+        for worker in self.workers:
+            self._send(worker, ('intake', paused))
+
+    # -- workers -> coordinator
+
+    def _receive(self, worker: WorkerProcess):
+        try:
+            message = pickle.loads(worker.pipe.recv_bytes())
+        except (EOFError, OSError):
+            self._close(worker)  # the monitor loop restarts it
+            return
+        kind = message[0]
+        if kind == 'block':
+            share = share_from_row(message[1])
+            self.stats['blocks'] += 1
+            if self.block_submitter is not None:
+                self.block_submitter.submit(share)
+        elif kind == 'shares':
+            self.stats['share_batches'] += 1
+            self.stats['shares'] += len(message[1])
+            for row in message[1]:
+                share = share_from_row(row)
+                for callback in self.share_callbacks:
+                    try:
+                        callback(share)
+                    except Exception as e:
+                        logger.error(f"Share callback failed: {e}")
+        elif kind == 'worker':
+            for callback in self.worker_callbacks:
+                try:
+                    callback(*message[1:])
+                except Exception as e:
+                    logger.error(f"Worker status callback failed: {e}")
+        elif kind == 'session_claim':
+            # Ask the owner for the session; no owner, no session
+            self.stats['session_claims'] += 1
+            session_id = message[1]
+            owner = session_owner(session_id)
+            if owner is None or not 0 <= owner < self.worker_count or owner == worker.index or \
+                    self.workers[owner].pipe is None:
+                self._send(worker, ('session', session_id, None))
+            else:
+                self._send(self.workers[owner], ('session_release', session_id, worker.index))
+        elif kind == 'session_handover':
+            _, session_id, claimant, session = message
+            self._send(self.workers[claimant], ('session', session_id, session))
+        elif kind == 'session_return':
+            owner = session_owner(message[1].session_id)
+            if owner is not None and 0 <= owner < self.worker_count:
+                self._send(self.workers[owner], message)
+        elif kind == 'stats':
+            worker.stats = message[1]
+
+    def get_stats(self) -> Dict[str, Any]:
+        totals = {'connections': 0, 'authorized': 0, 'accepted': 0, 'rejected': 0}
+        for worker in self.workers:
+            for key in totals:
+                totals[key] += worker.stats.get(key, 0)
+        return dict(
+            self.stats,
+            **totals,
+            workers=[{'index': worker.index, 'pid': worker.process.pid if worker.process else None,
+                      'restarts': worker.restarts, 'connections': worker.stats.get('connections', 0),
+                      'accepted': worker.stats.get('accepted', 0)} for worker in self.workers],
+            current_job=self.current_job.job_id if self.current_job else None,
+            block_submitter=self.block_submitter.get_stats() if self.block_submitter else None,
+            spool=self.spool.get_stats() if self.spool else None,
+            intake_paused=self.intake_paused,
+            port=self.port
+        )
+
+
+# -- worker process
+
+def run_worker(index: int, pipe, options: Dict[str, Any]):
+    """Worker process entry point"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - worker {index} - %(levelname)s - %(message)s')
+    try:
+        asyncio.run(_serve_worker(pipe, options))
+    except KeyboardInterrupt:
+        pass
+
+
+class _WorkerServer(StratumServer):
+    """StratumServer that claims sessions other workers own instead of opening fresh ones"""
+
+    def __init__(self, index: int, send: Callable[[tuple], None], **options):
+        super().__init__(reuse_port=True, **options)
+        self.index = index
+        self.send = send
+        self.sessions.prefix = session_prefix(index)
+        self.sessions.on_return = lambda session: send(('session_return', session))
+        self.claims: Dict[str, tuple] = {}  # session id -> (conn, msg_id, params, timeout handle)
+        self.deferred_handlers['mining.subscribe'] = self.subscribe_or_claim
+
+    def subscribe_or_claim(self, conn: StratumConnection, msg_id, params: list):
+        session_id = str(params[1]) if len(params) > 1 and params[1] else ''
+        if conn.session is not None or not session_id or session_id in self.claims or \
+                session_owner(session_id) in (None, self.index):
+            conn.run_handler(self.handle_subscribe, msg_id, 'mining.subscribe', params)
+            return
+        conn.hold()
+        timeout = self._loop.call_later(SESSION_CLAIM_TIMEOUT, self.claim_answered, session_id, None)
+        self.claims[session_id] = (conn, msg_id, params, timeout)
+        self.send(('session_claim', session_id))
+
+    def claim_answered(self, session_id: str, session: Optional[MinerSession]):
+        claim = self.claims.pop(session_id, None)
+        if claim is None:
+            if session is not None:
+                self.send(('session_return', session))  # answered after the timeout
+            return
+        conn, msg_id, params, timeout = claim
+        timeout.cancel()
+        if conn.transport.is_closing():
+            if session is not None:
+                self.send(('session_return', session))
+            return
+        if session is not None:
+            conn.session = self.sessions.adopt(session)
+            conn.extranonce1 = session.extranonce1
+            self.resume_session(conn, session)
+        conn.run_handler(self.handle_subscribe, msg_id, 'mining.subscribe', params[:1])
+        conn.release()
+
+    def release_session(self, session_id: str, claimant: int):
+        """Hand one of our detached sessions to the worker a miner reconnected to"""
+        self.send(('session_handover', session_id, claimant, self.sessions.hand_over(session_id, claimant)))
+
+    def worker_restarted(self, index: int):
+        reclaimed = self.sessions.reclaim(index)
+        if reclaimed:
+            logger.info(f"Reclaimed {reclaimed} sessions from restarted worker {index}")
+        # The restarted worker no longer reserves the extranonce1 of sessions we hold for it
+        for conn in tuple(self.connections):
+            if conn.session is not None and conn.session.session_id in self.sessions.guests and \
+                    session_owner(conn.session.session_id) == index:
+                del self.sessions.guests[conn.session.session_id]
+                conn.session = None
+                conn.transport.close()
+
+
+async def _serve_worker(pipe, options: Dict[str, Any]):
+    loop = asyncio.get_running_loop()
+
+    def send(message: tuple):
+        pipe.send_bytes(pickle.dumps(message, pickle.HIGHEST_PROTOCOL))
+
+    server = _WorkerServer(send=send, **options)
+    server.spool = None  # shares are stored by the coordinator
+    server.block_submitter = _ForwardingSubmitter(pipe)
+    outbox = []
+    done = loop.create_future()
+
+    def flush_outbox():
+        if outbox:
+            rows = outbox[:]
+            outbox.clear()
+            send(('shares', rows))
+
+    def queue_share(share: Share):
+        if not outbox:
+            loop.call_later(SHARE_BATCH_DELAY, flush_outbox)
+        outbox.append(share_to_row(share))
+
+    def receive():
+        try:
+            message = pickle.loads(pipe.recv_bytes())
+        except (EOFError, OSError):
+            message = ('stop',)  # the coordinator is gone
+        kind = message[0]
+        if kind == 'job':
+            server.set_job(StratumJob(*message[1]))
+        elif kind == 'intake':
+            server.set_intake_paused(message[1])
+        elif kind == 'session_release':
+            server.release_session(message[1], message[2])
+        elif kind == 'session':
+            server.claim_answered(message[1], message[2])
+        elif kind == 'session_return':
+            server.sessions.take_back(message[1])
+        elif kind == 'worker_restarted':
+            server.worker_restarted(message[1])
+        elif kind == 'stop' and not done.done():
+            loop.remove_reader(pipe.fileno())
+            done.set_result(None)
+
+    async def report_stats():
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            send(('stats', server.get_stats()))
+
+    server.share_callbacks.append(queue_share)
+    server.worker_callbacks.append(lambda wallet, worker, status: send(('worker', wallet, worker, status)))
+    loop.add_reader(pipe.fileno(), receive)
+    serving = asyncio.ensure_future(server.start())
+    reporting = asyncio.ensure_future(report_stats())
+    await asyncio.wait([serving, done], return_when=asyncio.FIRST_COMPLETED)
+    if serving.done() and serving.exception():
+        logger.error(f"Stratum worker stopped serving: {serving.exception()}")
+    reporting.cancel()
+    serving.cancel()
+    await server.stop()
+    if outbox:
+        try:
+            flush_outbox()
+        except OSError:
+            logger.error(f"Lost {len(outbox)} shares: coordinator pipe closed")
@@ -0,0 +1,109 @@
+"""
+BLGV BTC Mining Pool - Duplicate Share Filter
+Per-job memory of submitted (extranonce1, extranonce2, ntime, nonce, version) tuples
+
+Every job gets its own container, so a job going stale frees all of its
+entries at once. Exact mode keeps a set of ints (the submission fields parsed
+as one hex number, no hashing, no false positives). Bloom mode gives each job a
+fixed-size bit array instead, so memory is capped regardless of how many
+connections submit to it; the price is a small false-positive rate (a fresh
+share rejected as a duplicate), bounded by false_positive_rate while the job
+stays under bloom_capacity shares.
+"""
+
+import sys
+import math
+from hashlib import blake2b
+from typing import Any, Dict, Union
+
+
+class BloomFilter:
+    """Fixed-size bloom filter with double hashing over one blake2b digest"""
+
+    __slots__ = ('bits', 'size', 'probes', 'count')
+
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.size = max(64, int(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.probes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def add(self, key: bytes) -> bool:
+        """Insert key; False if it was (probably) present already"""
+        digest = blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        bits = self.bits
+        size = self.size
+        present = True
+        for i in range(self.probes):
+            bit = (h1 + i * h2) % size
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        if not present:
+            self.count += 1
+        return not present
+
+
+class DuplicateFilter:
+    """Duplicate share detection keyed by job id"""
+
+    def __init__(self, mode: str = 'exact', bloom_capacity: int = 1000000, false_positive_rate: float = 1e-6):
+        if mode not in ('exact', 'bloom'):
+            raise ValueError(f"Unknown duplicate filter mode {mode}")
+        self.mode = mode
+        self.bloom_capacity = bloom_capacity
+        self.false_positive_rate = false_positive_rate
+        self._jobs: Dict[str, Union[set, BloomFilter]] = {}
+        self.duplicates = 0
+
+    def add(self, job_id: str, extranonce1: str, extranonce2: str, ntime: str, nonce: str, version: int) -> bool:
+        """Record a submission; False if the same one was already seen for this job
+
+        version is the header version the share hashes with (job version with the
+        miner's masked bits applied), so submissions that spell the same header
+        differently share one key.
+        """
+        key = f"{extranonce1}{extranonce2}{ntime}{nonce}{version:08x}"
+        seen = self._jobs.get(job_id)
+        if self.mode == 'exact':
+            if seen is None:
+                seen = self._jobs[job_id] = set()
+            value = int('1' + key, 16)  # leading 1 keeps extranonce1 leading zeros significant
+            if value in seen:
+                self.duplicates += 1
+                return False
+            seen.add(value)
+            return True
+        if seen is None:
+            seen = self._jobs[job_id] = BloomFilter(self.bloom_capacity, self.false_positive_rate)
+        if not seen.add(key.lower().encode('ascii')):
+            self.duplicates += 1
+            return False
+        return True
+
+    def drop(self, job_id: str):
+        self._jobs.pop(job_id, None)
+
+    def clear(self):
+        self._jobs.clear()
+
+    def tracked(self) -> int:
+        return sum(len(seen) if isinstance(seen, set) else seen.count for seen in self._jobs.values())
+
+    def memory_bytes(self) -> int:
+        total = 0
+        for seen in self._jobs.values():
+            if isinstance(seen, set):
+                # Container plus int objects (sampled, every key has the same width)
+                sample = next(iter(seen), 0)
+                total += sys.getsizeof(seen) + len(seen) * sys.getsizeof(sample)
+            else:
+                total += sys.getsizeof(seen.bits)
+        return total
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'mode': self.mode, 'jobs': len(self._jobs), 'tracked': self.tracked(),
+                'duplicates': self.duplicates, 'memory_bytes': self.memory_bytes()}
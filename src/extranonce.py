@@ -0,0 +1,203 @@
+"""
+BLGV BTC Mining Pool - Extranonce1 Sessions
+Bitmap extranonce1 allocation and resumable mining sessions
+
+Every subscription gets an extranonce1 from a bitmap over this process's slice
+of the extranonce1 space (one bit per value, 128 KiB for a million
+sessions) and a random subscription id. When the connection drops, its session
+is kept detached for ttl seconds with the extranonce1 still reserved, along
+with the difficulty, vardiff window and worker identity. A mining.subscribe
+that passes that subscription id back (params[1], as cgminer and its
+descendants do) picks the session up where it left off: the same coinbase
+space, no vardiff ramp from the default difficulty, and shares found for the
+previous connection's jobs still accepted. Expired sessions free their bit.
+
+Several processes can share one session space (see cluster.py): session ids
+start with the table's prefix, which names the owner. The owner can hand a
+detached session over to another table, which adopts it as a guest; the
+owner keeps the extranonce1 reserved while it is away, and the guest gives
+the session back through on_return when its connection drops, so detached
+sessions, and their expiry, always live with the owner.
+"""
+
+import os
+import time
+import random
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_CAPACITY = 1 << 20
+
+
+class Extranonce1Exhausted(Exception):
+    """Every extranonce1 in the slice is attached or reserved"""
+
+
+class Extranonce1Allocator:
+    """One bit per extranonce1 value of a contiguous block"""
+
+    def __init__(self, first: int = 0, count: int = 1 << 32, capacity: int = DEFAULT_CAPACITY):
+        size = min(count, capacity)
+        # A random block of the slice, so a restarted process does not hand out the previous values again
+        self.base = first + random.randrange(count - size + 1)
+        self.size = size
+        self.bitmap = bytearray((size + 7) // 8)
+        if size % 8:
+            self.bitmap[-1] = 0xff << (size % 8) & 0xff  # padding bits count as taken
+        self.used = 0
+        self._cursor = 0  # byte to look at first
+
+    def allocate(self) -> int:
+        if self.used >= self.size:
+            raise Extranonce1Exhausted(f"all {self.size} extranonce1 values in use")
+        bitmap = self.bitmap
+        length = len(bitmap)
+        index = self._cursor
+        while bitmap[index] == 0xff:
+            index = (index + 1) % length
+        byte = bitmap[index]
+        bit = (~byte & (byte + 1)).bit_length() - 1  # lowest clear bit
+        bitmap[index] = byte | (1 << bit)
+        self._cursor = index
+        self.used += 1
+        return self.base + index * 8 + bit
+
+    def release(self, value: int):
+        slot = value - self.base
+        mask = 1 << (slot & 7)
+        if 0 <= slot < self.size and self.bitmap[slot >> 3] & mask:
+            self.bitmap[slot >> 3] &= ~mask
+            self.used -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'used': self.used, 'capacity': self.size, 'bitmap_bytes': len(self.bitmap)}
+
+
+class MinerSession:
+    """What a reconnecting miner gets back"""
+
+    __slots__ = ('session_id', 'extranonce1', 'difficulty', 'vardiff', 'wallet', 'worker',
+                 'attached', 'detached_at')
+
+    def __init__(self, session_id: str, extranonce1: str):
+        self.session_id = session_id
+        self.extranonce1 = extranonce1
+        self.difficulty = 0.0
+        self.vardiff = None
+        self.wallet = ''
+        self.worker = ''
+        self.attached = True
+        self.detached_at = 0.0
+
+
+class SessionTable:
+    """Sessions by subscription id; detached ones expire after ttl seconds"""
+
+    def __init__(self, allocator: Extranonce1Allocator, ttl: float = 600.0, prefix: str = ''):
+        self.allocator = allocator
+        self.ttl = ttl
+        self.prefix = prefix
+        self.sessions: Dict[str, MinerSession] = {}
+        self.detached: 'OrderedDict[str, MinerSession]' = OrderedDict()  # oldest first
+        self.away: Dict[str, Any] = {}  # session id -> holder, for sessions handed over
+        self.guests: Dict[str, MinerSession] = {}  # sessions adopted from another table
+        self.on_return: Optional[Callable[[MinerSession], None]] = None
+        self.stats = {'opened': 0, 'resumed': 0, 'expired': 0, 'evicted': 0,
+                      'handed_over': 0, 'adopted': 0, 'returned': 0}
+
+    def open(self) -> MinerSession:
+        try:
+            value = self.allocator.allocate()
+        except Extranonce1Exhausted:
+            if not self.detached:
+                raise
+            # Give up the longest-detached session's reservation
+            self._expire(next(iter(self.detached)))
+            self.stats['evicted'] += 1
+            value = self.allocator.allocate()
+        session = MinerSession(self.prefix + os.urandom(8 - len(self.prefix) // 2).hex(), f"{value:08x}")
+        self.sessions[session.session_id] = session
+        self.stats['opened'] += 1
+        return session
+
+    def resume(self, session_id: str) -> Optional[MinerSession]:
+        """Reattach a detached session, or None if it is unknown, expired or in use"""
+        session = self.detached.pop(session_id, None)
+        if session is None:
+            return None
+        session.attached = True
+        self.stats['resumed'] += 1
+        return session
+
+    def detach(self, session: MinerSession, difficulty: float, vardiff, wallet: str, worker: str):
+        session.difficulty = difficulty
+        session.vardiff = vardiff
+        session.wallet = wallet
+        session.worker = worker
+        session.attached = False
+        session.detached_at = time.monotonic()
+        if self.guests.pop(session.session_id, None) is not None:
+            self.stats['returned'] += 1
+            if self.on_return is not None:
+                self.on_return(session)
+            return
+        self.detached[session.session_id] = session
+
+    def hand_over(self, session_id: str, holder) -> Optional[MinerSession]:
+        """Give a detached session to another table; its extranonce1 stays reserved here"""
+        session = self.detached.pop(session_id, None)
+        if session is None:
+            return None
+        self.away[session_id] = holder
+        self.stats['handed_over'] += 1
+        return session
+
+    def adopt(self, session: MinerSession) -> MinerSession:
+        """Attach a session handed over by its owner"""
+        session.attached = True
+        self.guests[session.session_id] = session
+        self.stats['adopted'] += 1
+        return session
+
+    def take_back(self, session: MinerSession) -> bool:
+        """A handed-over session's connection dropped; keep it detached here again"""
+        if self.away.pop(session.session_id, None) is None:
+            return False  # not ours (any more): this table was recreated since
+        self.sessions[session.session_id] = session
+        self.detached[session.session_id] = session
+        return True
+
+    def reclaim(self, holder) -> int:
+        """Detach every session handed over to a holder that is gone"""
+        now = time.monotonic()
+        reclaimed = 0
+        for session_id in [key for key, value in self.away.items() if value == holder]:
+            del self.away[session_id]
+            session = self.sessions[session_id]
+            session.attached = False
+            session.detached_at = now
+            self.detached[session_id] = session
+            reclaimed += 1
+        return reclaimed
+
+    def expire(self, now: Optional[float] = None) -> int:
+        cutoff = (time.monotonic() if now is None else now) - self.ttl
+        expired = 0
+        while self.detached:
+            session_id, session = next(iter(self.detached.items()))
+            if session.detached_at > cutoff:
+                break
+            self._expire(session_id)
+            expired += 1
+        self.stats['expired'] += expired
+        return expired
+
+    def _expire(self, session_id: str):
+        session = self.detached.pop(session_id)
+        del self.sessions[session_id]
+        self.allocator.release(int(session.extranonce1, 16))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, attached=len(self.sessions) - len(self.detached) - len(self.away) + len(self.guests),
+                    detached=len(self.detached), away=len(self.away), guests=len(self.guests),
+                    extranonce1=self.allocator.get_stats())
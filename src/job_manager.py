@@ -0,0 +1,224 @@
+"""
+BLGV BTC Mining Pool - Job Manager
+Turns getblocktemplate results into Stratum jobs, once per template
+
+Coinbase halves, merkle branch and the header fields are derived once when a
+template arrives; the resulting StratumJob encodes its mining.notify line once
+and StratumServer.set_job writes those same bytes to every miner. A new
+previousblockhash produces a clean_jobs notify; refreshes on the same tip
+reuse the template's coinbase and branch with a new ntime.
+"""
+
+import os
+import time
+import logging
+import itertools
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .share_validator import DIFF1_TARGET, sha256d, target_from_nbits
+from .stratum_server import StratumJob, StratumServer
+
+logger = logging.getLogger(__name__)
+
+POOL_TAG = b'/BLGV/'
+
+_BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+_BECH32_CHARSET = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+_BECH32M_CONST = 0x2bc830a3
+
+
+def _bech32_polymod(values: List[int]) -> int:
+    generator = (0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            checksum ^= generator[i] if (top >> i) & 1 else 0
+    return checksum
+
+
+def _bech32_decode(address: str) -> Tuple[int, bytes]:
+    address = address.lower()
+    hrp, _, data_part = address.rpartition('1')
+    data = [_BECH32_CHARSET.index(c) for c in data_part]
+    check = _bech32_polymod([ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp] + data)
+    version = data[0]
+    if check != (1 if version == 0 else _BECH32M_CONST):
+        raise ValueError('Invalid bech32 checksum')
+    accumulator, bits, program = 0, 0, bytearray()
+    for value in data[1:-6]:
+        accumulator = (accumulator << 5) | value
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            program.append((accumulator >> bits) & 0xff)
+    if not 2 <= len(program) <= 40:
+        raise ValueError('Invalid witness program length')
+    return version, bytes(program)
+
+
+def _base58check_decode(address: str) -> bytes:
+    value = 0
+    for c in address:
+        value = value * 58 + _BASE58_ALPHABET.index(c)
+    raw = value.to_bytes(25, 'big')
+    if sha256d(raw[:-4])[:4] != raw[-4:]:
+        raise ValueError('Invalid base58 checksum')
+    return raw[:-4]
+
+
+def address_to_script(address: str) -> bytes:
+    """scriptPubKey for a P2PKH, P2SH or segwit (v0/v1) address"""
+    if address.lower().startswith(('bc1', 'tb1', 'bcrt1')):
+        version, program = _bech32_decode(address)
+        return bytes([version + 0x50 if version else 0, len(program)]) + program
+    payload = _base58check_decode(address)
+    if payload[0] in (0x00, 0x6f):
+        return b'\x76\xa9\x14' + payload[1:] + b'\x88\xac'
+    if payload[0] in (0x05, 0xc4):
+        return b'\xa9\x14' + payload[1:] + b'\x87'
+    raise ValueError(f"Unsupported address version {payload[0]}")
+
+
+def varint(n: int) -> bytes:
+    if n < 0xfd:
+        return bytes([n])
+    if n <= 0xffff:
+        return b'\xfd' + n.to_bytes(2, 'little')
+    if n <= 0xffffffff:
+        return b'\xfe' + n.to_bytes(4, 'little')
+    return b'\xff' + n.to_bytes(8, 'little')
+
+
+def script_number(n: int) -> bytes:
+    """BIP34 height push: minimal CScriptNum with its push opcode"""
+    encoded = bytearray()
+    while n:
+        encoded.append(n & 0xff)
+        n >>= 8
+    if encoded and encoded[-1] & 0x80:
+        encoded.append(0)
+    return bytes([len(encoded)]) + bytes(encoded)
+
+
+def merkle_branch(txids: List[bytes]) -> List[bytes]:
+    """Stratum merkle branch for the coinbase (leaf 0) over internal-order txids"""
+    branch = []
+    level = [None] + txids
+    while len(level) > 1:
+        branch.append(level[1])
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [None] + [sha256(sha256(level[i] + level[i + 1]).digest()).digest()
+                          for i in range(2, len(level), 2)]
+    return branch
+
+
+class Template:
+    """The job-independent parts of one getblocktemplate result"""
+
+    __slots__ = ('height', 'prevhash', 'stratum_prevhash', 'version', 'nbits', 'coinb1', 'coinb2',
+                 'branch', 'transaction_count', 'transactions_hex', 'segwit', 'mintime', 'difficulty',
+                 'received_at')
+
+    def __init__(self, template: Dict[str, Any], payout_script: bytes, extranonce_size: int,
+                 pool_tag: bytes = POOL_TAG):
+        self.height = template['height']
+        self.prevhash = template['previousblockhash']
+        internal = bytes.fromhex(self.prevhash)[::-1]
+        self.stratum_prevhash = b''.join(internal[i:i + 4][::-1] for i in range(0, 32, 4)).hex()
+        self.version = f"{template['version']:08x}"
+        self.nbits = template['bits']
+        self.difficulty = DIFF1_TARGET / target_from_nbits(self.nbits)
+        self.mintime = template.get('mintime', 0)
+        transactions = template.get('transactions', ())
+        self.transaction_count = len(transactions)
+        # Ready for submitblock, so a found block only needs its header and coinbase encoded
+        self.transactions_hex = ''.join(tx['data'] for tx in transactions)
+        self.segwit = 'default_witness_commitment' in template
+        self.received_at = time.monotonic()
+
+        height_push = script_number(self.height)
+        tag_push = bytes([len(pool_tag)]) + pool_tag
+        script_length = len(height_push) + 1 + extranonce_size + len(tag_push)
+        if script_length > 100:
+            raise ValueError('Coinbase scriptSig over 100 bytes')
+        outputs = [template['coinbasevalue'].to_bytes(8, 'little') + varint(len(payout_script)) + payout_script]
+        if self.segwit:
+            commitment = bytes.fromhex(template['default_witness_commitment'])
+            outputs.append(bytes(8) + varint(len(commitment)) + commitment)
+
+        self.coinb1 = (b'\x02\x00\x00\x00' + b'\x01' + bytes(32) + b'\xff\xff\xff\xff' +
+                       varint(script_length) + height_push + bytes([extranonce_size])).hex()
+        self.coinb2 = (tag_push + b'\xff\xff\xff\xff' + varint(len(outputs)) + b''.join(outputs) +
+                       bytes(4)).hex()
+        txids = [bytes.fromhex(tx.get('txid') or tx['hash'])[::-1] for tx in transactions]
+        self.branch = [h.hex() for h in merkle_branch(txids)]
+
+
+class JobManager:
+    """Builds jobs from block templates and hands them to a StratumServer"""
+
+    def __init__(self, server: StratumServer, payout_script: Optional[bytes] = None, pool_tag: bytes = POOL_TAG):
+        if payout_script is None:
+            payout_script = address_to_script(os.environ['POOL_PAYOUT_ADDRESS'])
+        self.server = server
+        self.payout_script = payout_script
+        self.pool_tag = pool_tag
+        self.extranonce_size = 4 + server.extranonce2_size
+        self.template: Optional[Template] = None
+        self.templates: 'OrderedDict[str, Template]' = OrderedDict()  # job id -> template, for submitblock
+        self.template_callbacks: List[Callable[[Template], None]] = []
+        self._job_ids = itertools.count(1)
+        self.stats = {'templates': 0, 'refreshes': 0, 'last_build_ms': 0.0}
+
+    def on_template(self, template: Dict[str, Any]) -> StratumJob:
+        """Build and broadcast a job for a new getblocktemplate result"""
+        start = time.perf_counter()
+        clean = self.template is None or template['previousblockhash'] != self.template.prevhash
+        self.template = Template(template, self.payout_script, self.extranonce_size, self.pool_tag)
+        self.stats['templates'] += 1
+        self.stats['last_build_ms'] = (time.perf_counter() - start) * 1000
+        job = self._job(self.template, max(template.get('curtime', int(time.time())), self.template.mintime), clean)
+        for callback in self.template_callbacks:
+            try:
+                callback(self.template)
+            except Exception as e:
+                logger.error(f"Template callback failed: {e}")
+        if clean:
+            logger.info(f"New block template at height {self.template.height}, {self.template.transaction_count} txs")
+        return job
+
+    def refresh(self) -> Optional[StratumJob]:
+        """Re-issue the current template with a fresh ntime (no new transactions)"""
+        if self.template is None:
+            return None
+        self.stats['refreshes'] += 1
+        return self._job(self.template, max(int(time.time()), self.template.mintime), False)
+
+    def _job(self, template: Template, ntime: int, clean: bool) -> StratumJob:
+        job = StratumJob(f"{next(self._job_ids):x}", template.stratum_prevhash, template.coinb1, template.coinb2,
+                         template.branch, template.version, template.nbits, f"{ntime:08x}", clean)
+        if clean:
+            self.templates.clear()
+        self.templates[job.job_id] = template
+        while len(self.templates) > self.server.max_jobs:
+            self.templates.popitem(last=False)
+        self.server.set_job(job)
+        return job
+
+    def block_hex(self, job_id: str, header: bytes, coinbase: bytes) -> Optional[str]:
+        """Serialized block for submitblock, or None if the job's template is gone"""
+        template = self.templates.get(job_id)
+        if template is None:
+            return None
+        if template.segwit:
+            # Coinbase witness: one 32-byte reserved value, as the commitment assumes
+            coinbase = coinbase[:4] + b'\x00\x01' + coinbase[4:-4] + b'\x01\x20' + bytes(32) + coinbase[-4:]
+        return (header + varint(template.transaction_count + 1) + coinbase).hex() + template.transactions_hex
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, height=self.template.height if self.template else None)
@@ -0,0 +1,574 @@
+"""
+BLGV BTC Mining Pool - SV2 Noise Transport
+Noise_NX_Secp256k1+EllSwift_ChaChaPoly_SHA256 handshake and encrypted SV2 frames
+
+The pool is the Noise responder. Its static key is certified by the pool
+authority key: the certificate (SIGNATURE_NOISE_MESSAGE) is signed once when
+ServerKeys is created and again only when it expires, so the authority key
+is read once per process and a handshake never signs anything. Ephemeral keys
+are EllSwift keypairs pre-generated by an EphemeralKeyPool thread. The rest of
+the responder's work, two X-only ECDHs (BIP324 hash, about 60 us each) and the
+hashing and AEAD around them, runs on a pool of handshake_threads threads:
+the libsecp256k1 calls release the GIL, so handshakes use every core while the
+event loop keeps serving frames. Past what one process can do, run a
+NoiseServer per worker process on one port with reuse_port.
+
+After the handshake each direction has one CipherState that wraps a single
+ChaCha20Poly1305 object for the life of the connection; only the nonce
+counter changes per message. Each SV2 frame goes out as its encrypted 6-byte
+header (22 bytes) followed by the payload encrypted in chunks of up to 65519
+bytes, each with its own 16-byte tag.
+
+Needs coincurve built with libsecp256k1's ellswift module (coincurve >= 21
+bundles it) and cryptography; without them NOISE_AVAILABLE is False and
+ServerKeys and NoiseServer raise NoiseError.
+"""
+
+import os
+import time
+import hmac
+import struct
+import asyncio
+import hashlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from .sv2 import HEADER, HEADER_SIZE, Sv2Error, Sv2Message
+
+try:
+    from coincurve import PrivateKey, PublicKeyXOnly
+    from coincurve._libsecp256k1 import ffi, lib
+    from coincurve.context import GLOBAL_CONTEXT
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+    NOISE_AVAILABLE = hasattr(lib, 'secp256k1_ellswift_xdh')
+except ImportError:
+    InvalidTag = ValueError  # only used in except clauses
+    NOISE_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_NAME = b'Noise_NX_Secp256k1+EllSwift_ChaChaPoly_SHA256'
+ELLSWIFT_SIZE = 64
+MAC_SIZE = 16
+CERTIFICATE = struct.Struct('<HII')  # version, valid_from, not_valid_after (then a 64-byte signature)
+CERTIFICATE_SIZE = CERTIFICATE.size + 64
+INITIATOR_MESSAGE_SIZE = ELLSWIFT_SIZE
+RESPONDER_MESSAGE_SIZE = ELLSWIFT_SIZE + ELLSWIFT_SIZE + MAC_SIZE + CERTIFICATE_SIZE + MAC_SIZE
+MAX_CHUNK = 65535 - MAC_SIZE
+ENCRYPTED_HEADER_SIZE = HEADER_SIZE + MAC_SIZE
+
+
+class NoiseError(Exception):
+    """Handshake or decryption failure; the connection must be dropped"""
+
+
+def require_noise():
+    if not NOISE_AVAILABLE:
+        raise NoiseError('SV2 Noise needs coincurve with the libsecp256k1 ellswift module, and cryptography')
+
+
+# -- secp256k1 primitives (libsecp256k1 through coincurve)
+
+def ellswift_create() -> Tuple[bytes, bytes]:
+    """New (secret key, 64-byte EllSwift public key)"""
+    secret = os.urandom(32)
+    encoded = ffi.new('unsigned char[64]')
+    if not lib.secp256k1_ellswift_create(GLOBAL_CONTEXT.ctx, encoded, secret, os.urandom(32)):
+        return ellswift_create()  # secret outside the curve order, ~2^-128
+    return secret, bytes(ffi.buffer(encoded, 64))
+
+
+def ellswift_xdh(ell_a: bytes, ell_b: bytes, secret: bytes, initiator: bool) -> bytes:
+    """BIP324 X-only ECDH; ell_a is always the initiator's key"""
+    output = ffi.new('unsigned char[32]')
+    if not lib.secp256k1_ellswift_xdh(GLOBAL_CONTEXT.ctx, output, ell_a, ell_b, secret, 0 if initiator else 1,
+                                      lib.secp256k1_ellswift_xdh_hash_function_bip324, ffi.NULL):
+        raise NoiseError('ECDH failed')
+    return bytes(ffi.buffer(output, 32))
+
+
+def ellswift_xonly(encoded: bytes) -> bytes:
+    """X coordinate of an EllSwift-encoded public key"""
+    pubkey = ffi.new('secp256k1_pubkey *')
+    lib.secp256k1_ellswift_decode(GLOBAL_CONTEXT.ctx, pubkey, encoded)
+    output = ffi.new('unsigned char[33]')
+    length = ffi.new('size_t *', 33)
+    lib.secp256k1_ec_pubkey_serialize(GLOBAL_CONTEXT.ctx, output, length, pubkey, lib.SECP256K1_EC_COMPRESSED)
+    return bytes(ffi.buffer(output, 33))[1:]
+
+
+def xonly_public_key(secret: bytes) -> bytes:
+    return PublicKeyXOnly.from_secret(secret).format()
+
+
+def schnorr_sign(secret: bytes, digest: bytes) -> bytes:
+    return PrivateKey(secret).sign_schnorr(digest, os.urandom(32))
+
+
+def schnorr_verify(xonly: bytes, signature: bytes, digest: bytes) -> bool:
+    return PublicKeyXOnly(xonly).verify(signature, digest)
+
+
+# -- Noise symmetric state
+
+def _hkdf(chaining_key: bytes, material: bytes) -> Tuple[bytes, bytes]:
+    temp_key = hmac.digest(chaining_key, material, 'sha256')
+    first = hmac.digest(temp_key, b'\x01', 'sha256')
+    return first, hmac.digest(temp_key, first + b'\x02', 'sha256')
+
+
+class CipherState:
+    """One direction of an encrypted session: a reused AEAD object and its nonce counter"""
+
+    __slots__ = ('aead', 'nonce')
+
+    def __init__(self, key: bytes):
+        self.aead = ChaCha20Poly1305(key)
+        self.nonce = 0
+
+    def encrypt(self, plaintext: bytes, associated_data: bytes = b'') -> bytes:
+        nonce = b'\x00\x00\x00\x00' + self.nonce.to_bytes(8, 'little')
+        self.nonce += 1
+        return self.aead.encrypt(nonce, plaintext, associated_data)
+
+    def decrypt(self, ciphertext, associated_data: bytes = b'') -> bytes:
+        nonce = b'\x00\x00\x00\x00' + self.nonce.to_bytes(8, 'little')
+        self.nonce += 1
+        try:
+            return self.aead.decrypt(nonce, ciphertext, associated_data)
+        except InvalidTag:
+            raise NoiseError('authentication tag mismatch')
+
+
+_INITIAL_HASH = hashlib.sha256(PROTOCOL_NAME).digest()  # the name is longer than HASHLEN
+_INITIAL_H = hashlib.sha256(_INITIAL_HASH).digest()  # MixHash(empty prologue)
+
+
+class SymmetricState:
+    """Noise h / ck / k during a handshake"""
+
+    __slots__ = ('h', 'ck', 'cipher')
+
+    def __init__(self):
+        self.h = _INITIAL_H
+        self.ck = _INITIAL_HASH
+        self.cipher: Optional[CipherState] = None
+
+    def mix_hash(self, data: bytes):
+        self.h = hashlib.sha256(self.h + data).digest()
+
+    def mix_key(self, material: bytes):
+        self.ck, key = _hkdf(self.ck, material)
+        self.cipher = CipherState(key)
+
+    def encrypt_and_hash(self, plaintext: bytes) -> bytes:
+        ciphertext = self.cipher.encrypt(plaintext, self.h) if self.cipher else plaintext
+        self.mix_hash(ciphertext)
+        return ciphertext
+
+    def decrypt_and_hash(self, ciphertext: bytes) -> bytes:
+        plaintext = self.cipher.decrypt(ciphertext, self.h) if self.cipher else ciphertext
+        self.mix_hash(ciphertext)
+        return plaintext
+
+    def split(self) -> Tuple[CipherState, CipherState]:
+        """(initiator -> responder, responder -> initiator)"""
+        first, second = _hkdf(self.ck, b'')
+        return CipherState(first), CipherState(second)
+
+
+def certificate_digest(version: int, valid_from: int, not_valid_after: int, static_xonly: bytes) -> bytes:
+    return hashlib.sha256(CERTIFICATE.pack(version, valid_from, not_valid_after) + static_xonly).digest()
+
+
+# -- keys
+
+class ServerKeys:
+    """Authority-certified static key of the pool; the certificate is signed once and cached"""
+
+    def __init__(self, authority_secret: bytes, static_secret: Optional[bytes] = None,
+                 certificate_validity: int = 365 * 86400):
+        require_noise()
+        self.authority_secret = authority_secret
+        self.authority_public = xonly_public_key(authority_secret)
+        if static_secret is None:
+            static_secret, self.static_public = ellswift_create()
+        else:
+            self.static_public = self._encode_static(static_secret)
+        self.static_secret = static_secret
+        self.static_xonly = ellswift_xonly(self.static_public)
+        self.certificate_validity = certificate_validity
+        self.certificate = b''
+        self.certificate_expires = 0
+        self.certify()
+
+    @staticmethod
+    def _encode_static(secret: bytes) -> bytes:
+        encoded = ffi.new('unsigned char[64]')
+        if not lib.secp256k1_ellswift_create(GLOBAL_CONTEXT.ctx, encoded, secret, os.urandom(32)):
+            raise NoiseError('invalid static secret key')
+        return bytes(ffi.buffer(encoded, 64))
+
+    @classmethod
+    def from_env(cls) -> 'ServerKeys':
+        """SV2_AUTHORITY_SECRET_KEY (hex) or SV2_AUTHORITY_KEY_FILE, optional SV2_STATIC_SECRET_KEY"""
+        authority = os.environ.get('SV2_AUTHORITY_SECRET_KEY')
+        if not authority and os.environ.get('SV2_AUTHORITY_KEY_FILE'):
+            with open(os.environ['SV2_AUTHORITY_KEY_FILE']) as f:
+                authority = f.read().strip()
+        if not authority:
+            raise NoiseError('SV2_AUTHORITY_SECRET_KEY or SV2_AUTHORITY_KEY_FILE must be set')
+        static = os.environ.get('SV2_STATIC_SECRET_KEY')
+        return cls(bytes.fromhex(authority), bytes.fromhex(static) if static else None,
+                   int(os.environ.get('SV2_CERTIFICATE_VALIDITY', 365 * 86400)))
+
+    def certify(self):
+        valid_from = int(time.time()) - 60
+        not_valid_after = valid_from + self.certificate_validity
+        signature = schnorr_sign(self.authority_secret,
+                                 certificate_digest(0, valid_from, not_valid_after, self.static_xonly))
+        self.certificate = CERTIFICATE.pack(0, valid_from, not_valid_after) + signature
+        self.certificate_expires = not_valid_after
+        logger.info(f"SV2 static key {self.static_xonly.hex()} certified by authority "
+                    f"{self.authority_public.hex()} until {not_valid_after}")
+
+    def current_certificate(self) -> bytes:
+        if time.time() > self.certificate_expires - 3600:
+            self.certify()
+        return self.certificate
+
+
+class EphemeralKeyPool:
+    """Ephemeral EllSwift keypairs generated ahead of time by a background thread"""
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self.low_water = size // 2
+        self._keys: deque = deque()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.stats = {'generated': 0, 'taken': 0, 'misses': 0}
+
+    def start(self):
+        """Start the generator thread for this process (idempotent, fork-aware)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._keys.clear()  # never share ephemeral keys with a parent process
+        self._thread = threading.Thread(target=self._run, name='noise-ephemeral-keys', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            while len(self._keys) < self.size:
+                self._keys.append(ellswift_create())
+                self.stats['generated'] += 1
+            self._wakeup.wait()
+            self._wakeup.clear()
+
+    def take(self) -> Tuple[bytes, bytes]:
+        self.stats['taken'] += 1
+        if len(self._keys) <= self.low_water:
+            self._wakeup.set()
+        try:
+            return self._keys.popleft()
+        except IndexError:
+            self.stats['misses'] += 1
+            return ellswift_create()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, ready=len(self._keys))
+
+
+# -- handshake
+
+def respond(keys: ServerKeys, ephemeral: Tuple[bytes, bytes], message) -> Tuple[bytes, CipherState, CipherState]:
+    """Responder side of NX: (reply, receive cipher, send cipher) for the initiator's 64-byte message"""
+    if len(message) != INITIATOR_MESSAGE_SIZE:
+        raise NoiseError(f"expected a {INITIATOR_MESSAGE_SIZE}-byte handshake message, got {len(message)}")
+    remote_ephemeral = bytes(message)
+    state = SymmetricState()
+    state.mix_hash(remote_ephemeral)
+    state.mix_hash(b'')  # DecryptAndHash of the empty payload, no key yet
+    secret, public = ephemeral
+    state.mix_hash(public)
+    state.mix_key(ellswift_xdh(remote_ephemeral, public, secret, initiator=False))
+    encrypted_static = state.encrypt_and_hash(keys.static_public)
+    state.mix_key(ellswift_xdh(remote_ephemeral, keys.static_public, keys.static_secret, initiator=False))
+    encrypted_certificate = state.encrypt_and_hash(keys.current_certificate())
+    receive, send = state.split()
+    return public + encrypted_static + encrypted_certificate, receive, send
+
+
+class NoiseInitiator:
+    """Client side of NX (proxies, tests and benchmarks); checks the pool's certificate"""
+
+    __slots__ = ('authority_public', 'state', 'secret', 'public', 'server_static')
+
+    def __init__(self, authority_public: bytes, ephemeral: Optional[Tuple[bytes, bytes]] = None):
+        self.authority_public = authority_public
+        self.state = SymmetricState()
+        self.secret, self.public = ephemeral or ellswift_create()
+        self.server_static: Optional[bytes] = None
+
+    def start(self) -> bytes:
+        self.state.mix_hash(self.public)
+        self.state.encrypt_and_hash(b'')
+        return self.public
+
+    def finish(self, reply) -> Tuple[CipherState, CipherState]:
+        """(send cipher, receive cipher) once the responder's message checks out"""
+        if len(reply) != RESPONDER_MESSAGE_SIZE:
+            raise NoiseError(f"expected a {RESPONDER_MESSAGE_SIZE}-byte handshake reply, got {len(reply)}")
+        reply = bytes(reply)
+        state = self.state
+        remote_ephemeral = reply[:ELLSWIFT_SIZE]
+        state.mix_hash(remote_ephemeral)
+        state.mix_key(ellswift_xdh(self.public, remote_ephemeral, self.secret, initiator=True))
+        static_end = ELLSWIFT_SIZE * 2 + MAC_SIZE
+        remote_static = state.decrypt_and_hash(reply[ELLSWIFT_SIZE:static_end])
+        state.mix_key(ellswift_xdh(self.public, remote_static, self.secret, initiator=True))
+        certificate = state.decrypt_and_hash(reply[static_end:])
+        version, valid_from, not_valid_after = CERTIFICATE.unpack_from(certificate)
+        now = time.time()
+        if not valid_from <= now <= not_valid_after:
+            raise NoiseError('pool certificate is not valid now')
+        self.server_static = ellswift_xonly(remote_static)
+        digest = certificate_digest(version, valid_from, not_valid_after, self.server_static)
+        if not schnorr_verify(self.authority_public, certificate[CERTIFICATE.size:], digest):
+            raise NoiseError('pool certificate is not signed by the authority key')
+        return state.split()
+
+
+# -- encrypted frames
+
+def encrypted_payload_size(length: int) -> int:
+    return length + MAC_SIZE * -(-length // MAX_CHUNK)
+
+
+def encrypt_frame(cipher: CipherState, frame: bytes) -> bytes:
+    """Encrypt one plaintext SV2 frame (header and payload) for the wire"""
+    parts = [cipher.encrypt(frame[:HEADER_SIZE])]
+    for offset in range(HEADER_SIZE, len(frame), MAX_CHUNK):
+        parts.append(cipher.encrypt(frame[offset:offset + MAX_CHUNK]))
+    return b''.join(parts)
+
+
+class NoiseFrameReader:
+    """Receive buffer for BufferedProtocol that yields decrypted frames"""
+
+    __slots__ = ('cipher', 'buffer', 'view', 'filled', '_header')
+
+    def __init__(self, cipher: CipherState, size: int = 2 * 65536):
+        self.cipher = cipher
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+        self._header: Optional[Tuple[int, int, int]] = None  # decrypted, waiting for its payload
+
+    def get_buffer(self) -> memoryview:
+        return self.view[self.filled:]
+
+    def frames(self, nbytes: int) -> Iterator[Tuple[int, int, memoryview]]:
+        """(extension_type, msg_type, payload) for every frame completed by this read"""
+        self.filled += nbytes
+        view = self.view
+        decrypt = self.cipher.decrypt
+        offset = 0
+        try:
+            while True:
+                if self._header is None:
+                    if self.filled - offset < ENCRYPTED_HEADER_SIZE:
+                        break
+                    extension, msg_type, low, high = HEADER.unpack(decrypt(view[offset:offset + ENCRYPTED_HEADER_SIZE]))
+                    offset += ENCRYPTED_HEADER_SIZE
+                    self._header = (extension, msg_type, low | high << 16)
+                extension, msg_type, length = self._header
+                size = encrypted_payload_size(length)
+                if self.filled - offset < size:
+                    if size > len(self.buffer):
+                        raise Sv2Error(f"frame of {size} bytes exceeds the receive buffer")
+                    break
+                if length <= MAX_CHUNK:
+                    payload = decrypt(view[offset:offset + size]) if length else b''
+                else:
+                    end = offset + size
+                    payload = b''.join(decrypt(view[start:min(start + MAX_CHUNK + MAC_SIZE, end)])
+                                       for start in range(offset, end, MAX_CHUNK + MAC_SIZE))
+                offset += size
+                self._header = None
+                yield extension, msg_type, memoryview(payload)
+        finally:
+            remaining = self.filled - offset
+            if offset and remaining:
+                view[:remaining] = view[offset:self.filled]
+            self.filled = remaining
+
+
+# -- asyncio server side
+
+class NoiseConnection(asyncio.BufferedProtocol):
+    """SV2 connection: Noise handshake, then decrypted frames handed to the server's frame handler"""
+
+    __slots__ = ('server', 'transport', 'handshake', 'handshake_filled', 'reader', 'send_cipher',
+                 'accepted_at', 'peer')
+
+    def __init__(self, server: 'NoiseServer'):
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.handshake = bytearray(INITIATOR_MESSAGE_SIZE)
+        self.handshake_filled = 0
+        self.reader: Optional[NoiseFrameReader] = None
+        self.send_cipher: Optional[CipherState] = None
+        self.accepted_at = time.monotonic()
+        self.peer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer = transport.get_extra_info('peername')
+        self.server.connections.add(self)
+        self.server.handshaking.add(self)
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+        self.server.handshaking.discard(self)
+        if self.reader is not None:
+            self.server.on_close(self)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self.reader is None:
+            return memoryview(self.handshake)[self.handshake_filled:]
+        return self.reader.get_buffer()
+
+    def buffer_updated(self, nbytes: int):
+        if self.reader is not None:
+            try:
+                for extension, msg_type, payload in self.reader.frames(nbytes):
+                    self.server.on_frame(self, extension, msg_type, payload)
+            except (NoiseError, Sv2Error) as e:
+                logger.debug(f"Dropping SV2 connection {self.peer}: {e}")
+                self.transport.abort()
+            return
+        self.handshake_filled += nbytes
+        if self.handshake_filled == INITIATOR_MESSAGE_SIZE:
+            self.server.complete_handshake(self)
+
+    def send(self, message: Sv2Message):
+        self.write_frame(message.encode())
+
+    def write_frame(self, frame: bytes):
+        if not self.transport.is_closing():
+            self.transport.write(encrypt_frame(self.send_cipher, frame))
+
+
+class NoiseServer:
+    """Accepts SV2 connections; on_frame(conn, extension, msg_type, payload) sees plaintext frames"""
+
+    def __init__(self, keys: ServerKeys, host: str = '0.0.0.0', port: int = 3336,
+                 on_frame: Optional[Callable[[NoiseConnection, int, int, memoryview], None]] = None,
+                 backlog: int = 4096, key_pool_size: int = 4096, handshake_timeout: float = 5.0,
+                 handshake_threads: Optional[int] = None, reuse_port: bool = False):
+        require_noise()
+        self.keys = keys
+        self.host = host
+        self.port = port
+        self.backlog = backlog
+        self.reuse_port = reuse_port  # several worker processes listening on one port
+        # Default: one per core; 0 (the default on a single core) runs respond() on the event loop
+        if handshake_threads is None:
+            handshake_threads = os.cpu_count() or 1
+            handshake_threads = handshake_threads if handshake_threads > 1 else 0
+        self.handshake_threads = handshake_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.on_frame = on_frame or (lambda conn, extension, msg_type, payload: None)
+        self.on_close: Callable[[NoiseConnection], None] = lambda conn: None
+        self.ephemeral_keys = EphemeralKeyPool(key_pool_size)
+        self.connections = set()
+        self.handshaking = set()  # connected, handshake not finished
+        self.handshake_timeout = handshake_timeout
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.stats = {'handshakes': 0, 'handshake_failures': 0, 'handshake_timeouts': 0, 'handshake_us_total': 0.0}
+
+    async def start(self):
+        """Listen and serve until cancelled"""
+        self.ephemeral_keys.start()
+        self._loop = asyncio.get_running_loop()
+        if self.handshake_threads and self._executor is None:
+            self._executor = ThreadPoolExecutor(self.handshake_threads, thread_name_prefix='noise-handshake')
+        self._server = await self._loop.create_server(
+            lambda: NoiseConnection(self), self.host, self.port, reuse_address=True, reuse_port=self.reuse_port,
+            backlog=self.backlog)
+        logger.info(f"SV2 (Noise) listening on {self.host}:{self.port}, authority {self.keys.authority_public.hex()}")
+        sweeping = asyncio.ensure_future(self._sweep_loop())
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            sweeping.cancel()
+
+    async def _sweep_loop(self):
+        # Connections that never send their handshake would otherwise stay open for good
+        interval = min(1.0, self.handshake_timeout / 2)
+        while True:
+            await asyncio.sleep(interval)
+            cutoff = time.monotonic() - self.handshake_timeout
+            for conn in tuple(self.handshaking):
+                if conn.accepted_at < cutoff:
+                    self.handshaking.discard(conn)
+                    self.stats['handshake_timeouts'] += 1
+                    conn.transport.abort()
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for conn in tuple(self.connections):
+            conn.transport.close()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def complete_handshake(self, conn: NoiseConnection):
+        started = time.perf_counter()
+        arguments = (self.keys, self.ephemeral_keys.take(), bytes(conn.handshake))
+        if self._executor is None:
+            try:
+                result = respond(*arguments)
+            except NoiseError as e:
+                result = e
+            self._finish_handshake(conn, started, result)
+            return
+        conn.transport.pause_reading()  # nothing more is expected until our reply
+        future = self._loop.run_in_executor(self._executor, respond, *arguments)
+        future.add_done_callback(
+            lambda done: self._finish_handshake(conn, started, done.exception() or done.result()))
+
+    def _finish_handshake(self, conn: NoiseConnection, started: float, result):
+        if isinstance(result, BaseException):
+            self.stats['handshake_failures'] += 1
+            logger.debug(f"SV2 handshake with {conn.peer} failed: {result}")
+            conn.transport.abort()
+            return
+        if conn.transport.is_closing():
+            return  # timed out or hung up while we were computing
+        reply, receive, send = result
+        self.handshaking.discard(conn)
+        conn.handshake = None
+        conn.reader = NoiseFrameReader(receive)
+        conn.send_cipher = send
+        conn.transport.write(reply)
+        conn.transport.resume_reading()
+        self.stats['handshakes'] += 1
+        self.stats['handshake_us_total'] += (time.perf_counter() - started) * 1e6
+
+    def get_stats(self) -> Dict[str, Any]:
+        handshakes = self.stats['handshakes']
+        return dict(self.stats, connections=len(self.connections), handshaking=len(self.handshaking),
+                    handshake_threads=self.handshake_threads, ephemeral_keys=self.ephemeral_keys.get_stats(),
+                    handshake_us_mean=self.stats['handshake_us_total'] / handshakes if handshakes else None)
@@ -0,0 +1,96 @@
+"""
+BLGV BTC Mining Pool - Pool Events
+Worker status changes and accepted blocks, sent to the web tier with NOTIFY
+
+The Stratum process and the Flask workers that hold the WebSocket clients are
+different processes. PoolEventPublisher is a StratumServer worker callback and
+a BlockSubmitter block callback; it queues each event and a thread sends it
+as pg_notify(POOL_EVENTS_CHANNEL, <json>), which every realtime hub LISTENs on.
+The event loop never waits on Postgres; if the queue fills up (database down),
+events are dropped and counted.
+"""
+
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+import psycopg2
+
+from .pplns import coinbase_height, coinbase_value
+
+logger = logging.getLogger(__name__)
+
+POOL_EVENTS_CHANNEL = 'pool_events'
+
+
+class PoolEventPublisher:
+    """Fire-and-forget NOTIFY of pool events"""
+
+    def __init__(self, dsn: Optional[str] = None, max_queue: int = 10000):
+        self.dsn = dsn
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self.stats = {'published': 0, 'dropped': 0, 'errors': 0}
+
+    @classmethod
+    def from_env(cls) -> Optional['PoolEventPublisher']:
+        if not os.environ.get('DATABASE_URL'):
+            return None
+        return cls(os.environ['DATABASE_URL'])
+
+    def start(self):
+        """Start the sender thread for this process (idempotent, fork-aware)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='pool-events', daemon=True)
+        self._thread.start()
+
+    # -- callbacks (event loop)
+
+    def worker_status(self, wallet: str, worker: str, status: str):
+        """StratumServer worker callback"""
+        self._put({'type': 'worker_status', 'walletAddress': wallet, 'workerName': worker, 'status': status})
+
+    def block_found(self, share):
+        """BlockSubmitter block callback"""
+        coinbase = share.block[1]
+        self._put({'type': 'block_found', 'height': coinbase_height(coinbase), 'blockHash': share.hash,
+                   'walletAddress': share.wallet, 'workerName': share.worker,
+                   'reward': coinbase_value(coinbase), 'foundAt': share.submitted_at})
+
+    def _put(self, event: Dict[str, Any]):
+        try:
+            self._queue.put_nowait(json.dumps(event, separators=(',', ':')))
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    # -- sender thread
+
+    def _run(self):
+        conn = None
+        while True:
+            payload = self._queue.get()
+            try:
+                if conn is None or conn.closed:
+                    conn = psycopg2.connect(self.dsn, connect_timeout=5)
+                    conn.autocommit = True
+                cursor = conn.cursor()
+                cursor.execute("SELECT pg_notify(%s, %s)", (POOL_EVENTS_CHANNEL, payload))
+                cursor.close()
+                self.stats['published'] += 1
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Pool event not published: {e}")
+                if conn is not None:
+                    conn.close()
+                conn = None
+                time.sleep(1.0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, queued=self._queue.qsize())
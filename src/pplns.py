@@ -0,0 +1,337 @@
+"""
+BLGV BTC Mining Pool - PPLNS Ledger
+Difficulty-weighted window over the last N shares with O(1) updates (1.5% fee)
+
+The window (window_factor x network difficulty, in difficulty-1 shares) is a
+ring of slices, each holding the per-wallet difficulty of about window/slices
+worth of shares. Adding a share touches the open slice and the running
+per-wallet totals; a slice that falls out of the window is subtracted once, so
+every share is added and removed exactly once. When a node accepts a block the
+pool found (BlockSubmitter block callback; is_block on a share only marks a
+candidate) the split is read straight off the running totals (the oldest slice
+counted only for the part still inside the window) and kept, per block hash,
+in pplns_block_splits.
+
+The ring is checkpointed to disk by a background thread, which also writes the
+block splits, and on restart rebuilt from the checkpoint plus the shares table
+rows written after it. Without a checkpoint nothing is replayed: streaming the
+whole shares table would hold up startup, and the window refills from live
+shares.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+logger = logging.getLogger(__name__)
+
+PPLNS_SPLITS_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS pplns_block_splits (
+        block_hash VARCHAR(64) PRIMARY KEY,
+        height INTEGER NOT NULL,
+        reward_sats BIGINT NOT NULL,
+        pool_fee_sats BIGINT NOT NULL,
+        payouts JSONB NOT NULL,
+        shares_weight DOUBLE PRECISION NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+
+def coinbase_value(coinbase: bytes) -> int:
+    """Total output value of a (non-witness) coinbase transaction in satoshis"""
+    offset = 4 + 1 + 36  # version, input count, null prevout
+    offset += 1 + coinbase[offset] + 4  # scriptSig (always < 0xfd bytes) and sequence
+    outputs = coinbase[offset]
+    offset += 1
+    value = 0
+    for _ in range(outputs):
+        value += int.from_bytes(coinbase[offset:offset + 8], 'little')
+        offset += 8 + 1 + coinbase[offset + 8]
+    return value
+
+
+def coinbase_height(coinbase: bytes) -> int:
+    """Block height from the BIP34 push at the start of the coinbase scriptSig"""
+    offset = 4 + 1 + 36 + 1  # version, input count, null prevout, scriptSig length
+    push = coinbase[offset]
+    if 0x51 <= push <= 0x60:  # OP_1..OP_16
+        return push - 0x50
+    return int.from_bytes(coinbase[offset + 1:offset + 1 + push], 'little')
+
+
+class Slice:
+    """Per-wallet difficulty of consecutive shares"""
+
+    __slots__ = ('weights', 'total', 'last_share_at')
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None, last_share_at: float = 0.0):
+        self.weights: Dict[str, float] = weights or {}
+        self.total = sum(self.weights.values())
+        self.last_share_at = last_share_at
+
+
+class PPLNSLedger:
+    """Running PPLNS window and payout split"""
+
+    def __init__(self, window_factor: float = 2.0, slices: int = 1024, fee: float = 0.015,
+                 checkpoint_path: Optional[str] = None, checkpoint_interval: float = 60.0,
+                 dsn: Optional[str] = None):
+        self.window_factor = window_factor
+        self.slice_count = slices
+        self.fee = fee
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.dsn = dsn
+        self.window = 0.0  # difficulty-1 shares; 0 until the network difficulty is known
+        self.slices: deque = deque()
+        self.current = Slice()
+        self.totals: Dict[str, float] = {}
+        self.total = 0.0
+        self.last_split: Optional[Dict[str, Any]] = None
+        self._new_splits: Dict[str, Dict[str, Any]] = {}  # block hash -> split, not yet in pplns_block_splits
+        self._installed = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._dirty = False
+        self.stats = {'shares': 0, 'evicted_slices': 0, 'blocks': 0, 'checkpoints': 0,
+                      'splits_saved': 0, 'split_errors': 0}
+
+    @classmethod
+    def from_env(cls) -> 'PPLNSLedger':
+        return cls(
+            window_factor=float(os.environ.get('PPLNS_WINDOW_FACTOR', 2.0)),
+            fee=float(os.environ.get('PPLNS_FEE', 0.015)),
+            checkpoint_path=os.environ.get('PPLNS_CHECKPOINT', 'data/pplns.json'),
+            dsn=os.environ.get('DATABASE_URL')
+        )
+
+    # -- window
+
+    def set_network_difficulty(self, difficulty: float):
+        window = self.window_factor * difficulty
+        if window != self.window:
+            with self._lock:
+                self.window = window
+                self._evict()
+
+    def add_share(self, wallet: str, difficulty: float, submitted_at: float = 0.0):
+        with self._lock:
+            current = self.current
+            current.weights[wallet] = current.weights.get(wallet, 0.0) + difficulty
+            current.total += difficulty
+            current.last_share_at = submitted_at
+            self.totals[wallet] = self.totals.get(wallet, 0.0) + difficulty
+            self.total += difficulty
+            self.stats['shares'] += 1
+            self._dirty = True
+            if self.window and current.total >= self.window / self.slice_count:
+                self.slices.append(current)
+                self.current = Slice()
+                self._evict()
+
+    def on_share(self, share):
+        """StratumServer share callback"""
+        self.add_share(share.wallet, share.difficulty, share.submitted_at)
+
+    def on_block_accepted(self, share):
+        """BlockSubmitter block callback: a node accepted the block this share found"""
+        coinbase = share.block[1]
+        split = self.split(coinbase_value(coinbase))
+        split['height'] = coinbase_height(coinbase)
+        with self._lock:
+            self._new_splits[share.hash] = split
+        self.stats['blocks'] += 1
+        logger.info(f"PPLNS split for block {share.hash}: {len(split['payouts'])} wallets, "
+                    f"{split['reward'] - split['pool_fee']} sats to miners, {split['pool_fee']} pool fee")
+
+    def _evict(self):
+        """Drop slices that lie entirely outside the window (caller holds the lock)"""
+        if not self.window:
+            return
+        while self.slices and self.total - self.slices[0].total >= self.window:
+            oldest = self.slices.popleft()
+            for wallet, weight in oldest.weights.items():
+                remaining = self.totals[wallet] - weight
+                if remaining <= 1e-9:
+                    del self.totals[wallet]
+                else:
+                    self.totals[wallet] = remaining
+            self.total -= oldest.total
+            self.stats['evicted_slices'] += 1
+
+    # -- payouts
+
+    def weights(self) -> Dict[str, float]:
+        """Per-wallet difficulty inside the window"""
+        with self._lock:
+            weights = dict(self.totals)
+            excess = self.total - self.window if self.window else 0.0
+            if excess > 0 and self.slices:
+                oldest = self.slices[0]
+                outside = excess / oldest.total
+                for wallet, weight in oldest.weights.items():
+                    weights[wallet] -= weight * outside
+        return {wallet: weight for wallet, weight in weights.items() if weight > 1e-9}
+
+    def split(self, reward_sats: int) -> Dict[str, Any]:
+        """Divide a block reward (subsidy + fees) over the window, after the pool fee"""
+        weights = self.weights()
+        total = sum(weights.values())
+        distributable = int(reward_sats * (1 - self.fee))
+        payouts = {}
+        if total > 0:
+            payouts = {wallet: int(distributable * weight / total) for wallet, weight in weights.items()}
+        pool_fee = reward_sats - sum(payouts.values())  # rounding dust stays with the pool
+        self.last_split = {'reward': reward_sats, 'pool_fee': pool_fee, 'payouts': payouts,
+                           'window': self.window, 'shares_weight': total, 'at': time.time()}
+        return self.last_split
+
+    def share_of(self, wallet: str) -> float:
+        """Fraction of the next block reward the wallet would currently receive"""
+        with self._lock:
+            total = self.total
+            weight = self.totals.get(wallet, 0.0)
+        return weight / total if total else 0.0
+
+    # -- checkpoints
+
+    def start(self):
+        """Start the checkpoint thread for this process (idempotent, fork-aware)"""
+        if not self.checkpoint_path and not self.dsn:
+            return
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pplns-checkpoint', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(10)
+        self.checkpoint()
+        self.save_splits()
+
+    def _run(self):
+        while not self._stop.wait(self.checkpoint_interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logger.error(f"PPLNS checkpoint failed: {e}")
+            self.save_splits()
+
+    def save_splits(self) -> bool:
+        """Write block splits to pplns_block_splits; False if they were kept for a retry"""
+        with self._lock:
+            splits, self._new_splits = self._new_splits, {}
+        if not splits or not self.dsn:
+            return True
+        try:
+            conn = psycopg2.connect(self.dsn, connect_timeout=5)
+            try:
+                cursor = conn.cursor()
+                if not self._installed:
+                    cursor.execute(PPLNS_SPLITS_TABLE_SQL)
+                execute_values(cursor, "INSERT INTO pplns_block_splits (block_hash, height, reward_sats, "
+                                       "pool_fee_sats, payouts, shares_weight) VALUES %s "
+                                       "ON CONFLICT (block_hash) DO NOTHING",
+                               [(block_hash, split['height'], split['reward'], split['pool_fee'],
+                                 json.dumps(split['payouts']), split['shares_weight'])
+                                for block_hash, split in splits.items()])
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._lock:
+                for block_hash, split in splits.items():
+                    self._new_splits.setdefault(block_hash, split)
+            self.stats['split_errors'] += 1
+            logger.error(f"PPLNS block splits not saved, keeping {len(splits)} for a retry: {e}")
+            return False
+        self._installed = True
+        self.stats['splits_saved'] += len(splits)
+        return True
+
+    def checkpoint(self):
+        if not self.checkpoint_path or not self._dirty:
+            return
+        with self._lock:
+            # Slices are never modified once closed; only the open one needs copying
+            state = {
+                'window': self.window,
+                'slices': [(s.weights, s.last_share_at) for s in self.slices],
+                'current': (dict(self.current.weights), self.current.last_share_at),
+                'saved_at': time.time()
+            }
+            self._dirty = False
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        self.stats['checkpoints'] += 1
+
+    def restore(self) -> bool:
+        """Load the last checkpoint; False if there is none"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return False
+        with open(self.checkpoint_path) as f:
+            state = json.load(f)
+        with self._lock:
+            self.window = state['window']
+            self.slices = deque(Slice(weights, last_share_at) for weights, last_share_at in state['slices'])
+            self.current = Slice(*state['current'])
+            self.totals = {}
+            for piece in list(self.slices) + [self.current]:
+                for wallet, weight in piece.weights.items():
+                    self.totals[wallet] = self.totals.get(wallet, 0.0) + weight
+            self.total = sum(piece.total for piece in self.slices) + self.current.total
+        logger.info(f"PPLNS window restored: {len(self.slices)} slices, {len(self.totals)} wallets")
+        return True
+
+    def last_share_at(self) -> float:
+        return self.current.last_share_at or (self.slices[-1].last_share_at if self.slices else 0.0)
+
+    def catch_up(self, dsn: Optional[str] = None) -> int:
+        """Replay shares stored after the checkpoint from the shares table"""
+        since = self.last_share_at()
+        if not since:
+            logger.info("PPLNS window has no checkpoint, starting empty instead of replaying every share")
+            return 0
+        conn = psycopg2.connect(dsn or self.dsn or os.environ.get('DATABASE_URL'))
+        try:
+            cursor = conn.cursor(name='pplns_catch_up')  # server-side cursor, streams rows
+            cursor.itersize = 10000
+            cursor.execute("""
+                SELECT wallet_address, difficulty, EXTRACT(EPOCH FROM submitted_at)
+                FROM shares WHERE submitted_at > to_timestamp(%s) ORDER BY id
+            """, (since,))
+            replayed = 0
+            for wallet, difficulty, submitted_at in cursor:
+                self.add_share(wallet, difficulty, float(submitted_at))
+                replayed += 1
+            cursor.close()
+        finally:
+            conn.close()
+        logger.info(f"PPLNS window caught up with {replayed} shares from the database")
+        return replayed
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, window=self.window, total=self.total, wallets=len(self.totals),
+                    slices=len(self.slices), last_split=self.last_split, unsaved_splits=len(self._new_splits))
@@ -0,0 +1,308 @@
+"""
+BLGV BTC Mining Pool - PPS+ Engine
+Per-share expected-value credits plus transaction-fee share on found blocks (2% fee)
+
+Every accepted share is credited its expected value straight away:
+difficulty / network difficulty x block subsidy, less the pool fee. When a
+node accepts a block the pool found (BlockSubmitter block callback, not the
+share stream, where is_block only marks a candidate), the transaction fees in
+its coinbase (less the pool fee) are divided over the recent shares by
+difficulty - the PPLNS window when one is wired in, otherwise the shares since
+the previous block. That fee share is held as immature credits, kept in
+pps_immature_blocks, until watch_maturity sees the block COINBASE_MATURITY
+deep in the node's main chain; an orphaned block's credits are dropped.
+
+Credits only touch in-memory dicts on the event loop. A flush thread upserts
+the accumulated per-wallet deltas into pps_balances in one statement per
+batch; a failed flush merges its deltas back for the next attempt. Balances are
+kept in satoshis with fractional parts (a share is worth far less than one).
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from .pplns import coinbase_height, coinbase_value
+
+logger = logging.getLogger(__name__)
+
+HALVING_INTERVAL = 210000
+COINBASE_MATURITY = 100
+
+PPS_BALANCES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS pps_balances (
+        wallet_address VARCHAR(100) PRIMARY KEY,
+        balance_sats NUMERIC NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+    CREATE INDEX IF NOT EXISTS pps_balances_updated_at ON pps_balances (updated_at);
+    CREATE TABLE IF NOT EXISTS pps_immature_blocks (
+        block_hash VARCHAR(64) PRIMARY KEY,
+        height INTEGER NOT NULL,
+        credits JSONB NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+"""
+
+UPSERT_SQL = """
+    INSERT INTO pps_balances (wallet_address, balance_sats, updated_at) VALUES %s
+    ON CONFLICT (wallet_address) DO UPDATE
+    SET balance_sats = pps_balances.balance_sats + EXCLUDED.balance_sats, updated_at = NOW()
+"""
+
+
+def block_subsidy(height: int) -> int:
+    """Block subsidy in satoshis at a given height"""
+    halvings = height // HALVING_INTERVAL
+    return 0 if halvings >= 64 else (50 * 100000000) >> halvings
+
+
+class PPSEngine:
+    """Running PPS+ balances with write-behind to Postgres"""
+
+    def __init__(self, dsn: Optional[str] = None, fee: float = 0.02, flush_interval: float = 5.0,
+                 fee_weights: Optional[Callable[[], Dict[str, float]]] = None):
+        self.dsn = dsn
+        self.fee = fee
+        self.flush_interval = flush_interval
+        self.fee_weights = fee_weights  # e.g. PPLNSLedger.weights
+        self.network_difficulty = 0.0
+        self.height = 0
+        self.subsidy = 0
+        self.credit_per_difficulty = 0.0  # sats per difficulty-1 share, after the fee
+        self.balances: Dict[str, float] = {}
+        self.round_weights: Dict[str, float] = {}
+        self.last_block: Optional[Dict[str, Any]] = None
+        self.immature: Dict[str, Dict[str, Any]] = {}  # block hash -> {'height', 'credits'}
+        self._pending: Dict[str, float] = {}
+        self._new_immature: Dict[str, Dict[str, Any]] = {}
+        self._resolved = set()  # immature blocks matured or orphaned since the last flush
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._installed = False
+        self.stats = {'shares': 0, 'uncredited': 0, 'credited_sats': 0.0, 'fee_share_sats': 0,
+                      'blocks': 0, 'matured': 0, 'orphaned': 0, 'flushes': 0, 'flushed_wallets': 0,
+                      'flush_errors': 0, 'last_error': None}
+
+    @classmethod
+    def from_env(cls) -> 'PPSEngine':
+        return cls(
+            fee=float(os.environ.get('PPS_FEE', 0.02)),
+            flush_interval=float(os.environ.get('PPS_FLUSH_INTERVAL', 5.0))
+        )
+
+    # -- credits (event loop)
+
+    def set_template(self, template):
+        """JobManager template callback: tracks network difficulty and subsidy"""
+        if template.difficulty != self.network_difficulty or template.height != self.height:
+            self.height = template.height
+            self.network_difficulty = template.difficulty
+            self.subsidy = block_subsidy(template.height)
+            self.credit_per_difficulty = self.subsidy * (1 - self.fee) / template.difficulty
+
+    def on_share(self, share):
+        """StratumServer share callback"""
+        self.stats['shares'] += 1
+        if not self.credit_per_difficulty:
+            self.stats['uncredited'] += 1
+        else:
+            credit = share.difficulty * self.credit_per_difficulty
+            self.stats['credited_sats'] += credit
+            self._credit(share.wallet, credit)
+        self.round_weights[share.wallet] = self.round_weights.get(share.wallet, 0.0) + share.difficulty
+
+    def on_block_accepted(self, share):
+        """BlockSubmitter block callback: a node accepted the block this share found"""
+        coinbase = share.block[1]
+        self.on_block(share.hash, coinbase_value(coinbase), coinbase_height(coinbase))
+
+    def on_block(self, block_hash: str, reward_sats: int, height: int):
+        """Divide the block's transaction fees over recent shares, as immature credits"""
+        weights = self.fee_weights() if self.fee_weights else self.round_weights
+        self.round_weights = {}
+        fees = max(0, reward_sats - block_subsidy(height))
+        distributable = int(fees * (1 - self.fee))
+        total = sum(weights.values())
+        credits = {}
+        if total > 0 and distributable:
+            for wallet, weight in weights.items():
+                amount = int(distributable * weight / total)
+                if amount:
+                    credits[wallet] = amount
+        distributed = sum(credits.values())
+        self.stats['blocks'] += 1
+        self.stats['fee_share_sats'] += distributed
+        self.last_block = {'hash': block_hash, 'height': height, 'reward': reward_sats, 'fees': fees,
+                           'fee_share': distributed, 'wallets': len(credits), 'at': time.time()}
+        if credits:
+            block = {'height': height, 'credits': credits}
+            with self._lock:
+                self.immature[block_hash] = block
+                self._new_immature[block_hash] = block
+        logger.info(f"PPS+ fee share for block {block_hash}: {distributed} sats over {len(credits)} wallets, "
+                    f"immature until {COINBASE_MATURITY} confirmations")
+
+    def mature(self, block_hash: str):
+        """Credit an immature block's fee share to balances"""
+        with self._lock:
+            block = self.immature.pop(block_hash, None)
+            if block is None:
+                return
+            self._new_immature.pop(block_hash, None)
+            self._resolved.add(block_hash)
+            # Under the same lock as _resolved, so one flush carries both the credits and the row delete
+            for wallet, sats in block['credits'].items():
+                self.balances[wallet] = self.balances.get(wallet, 0.0) + sats
+                self._pending[wallet] = self._pending.get(wallet, 0.0) + sats
+        self.stats['matured'] += 1
+        logger.info(f"PPS+ fee share for block {block_hash} matured: {sum(block['credits'].values())} sats")
+
+    def orphan(self, block_hash: str):
+        """Drop an immature block's fee share: the block left the main chain"""
+        with self._lock:
+            block = self.immature.pop(block_hash, None)
+            if block is None:
+                return
+            self._new_immature.pop(block_hash, None)
+            self._resolved.add(block_hash)
+        self.stats['orphaned'] += 1
+        logger.warning(f"PPS+ fee share for block {block_hash} dropped: block orphaned")
+
+    async def watch_maturity(self, rpc, interval: float = 300.0):
+        """Mature or drop immature fee shares as the node's chain moves on"""
+        while True:
+            for block_hash in list(self.immature):
+                try:
+                    header = await rpc.call('getblockheader', block_hash)
+                except Exception as e:
+                    logger.warning(f"PPS+ maturity check for {block_hash} failed: {e}")
+                    continue
+                confirmations = header.get('confirmations', 0)
+                if confirmations < 0:
+                    self.orphan(block_hash)
+                elif confirmations >= COINBASE_MATURITY:
+                    self.mature(block_hash)
+            await asyncio.sleep(interval)
+
+    def _credit(self, wallet: str, sats: float):
+        with self._lock:
+            self.balances[wallet] = self.balances.get(wallet, 0.0) + sats
+            self._pending[wallet] = self._pending.get(wallet, 0.0) + sats
+
+    def get_balance(self, wallet: str) -> float:
+        """Balance in satoshis as of the last load plus everything credited since"""
+        return self.balances.get(wallet, 0.0)
+
+    def get_immature(self, wallet: str) -> int:
+        """Fee share in satoshis waiting on block maturity"""
+        return sum(block['credits'].get(wallet, 0) for block in tuple(self.immature.values()))
+
+    # -- persistence
+
+    def load(self) -> int:
+        """Seed in-memory balances from pps_balances; returns the number of wallets"""
+        conn = psycopg2.connect(self.dsn or os.environ.get('DATABASE_URL'), connect_timeout=5)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(PPS_BALANCES_TABLE_SQL)
+            cursor.execute("SELECT wallet_address, balance_sats FROM pps_balances")
+            rows = cursor.fetchall()
+            cursor.execute("SELECT block_hash, height, credits FROM pps_immature_blocks")
+            immature = cursor.fetchall()
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+        self._installed = True
+        with self._lock:
+            for wallet, balance in rows:
+                # Credits taken before the load are still pending and not in the table yet
+                self.balances[wallet] = float(balance) + self._pending.get(wallet, 0.0)
+            for block_hash, height, credits in immature:
+                if block_hash not in self._resolved:
+                    self.immature.setdefault(block_hash, {'height': height, 'credits': credits})
+        logger.info(f"PPS+ balances loaded for {len(rows)} wallets, {len(immature)} immature blocks")
+        return len(rows)
+
+    def start(self):
+        """Start the flush thread for this process (idempotent, fork-aware)"""
+        if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pps-flush', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def flush(self) -> bool:
+        """Write accumulated deltas in one upsert; False if they were kept for a retry"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            new_immature, self._new_immature = self._new_immature, {}
+            resolved, self._resolved = self._resolved, set()
+        if not (pending or new_immature or resolved):
+            return True
+        try:
+            conn = psycopg2.connect(self.dsn or os.environ.get('DATABASE_URL'), connect_timeout=5)
+            try:
+                cursor = conn.cursor()
+                if not self._installed:
+                    cursor.execute(PPS_BALANCES_TABLE_SQL)
+                if pending:
+                    execute_values(cursor, UPSERT_SQL, list(pending.items()),
+                                   template="(%s, %s, NOW())", page_size=1000)
+                if new_immature:
+                    execute_values(cursor, "INSERT INTO pps_immature_blocks (block_hash, height, credits) VALUES %s "
+                                           "ON CONFLICT (block_hash) DO NOTHING",
+                                   [(block_hash, block['height'], json.dumps(block['credits']))
+                                    for block_hash, block in new_immature.items()])
+                if resolved:
+                    # Same transaction as the matured credits, so a block is credited exactly once
+                    cursor.execute("DELETE FROM pps_immature_blocks WHERE block_hash = ANY(%s)", (list(resolved),))
+                conn.commit()
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            with self._lock:
+                for wallet, sats in pending.items():
+                    self._pending[wallet] = self._pending.get(wallet, 0.0) + sats
+                for block_hash, block in new_immature.items():
+                    if block_hash in self.immature:
+                        self._new_immature[block_hash] = block
+                self._resolved |= resolved
+            self.stats['flush_errors'] += 1
+            if str(e) != self.stats['last_error']:
+                logger.error(f"PPS+ balance flush failed, keeping {len(pending)} wallet deltas: {e}")
+            self.stats['last_error'] = str(e)
+            return False
+        self._installed = True
+        self.stats['flushes'] += 1
+        self.stats['flushed_wallets'] += len(pending)
+        self.stats['last_error'] = None
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, fee=self.fee, network_difficulty=self.network_difficulty, subsidy=self.subsidy,
+                    wallets=len(self.balances), pending_wallets=len(self._pending), last_block=self.last_block,
+                    immature_blocks=len(self.immature),
+                    immature_sats=sum(sum(block['credits'].values()) for block in tuple(self.immature.values())))
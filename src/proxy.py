@@ -0,0 +1,418 @@
+"""
+BLGV BTC Mining Pool - Stratum Proxy
+Farm-side aggregator: many downstream V1 miners on a few upstream channels
+
+A site with hundreds of ASICs runs one proxy next to them instead of sending
+every miner across the uplink. ProxyServer is a StratumServer for the local
+miners; it holds PROXY_CHANNELS upstream connections to the pool, each a
+Stratum V1 subscription used as an extended channel: the pool gives it an
+extranonce1 and an extranonce2 space, and the proxy splits that space
+locally. Every downstream miner gets a PROXY_EXTRANONCE_PREFIX_SIZE-byte
+prefix from its channel's Extranonce1Allocator, so its extranonce1 is the
+channel's extranonce1 followed by the prefix, and it rolls the rest of the
+channel's extranonce2. The coinbase a miner hashes is exactly the one the pool
+expects for the channel.
+
+Downstream shares are validated and vardiffed locally as usual. Only shares
+that also meet the channel's difficulty go upstream (block candidates go at
+once), so the pool sees a few connections at aggregate difficulty rather than
+one per ASIC, and the uplink carries one share per pool retarget period per
+channel instead of every miner's. The pool credits the proxy's account;
+downstream share callbacks see each miner's shares for farm-side accounting.
+
+Upstream subscriptions pass their previous subscription id back on reconnect,
+so a channel resumed by the pool keeps its extranonce1 and its miners keep
+mining; if the pool hands out a different one, the channel's miners are
+disconnected and reassigned when they reconnect.
+"""
+
+import os
+import json
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .extranonce import Extranonce1Allocator, Extranonce1Exhausted
+from .stratum_server import ERROR_OTHER, MAX_LINE_LENGTH, VERSION_ROLLING_MASK, Share, StratumConnection, \
+    StratumError, StratumJob, StratumServer, encode_line
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 60.0
+USER_AGENT = 'blgv-proxy/1.0'
+
+
+class UpstreamChannel(asyncio.Protocol):
+    """One Stratum V1 connection to the pool, shared by up to 256**prefix_size downstream miners"""
+
+    def __init__(self, proxy: 'ProxyServer', index: int, host: str, port: int, username: str, password: str):
+        self.proxy = proxy
+        self.index = index
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.allocator = Extranonce1Allocator(0, 1 << 8 * proxy.prefix_size)
+        self.miners = set()
+        self.session_id: Optional[str] = None
+        self.extranonce1 = ''
+        self.extranonce2_size = 0
+        self.difficulty = float('inf')  # nothing goes up before the pool sets one
+        self.version_mask = 0
+        self.authorized = False
+        self.current_job: Optional[StratumJob] = None
+        self.job_ids: deque = deque()
+        self._next_id = 1
+        self._pending: Dict[int, Callable[[Any, Any], None]] = {}
+        self._closed: Optional[asyncio.Future] = None
+        self.stats = {'connects': 0, 'submitted': 0, 'accepted': 0, 'rejected': 0, 'lost': 0, 'jobs': 0}
+
+    @property
+    def ready(self) -> bool:
+        return self.authorized and self.current_job is not None and self.transport is not None
+
+    # -- connection
+
+    async def run(self):
+        """Keep the channel connected until cancelled"""
+        loop = asyncio.get_running_loop()
+        delay = RECONNECT_DELAY
+        while True:
+            self._closed = loop.create_future()
+            try:
+                await loop.create_connection(lambda: self, self.host, self.port)
+            except OSError as e:
+                logger.warning(f"Upstream channel {self.index}: cannot reach {self.host}:{self.port}: {e}")
+            else:
+                await self._closed
+                if self.stats['accepted']:
+                    delay = RECONNECT_DELAY
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.stats['connects'] += 1
+        self.request('mining.configure', [['version-rolling'], {'version-rolling.mask': f"{VERSION_ROLLING_MASK:08x}"}],
+                      self._on_configure)
+        self.request('mining.subscribe', [USER_AGENT, self.session_id] if self.session_id else [USER_AGENT],
+                     self._on_subscribe)
+        self.request('mining.authorize', [self.username, self.password], self._on_authorize)
+
+    def connection_lost(self, exc):
+        logger.warning(f"Upstream channel {self.index} disconnected"
+                       f"{f': {exc}' if exc else ''}, {len(self._pending)} requests unanswered")
+        self.stats['lost'] += sum(1 for callback in self._pending.values() if callback == self._on_submit)
+        self._pending.clear()
+        self.transport = None
+        self.authorized = False
+        self.buffer.clear()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def data_received(self, data: bytes):
+        buffer = self.buffer
+        buffer += data
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                self.handle_line(line)
+        if start:
+            del buffer[:start]
+        if len(buffer) > MAX_LINE_LENGTH * 64:  # notify lines carry the merkle branch
+            logger.error(f"Upstream channel {self.index}: line too long, reconnecting")
+            self.transport.abort()
+
+    def request(self, method: str, params: list, callback: Callable[[Any, Any], None]):
+        if self.transport is None or self.transport.is_closing():
+            return
+        msg_id = self._next_id
+        self._next_id += 1
+        self._pending[msg_id] = callback
+        self.transport.write(encode_line({'id': msg_id, 'method': method, 'params': params}))
+
+    # -- pool -> proxy
+
+    def handle_line(self, line: bytes):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            logger.warning(f"Upstream channel {self.index}: malformed line from the pool")
+            return
+        method = message.get('method')
+        if method is None:
+            callback = self._pending.pop(message.get('id'), None)
+            if callback is not None:
+                callback(message.get('result'), message.get('error'))
+            return
+        params = message.get('params') or []
+        try:
+            if method == 'mining.notify':
+                self.proxy.set_channel_job(self, params)
+            elif method == 'mining.set_difficulty':
+                self.difficulty = float(params[0])
+            elif method == 'mining.set_extranonce':
+                self.set_extranonce(str(params[0]), int(params[1]))
+            elif method == 'client.reconnect':
+                self.transport.close()
+        except (ValueError, TypeError, IndexError) as e:
+            logger.warning(f"Upstream channel {self.index}: bad {method}: {e}")
+
+    def _on_configure(self, result, error):
+        if isinstance(result, dict) and result.get('version-rolling'):
+            self.version_mask = int(result.get('version-rolling.mask', '0'), 16)
+
+    def _on_subscribe(self, result, error):
+        if error or not result:
+            logger.error(f"Upstream channel {self.index}: subscribe refused: {error}")
+            self.transport.close()
+            return
+        subscriptions, extranonce1, extranonce2_size = result[0], str(result[1]), int(result[2])
+        try:
+            self.session_id = str(subscriptions[0][1])
+        except (IndexError, TypeError):
+            self.session_id = None
+        self.set_extranonce(extranonce1, extranonce2_size)
+
+    def _on_authorize(self, result, error):
+        if not result:
+            logger.error(f"Upstream channel {self.index}: {self.username} not authorized: {error}")
+            self.transport.close()
+            return
+        self.authorized = True
+        logger.info(f"Upstream channel {self.index} ready: extranonce1 {self.extranonce1}, "
+                    f"{len(self.miners)} miners attached")
+
+    def set_extranonce(self, extranonce1: str, extranonce2_size: int):
+        if extranonce1 == self.extranonce1 and extranonce2_size == self.extranonce2_size:
+            return  # resumed by the pool: attached miners carry on
+        if extranonce2_size - self.proxy.prefix_size != self.proxy.extranonce2_size:
+            logger.error(f"Upstream channel {self.index}: pool extranonce2 size {extranonce2_size} leaves "
+                         f"no room for a {self.proxy.prefix_size}-byte prefix and "
+                         f"{self.proxy.extranonce2_size} bytes downstream")
+            self.transport.close()
+            return
+        if self.extranonce1:
+            logger.warning(f"Upstream channel {self.index}: extranonce1 changed, dropping {len(self.miners)} miners")
+            self.proxy.reset_channel(self)
+        self.extranonce1 = extranonce1
+        self.extranonce2_size = extranonce2_size
+
+    # -- proxy -> pool
+
+    def submit(self, share: Share, upstream_job_id: str):
+        """Send a downstream share on under the channel's identity"""
+        if self.transport is None:
+            self.stats['lost'] += 1  # reconnecting; the pool would not know the job's session anyway
+            return
+        prefix = share.extranonce1[len(self.extranonce1):]
+        params = [self.username, upstream_job_id, prefix + share.extranonce2, share.ntime, share.nonce]
+        if share.version_bits is not None:
+            params.append(share.version_bits)
+        self.stats['submitted'] += 1
+        self.request('mining.submit', params, self._on_submit)
+
+    def _on_submit(self, result, error):
+        if result:
+            self.stats['accepted'] += 1
+        else:
+            self.stats['rejected'] += 1
+            logger.info(f"Upstream channel {self.index}: share rejected: {error}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, index=self.index, connected=self.transport is not None, ready=self.ready,
+                    extranonce1=self.extranonce1, difficulty=self.difficulty, miners=len(self.miners),
+                    prefixes=self.allocator.get_stats())
+
+
+class ProxyConnection(StratumConnection):
+    """Downstream miner, attached to one upstream channel by an extranonce prefix"""
+
+    __slots__ = ('channel', 'prefix')
+
+    def __init__(self, server: 'ProxyServer'):
+        super().__init__(server)
+        self.channel: Optional[UpstreamChannel] = None
+        self.prefix = 0
+
+    def connection_lost(self, exc):
+        super().connection_lost(exc)
+        self.server.release(self)
+
+
+class _UpstreamBlockSubmitter:
+    """block_submitter for the proxy: candidates go to the pool the moment they are found"""
+
+    def __init__(self, proxy: 'ProxyServer'):
+        self.proxy = proxy
+        self.candidates = 0
+
+    def submit(self, share: Share) -> bool:
+        self.candidates += 1
+        return self.proxy.forward(share)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {'candidates': self.candidates, 'forwarded_to': 'upstream'}
+
+
+class ProxyServer(StratumServer):
+    """StratumServer for a farm's miners, multiplexed onto a few upstream channels"""
+
+    connection_class = ProxyConnection
+
+    def __init__(self, upstream_host: str, upstream_port: int, username: str, password: str = 'x',
+                 channels: int = 2, prefix_size: int = 2, host: str = '0.0.0.0', port: int = 3333,
+                 extranonce2_size: int = 2, **options):
+        if not 1 <= channels <= 256:
+            raise ValueError('between 1 and 256 upstream channels')
+        super().__init__(host=host, port=port, extranonce2_size=extranonce2_size, spool=None, **options)
+        self.spool = None  # shares are the pool's to store
+        self.prefix_size = prefix_size
+        self.block_submitter = _UpstreamBlockSubmitter(self)
+        self.channels: List[UpstreamChannel] = [
+            UpstreamChannel(self, index, upstream_host, upstream_port, username, password)
+            for index in range(channels)
+        ]
+        self.stats.update({'forwarded': 0, 'filtered': 0, 'stale_upstream': 0})
+
+    @classmethod
+    def from_env(cls) -> 'ProxyServer':
+        """PROXY_UPSTREAM=host:port, PROXY_USERNAME, PROXY_PASSWORD, PROXY_CHANNELS,
+        PROXY_EXTRANONCE_PREFIX_SIZE, PROXY_EXTRANONCE2_SIZE, PROXY_PORT"""
+        host, _, port = os.environ.get('PROXY_UPSTREAM', 'pool.blgvbtc.com:3333').rpartition(':')
+        return cls(host, int(port), os.environ['PROXY_USERNAME'], os.environ.get('PROXY_PASSWORD', 'x'),
+                   channels=int(os.environ.get('PROXY_CHANNELS', 2)),
+                   prefix_size=int(os.environ.get('PROXY_EXTRANONCE_PREFIX_SIZE', 2)),
+                   extranonce2_size=int(os.environ.get('PROXY_EXTRANONCE2_SIZE', 2)),
+                   port=int(os.environ.get('PROXY_PORT', 3333)))
+
+    async def start(self):
+        """Connect the upstream channels and serve miners until cancelled"""
+        channels = [asyncio.ensure_future(channel.run()) for channel in self.channels]
+        try:
+            await super().start()
+        finally:
+            for task in channels:
+                task.cancel()
+
+    async def stop(self):
+        await super().stop()
+        for channel in self.channels:
+            if channel.transport is not None:
+                channel.transport.close()
+
+    # -- channels
+
+    def set_channel_job(self, channel: UpstreamChannel, params: list):
+        """Turn the pool's mining.notify on a channel into a downstream job for that channel's miners"""
+        upstream_id, prevhash, coinb1, coinb2, branch, version, nbits, ntime = params[:8]
+        clean = bool(params[8]) if len(params) > 8 else False
+        # Downstream job ids carry the channel, so one job table serves every channel
+        job = StratumJob(f"{channel.index:02x}{upstream_id}", prevhash, coinb1, coinb2, branch, version,
+                         nbits, ntime, clean)
+        job.prepared = self.validator.prepare(job)
+        if clean:
+            while channel.job_ids:
+                self._drop_job(channel.job_ids.popleft())
+        channel.job_ids.append(job.job_id)
+        self.jobs[job.job_id] = job
+        while len(channel.job_ids) > self.max_jobs:
+            self._drop_job(channel.job_ids.popleft())
+        channel.current_job = job
+        channel.stats['jobs'] += 1
+        self.current_job = job
+        self.stats['jobs'] += 1
+        self.broadcast(job.notify_line(), channel.miners)
+
+    def _drop_job(self, job_id: str):
+        self.jobs.pop(job_id, None)
+        self.duplicates.drop(job_id)
+
+    def reset_channel(self, channel: UpstreamChannel):
+        """The channel's extranonce1 is gone: its miners and jobs go with it"""
+        for conn in tuple(channel.miners):
+            conn.transport.close()
+        while channel.job_ids:
+            self._drop_job(channel.job_ids.popleft())
+        channel.current_job = None
+
+    def release(self, conn: ProxyConnection):
+        channel = conn.channel
+        if channel is not None:
+            channel.miners.discard(conn)
+            channel.allocator.release(conn.prefix)
+            conn.channel = None
+
+    # -- downstream handlers
+
+    def handle_subscribe(self, conn: ProxyConnection, params: list):
+        if conn.channel is None:
+            for channel in sorted((c for c in self.channels if c.ready), key=lambda c: len(c.miners)):
+                try:
+                    conn.prefix = channel.allocator.allocate()
+                except Extranonce1Exhausted:
+                    continue
+                conn.channel = channel
+                channel.miners.add(conn)
+                conn.extranonce1 = channel.extranonce1 + f"{conn.prefix:0{self.prefix_size * 2}x}"
+                break
+            else:
+                raise StratumError(ERROR_OTHER, 'No upstream channel available')
+        conn.subscribed = True
+        subscription_id = f"{conn.channel.index:02x}{conn.prefix:x}"
+        return [
+            [['mining.set_difficulty', subscription_id], ['mining.notify', subscription_id]],
+            conn.extranonce1,
+            self.extranonce2_size
+        ]
+
+    def handle_configure(self, conn: ProxyConnection, params: list):
+        result = super().handle_configure(conn, params)
+        if conn.version_mask and conn.channel is not None:
+            conn.version_mask &= conn.channel.version_mask
+            result['version-rolling.mask'] = f"{conn.version_mask:08x}"
+        return result
+
+    def after_request(self, conn: ProxyConnection, method: str):
+        if method == 'mining.authorize' and conn.subscribed:
+            conn.set_difficulty(conn.difficulty)
+            if conn.channel.current_job:
+                conn.write(conn.channel.current_job.notify_line(clean_jobs=True))
+            self._worker_status(conn, 'online')
+
+    def accept(self, conn: ProxyConnection, msg_id, share: Share):
+        super().accept(conn, msg_id, share)
+        if share.is_block:
+            return  # already sent by the block submitter
+        channel = self.channels[int(share.job_id[:2], 16)]
+        if share.actual_difficulty >= channel.difficulty:
+            self.forward(share)
+        else:
+            self.stats['filtered'] += 1
+
+    def forward(self, share: Share) -> bool:
+        channel = self.channels[int(share.job_id[:2], 16)]
+        if share.job_id not in self.jobs or not share.extranonce1.startswith(channel.extranonce1):
+            self.stats['stale_upstream'] += 1
+            return False
+        channel.submit(share, share.job_id[2:])
+        self.stats['forwarded'] += 1
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(super().get_stats(), upstream=[channel.get_stats() for channel in self.channels],
+                    upstream_connections=sum(1 for channel in self.channels if channel.transport is not None))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(ProxyServer.from_env().start())
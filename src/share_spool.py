@@ -0,0 +1,311 @@
+"""
+BLGV BTC Mining Pool - Share Spool
+Write-behind ingestion of accepted shares into PostgreSQL with COPY
+
+The Stratum event loop only appends Share objects to an in-memory ring
+(append is O(1) and never touches disk or the network). A writer thread drains
+the ring in batches of up to batch_size rows, or every flush_interval seconds,
+and streams them into the shares table with COPY.
+
+When the database is unreachable, batches are appended (and fsynced) to a
+local spill file in COPY text format instead. Once the database answers again
+the spill files are replayed, oldest first, before newer shares. When the ring
+passes its capacity anyway (database and disk both lagging), the congestion
+callback fires so the server can stop reading from miners until the writer
+catches up. Delivery is at-least-once: a batch whose commit acknowledgement
+was lost is written again.
+
+Rows Postgres itself rejects (DataError, IntegrityError) are not a sign the
+database is down, and retrying them would only keep every later share on
+disk. A live batch that hits one is written to a shares-*.bad file instead of
+the spill, and a spill file that hits one on replay is renamed to .bad; both
+are logged and left for an operator, and replay moves on to the next file.
+"""
+
+import io
+import os
+import time
+import glob
+import logging
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+import psycopg2
+
+logger = logging.getLogger(__name__)
+
+SHARES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS shares (
+        id BIGSERIAL PRIMARY KEY,
+        wallet_address VARCHAR(100) NOT NULL,
+        worker_name VARCHAR(64) NOT NULL,
+        job_id VARCHAR(32) NOT NULL,
+        difficulty DOUBLE PRECISION NOT NULL,
+        actual_difficulty DOUBLE PRECISION NOT NULL,
+        share_hash CHAR(64) NOT NULL,
+        is_block BOOLEAN NOT NULL DEFAULT FALSE,
+        submitted_at TIMESTAMPTZ NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS shares_submitted_at ON shares (submitted_at);
+    CREATE INDEX IF NOT EXISTS shares_wallet_submitted_at ON shares (wallet_address, submitted_at);
+"""
+
+COPY_SQL = ("COPY shares (wallet_address, worker_name, job_id, difficulty, actual_difficulty, "
+            "share_hash, is_block, submitted_at) FROM STDIN")
+
+# Errors about the rows themselves, as opposed to the connection
+BAD_DATA_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError)
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def format_share_row(share) -> str:
+    """One line of COPY text format"""
+    submitted_at = datetime.fromtimestamp(share.submitted_at, timezone.utc).isoformat()
+    return (f"{share.wallet.translate(_COPY_ESCAPES)}\t{share.worker.translate(_COPY_ESCAPES)}\t"
+            f"{share.job_id.translate(_COPY_ESCAPES)}\t{share.difficulty!r}\t{share.actual_difficulty!r}\t"
+            f"{share.hash}\t{'t' if share.is_block else 'f'}\t{submitted_at}\n")
+
+
+class ShareSpool:
+    """Ring buffer of accepted shares flushed to Postgres by a writer thread"""
+
+    def __init__(self, dsn: Optional[str] = None, capacity: int = 200000, batch_size: int = 5000,
+                 flush_interval: float = 1.0, spill_dir: str = 'data/spool', retry_interval: float = 5.0):
+        self.dsn = dsn
+        self.capacity = capacity
+        self.low_water = capacity // 2
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self.retry_interval = retry_interval
+
+        self._ring = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn = None
+        self._installed = False
+        self._db_down_until = 0.0
+        self._spill_file = None
+        self.congested = False
+        self.on_congestion: Optional[Callable[[bool], None]] = None
+        self.stats = {'appended': 0, 'flushed': 0, 'batches': 0, 'spilled': 0, 'replayed': 0,
+                      'quarantined': 0, 'congestion_events': 0, 'last_error': None}
+
+    @classmethod
+    def from_env(cls) -> 'ShareSpool':
+        return cls(
+            capacity=int(os.environ.get('SHARE_SPOOL_CAPACITY', 200000)),
+            batch_size=int(os.environ.get('SHARE_SPOOL_BATCH_SIZE', 5000)),
+            flush_interval=float(os.environ.get('SHARE_SPOOL_FLUSH_INTERVAL', 1.0)),
+            spill_dir=os.environ.get('SHARE_SPOOL_DIR', 'data/spool')
+        )
+
+    # -- producer side (event loop)
+
+    def append(self, share):
+        """Queue an accepted share; never blocks beyond a short lock"""
+        with self._lock:
+            self._ring.append(share)
+            size = len(self._ring)
+        self.stats['appended'] += 1
+        if size >= self.batch_size:
+            self._wakeup.set()
+        if size >= self.capacity and not self.congested:
+            self.congested = True
+            self.stats['congestion_events'] += 1
+            logger.warning(f"Share spool congested ({size} queued), pausing intake")
+            self._notify_congestion(True)
+
+    def _notify_congestion(self, congested: bool):
+        if self.on_congestion:
+            try:
+                self.on_congestion(congested)
+            except Exception as e:
+                logger.error(f"Spool congestion callback failed: {e}")
+
+    # -- writer thread
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='share-spool', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Flush what is queued (to the database or the spill file) and stop"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            stopping = self._stop.is_set()
+            if not stopping:
+                self._wakeup.wait(max(0.0, next_flush - time.monotonic()))
+                self._wakeup.clear()
+            next_flush = time.monotonic() + self.flush_interval
+
+            if self._database_ready():
+                self._replay_spill_files()
+            while self._drain_batch():
+                pass
+            self._update_congestion()
+            if stopping:
+                self._close_spill_file()
+                return
+
+    def _take_batch(self) -> list:
+        with self._lock:
+            count = min(self.batch_size, len(self._ring))
+            return [self._ring.popleft() for _ in range(count)]
+
+    def _drain_batch(self) -> bool:
+        """Write one batch; True if the ring may hold more"""
+        batch = self._take_batch()
+        if not batch:
+            return False
+        payload = ''.join(format_share_row(share) for share in batch)
+        written = False
+        if self._database_ready() and not self._spill_files():
+            try:
+                written = self._copy(io.StringIO(payload))
+            except BAD_DATA_ERRORS as e:
+                self._quarantine(payload, len(batch), e)
+                return len(batch) == self.batch_size
+        if written:
+            self.stats['flushed'] += len(batch)
+            self.stats['batches'] += 1
+        else:
+            self._spill(payload, len(batch))
+        return len(batch) == self.batch_size
+
+    def _update_congestion(self):
+        if self.congested:
+            with self._lock:
+                size = len(self._ring)
+            if size <= self.low_water:
+                self.congested = False
+                logger.info("Share spool drained, resuming intake")
+                self._notify_congestion(False)
+
+    # -- database
+
+    def _database_ready(self) -> bool:
+        if time.monotonic() < self._db_down_until:
+            return False
+        if self._conn is not None and not self._conn.closed:
+            return True
+        try:
+            self._conn = psycopg2.connect(self.dsn or os.environ.get('DATABASE_URL'), connect_timeout=5)
+            if not self._installed:
+                cursor = self._conn.cursor()
+                cursor.execute(SHARES_TABLE_SQL)
+                self._conn.commit()
+                cursor.close()
+                self._installed = True
+            return True
+        except Exception as e:
+            self._mark_down(e)
+            return False
+
+    def _mark_down(self, error: Exception):
+        repeated = self.stats['last_error'] == str(error)
+        self.stats['last_error'] = str(error)
+        self._db_down_until = time.monotonic() + self.retry_interval
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+        if not repeated:
+            logger.warning(f"Share spool database unavailable, spilling to {self.spill_dir}: {error}")
+
+    def _copy(self, source) -> bool:
+        """COPY source in one transaction; False if the database is unreachable
+
+        Rows Postgres rejects raise one of BAD_DATA_ERRORS after a rollback.
+        """
+        try:
+            cursor = self._conn.cursor()
+            cursor.copy_expert(COPY_SQL, source)
+            self._conn.commit()
+            cursor.close()
+            return True
+        except BAD_DATA_ERRORS:
+            try:
+                self._conn.rollback()
+            except Exception as e:
+                self._mark_down(e)
+            raise
+        except Exception as e:
+            self._mark_down(e)
+            return False
+
+    # -- spill files
+
+    def _spill_files(self):
+        return sorted(glob.glob(os.path.join(self.spill_dir, 'shares-*.copy')))
+
+    def _spill(self, payload: str, rows: int):
+        if self._spill_file is None:
+            path = os.path.join(self.spill_dir, f"shares-{time.time_ns()}.copy")
+            self._spill_file = open(path, 'a', encoding='utf-8')
+        self._spill_file.write(payload)
+        self._spill_file.flush()
+        os.fsync(self._spill_file.fileno())
+        self.stats['spilled'] += rows
+
+    def _quarantine(self, payload: str, rows: int, error: Exception):
+        path = os.path.join(self.spill_dir, f"shares-{time.time_ns()}.bad")
+        with open(path, 'w', encoding='utf-8') as target:
+            target.write(payload)
+            target.flush()
+            os.fsync(target.fileno())
+        self.stats['quarantined'] += rows
+        logger.error(f"Postgres rejected a batch of {rows} shares, kept in {path}: {error}")
+
+    def _close_spill_file(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _replay_spill_files(self):
+        """COPY spilled shares back in, one file per transaction, oldest first"""
+        files = self._spill_files()
+        if not files:
+            return
+        self._close_spill_file()  # later spills start a new file
+        for path in files:
+            with open(path, 'r', encoding='utf-8') as source:
+                rows = sum(1 for _ in source)
+                source.seek(0)
+                try:
+                    if not self._copy(source):
+                        return
+                except BAD_DATA_ERRORS as e:
+                    bad = path[:-len('.copy')] + '.bad'
+                    os.rename(path, bad)
+                    self.stats['quarantined'] += rows
+                    logger.error(f"Postgres rejected spilled shares in {path}, moved to {bad}: {e}")
+                    continue
+            self.stats['replayed'] += rows
+            os.unlink(path)
+            logger.info(f"Replayed spilled shares from {path}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = len(self._ring)
+        return dict(self.stats, queued=queued, congested=self.congested,
+                    spill_files=len(self._spill_files()),
+                    quarantine_files=len(glob.glob(os.path.join(self.spill_dir, 'shares-*.bad'))),
+                    database='down' if time.monotonic() < self._db_down_until else 'up')
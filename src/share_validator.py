@@ -0,0 +1,175 @@
+"""
+BLGV BTC Mining Pool - Share Validator
+Double-SHA256 header checks with per-job precomputation and midstate reuse
+
+Everything that only depends on the job (prevhash, nbits, coinbase halves,
+merkle branch, the SHA-256 state after coinb1) is decoded once in prepare().
+Miners roll nonce and version bits over the same extranonce2 many times, so the
+merkle root is cached per (extranonce1, extranonce2) and the SHA-256 state
+after the first 64 header bytes per version under it, so a share on a known
+extranonce2 skips the coinbase and merkle work entirely. Targets are compared as plain ints.
+"""
+
+from hashlib import sha256
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DIFF1_TARGET = 0x00000000ffff << 208
+
+
+def sha256d(data: bytes) -> bytes:
+    return sha256(sha256(data).digest()).digest()
+
+
+def header_version(job_version: int, version_bits: Optional[str], version_mask: int) -> int:
+    """Version field of the header a share hashes: the job's, with the miner's rolled bits under the mask"""
+    if version_bits is None:
+        return job_version
+    return (job_version & ~version_mask) | (int(version_bits, 16) & version_mask)
+
+
+def target_from_nbits(nbits: str) -> int:
+    """Expand the compact nBits encoding (big-endian hex) to a 256-bit target"""
+    compact = int(nbits, 16)
+    exponent = compact >> 24
+    mantissa = compact & 0x7fffff
+    if exponent <= 3:
+        return mantissa >> (8 * (3 - exponent))
+    return mantissa << (8 * (exponent - 3))
+
+
+def difficulty_to_target(difficulty: float) -> int:
+    return int(DIFF1_TARGET / difficulty)
+
+
+def stratum_prevhash_to_header(prevhash: str) -> bytes:
+    """mining.notify sends prevhash with every 32-bit word byte-swapped"""
+    raw = bytes.fromhex(prevhash)
+    return b''.join(raw[i:i + 4][::-1] for i in range(0, 32, 4))
+
+
+class PreparedJob:
+    """Job fields decoded to header byte order, plus hashing midstates"""
+
+    __slots__ = ('job_id', 'coinbase_midstate', 'coinb1', 'coinb2', 'branch', 'prevhash',
+                 'version', 'nbits', 'network_target', 'header_cache')
+
+    def __init__(self, job):
+        self.job_id = job.job_id
+        self.coinb1 = bytes.fromhex(job.coinb1)
+        self.coinb2 = bytes.fromhex(job.coinb2)
+        self.coinbase_midstate = sha256(self.coinb1)
+        self.branch = [bytes.fromhex(h) for h in job.merkle_branch]
+        self.prevhash = stratum_prevhash_to_header(job.prevhash)
+        self.version = int(job.version, 16)
+        self.nbits = bytes.fromhex(job.nbits)[::-1]
+        self.network_target = target_from_nbits(job.nbits)
+        # (extranonce1, extranonce2) -> (merkle root, {version: sha256 state after 64 header bytes})
+        self.header_cache: Dict[Tuple[str, str], Tuple[bytes, Dict[int, object]]] = {}
+
+
+class ShareResult:
+    """Outcome of hashing one share"""
+
+    __slots__ = ('valid', 'hash', 'difficulty', 'is_block', 'header', 'coinbase')
+
+    def __init__(self, valid: bool, block_hash: bytes, difficulty: float, is_block: bool,
+                 header: Optional[bytes] = None, coinbase: Optional[bytes] = None):
+        self.valid = valid
+        self.hash = block_hash  # internal byte order
+        self.difficulty = difficulty
+        self.is_block = is_block
+        self.header = header
+        self.coinbase = coinbase
+
+    @property
+    def hash_hex(self) -> str:
+        return self.hash[::-1].hex()
+
+
+# (prepared job, extranonce1, extranonce2, ntime, nonce, version_bits, version_mask, target)
+Submission = Tuple[PreparedJob, str, str, str, str, Optional[str], int, int]
+
+
+class ShareValidator:
+    """Validates batches of submissions against their jobs' targets"""
+
+    def __init__(self, header_cache_size: int = 4096):
+        self.header_cache_size = header_cache_size
+        self._targets: Dict[float, int] = {}
+        self.validated = 0
+        self.cache_hits = 0
+
+    def prepare(self, job) -> PreparedJob:
+        return PreparedJob(job)
+
+    def target_for(self, difficulty: float) -> int:
+        target = self._targets.get(difficulty)
+        if target is None:
+            if len(self._targets) > 4096:
+                self._targets.clear()
+            target = self._targets[difficulty] = difficulty_to_target(difficulty)
+        return target
+
+    def validate(self, prepared: PreparedJob, extranonce1: str, extranonce2: str, ntime: str,
+                 nonce: str, version_bits: Optional[str] = None, version_mask: int = 0,
+                 target: int = DIFF1_TARGET) -> ShareResult:
+        return self.validate_batch([(prepared, extranonce1, extranonce2, ntime, nonce,
+                                     version_bits, version_mask, target)])[0]
+
+    def validate_batch(self, submissions: Sequence[Submission]) -> List[ShareResult]:
+        """Hash every submission; results are returned in the same order"""
+        results = []
+        append = results.append
+        fromhex = bytes.fromhex
+        from_bytes = int.from_bytes
+        cache_limit = self.header_cache_size
+        hits = 0
+
+        for prepared, extranonce1, extranonce2, ntime, nonce, version_bits, version_mask, target in submissions:
+            version = header_version(prepared.version, version_bits, version_mask)
+
+            key = (extranonce1, extranonce2)
+            cached = prepared.header_cache.get(key)
+            if cached is None:
+                coinbase_hasher = prepared.coinbase_midstate.copy()
+                coinbase_hasher.update(fromhex(extranonce1 + extranonce2))
+                coinbase_hasher.update(prepared.coinb2)
+                root = sha256(coinbase_hasher.digest()).digest()
+                for branch_hash in prepared.branch:
+                    root = sha256(sha256(root + branch_hash).digest()).digest()
+                if len(prepared.header_cache) >= cache_limit:
+                    prepared.header_cache.clear()
+                cached = prepared.header_cache[key] = (root, {})
+            else:
+                hits += 1
+
+            root, prefixes = cached
+            prefix = prefixes.get(version)
+            if prefix is None:
+                prefix = prefixes[version] = sha256(version.to_bytes(4, 'little') + prepared.prevhash + root[:28])
+            hasher = prefix.copy()
+            hasher.update(root[28:] + fromhex(ntime)[::-1] + prepared.nbits + fromhex(nonce)[::-1])
+            block_hash = sha256(hasher.digest()).digest()
+            value = from_bytes(block_hash, 'little')
+
+            is_block = value <= prepared.network_target
+            if is_block:
+                header, coinbase = self.assemble(prepared, extranonce1, extranonce2, ntime, nonce, version)
+                append(ShareResult(True, block_hash, DIFF1_TARGET / max(value, 1), True, header, coinbase))
+            else:
+                append(ShareResult(value <= target, block_hash, DIFF1_TARGET / max(value, 1), False))
+
+        self.validated += len(results)
+        self.cache_hits += hits
+        return results
+
+    def assemble(self, prepared: PreparedJob, extranonce1: str, extranonce2: str, ntime: str,
+                 nonce: str, version: int) -> Tuple[bytes, bytes]:
+        """Full 80-byte header and coinbase transaction (only needed for block candidates)"""
+        coinbase = prepared.coinb1 + bytes.fromhex(extranonce1 + extranonce2) + prepared.coinb2
+        root = sha256d(coinbase)
+        for branch_hash in prepared.branch:
+            root = sha256d(root + branch_hash)
+        header = (version.to_bytes(4, 'little') + prepared.prevhash + root +
+                  bytes.fromhex(ntime)[::-1] + prepared.nbits + bytes.fromhex(nonce)[::-1])
+        return header, coinbase
@@ -0,0 +1,664 @@
+"""
+BLGV BTC Mining Pool - Stratum V1 Server
+asyncio mining.* server for Bitaxe and ASIC miners (3333 Core / 3334 Knots)
+
+Connections are plain asyncio.Protocol objects with __slots__ state, no task
+or stream pair per miner, so one process can hold tens of thousands of them.
+Each connection reads newline-delimited JSON into a bounded buffer; when the
+kernel send buffer backs up the connection stops reading until it drains, and
+miners that cannot keep up with job broadcasts are dropped.
+
+mining.submit requests are queued while the loop drains socket reads and are
+hashed together by one ShareValidator batch scheduled with call_soon. Accepted
+shares feed the per-connection vardiff window, which retargets difficulty
+toward STRATUM_VARDIFF_SHARES_PER_MINUTE. Block candidates skip the queue:
+they go to the BlockSubmitter before anything else in their batch. Accepted
+shares are handed to the write-behind ShareSpool; if it backs up, every
+connection stops reading until it has drained.
+
+Subscriptions are sessions (see extranonce.py): a miner that reconnects with
+its previous subscription id keeps its extranonce1, difficulty and identity.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .block_submitter import BlockSubmitter
+from .duplicate_filter import DuplicateFilter
+from .extranonce import Extranonce1Allocator, SessionTable
+from .share_spool import ShareSpool
+from .share_validator import ShareValidator, PreparedJob, header_version
+from .vardiff import VardiffController
+
+logger = logging.getLogger(__name__)
+
+# Stratum V1 error codes (as used by most pools and cgminer/bmminer/ESP-Miner)
+ERROR_OTHER = 20
+ERROR_JOB_NOT_FOUND = 21
+ERROR_DUPLICATE = 22
+ERROR_LOW_DIFFICULTY = 23
+ERROR_UNAUTHORIZED = 24
+ERROR_NOT_SUBSCRIBED = 25
+
+ERROR_MESSAGES = {
+    ERROR_OTHER: 'Other/Unknown',
+    ERROR_JOB_NOT_FOUND: 'Job not found (=stale)',
+    ERROR_DUPLICATE: 'Duplicate share',
+    ERROR_LOW_DIFFICULTY: 'Low difficulty share',
+    ERROR_UNAUTHORIZED: 'Unauthorized worker',
+    ERROR_NOT_SUBSCRIBED: 'Not subscribed'
+}
+
+# BIP-310 version rolling bits the pool allows miners to use
+VERSION_ROLLING_MASK = 0x1fffe000
+
+MAX_LINE_LENGTH = 8192
+WRITE_BUFFER_HIGH = 64 * 1024
+MAX_WRITE_BUFFER = 512 * 1024
+MAX_NTIME_DRIFT = 7200
+
+_WALLET_RE = re.compile(r'^(bc1|tb1|bcrt1)[02-9ac-hj-np-z]{8,87}$|^[13mn2][1-9A-HJ-NP-Za-km-z]{25,34}$')
+_HEX_RE = re.compile(r'^[0-9a-fA-F]*$')
+_CONTROL_RE = re.compile(r'[\x00-\x1f\x7f]')  # NUL cannot be stored in Postgres text at all
+
+
+def encode_line(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+class StratumError(Exception):
+    """Rejects a request with a Stratum error code"""
+
+    def __init__(self, code: int, message: Optional[str] = None):
+        super().__init__(message or ERROR_MESSAGES.get(code, 'Other/Unknown'))
+        self.code = code
+
+    def to_json(self) -> List[Any]:
+        return [self.code, str(self), None]
+
+
+class StratumJob:
+    """One mining.notify job; the notify line is encoded once and shared"""
+
+    __slots__ = ('job_id', 'prevhash', 'coinb1', 'coinb2', 'merkle_branch', 'version',
+                 'nbits', 'ntime', 'clean_jobs', 'created_at', 'prepared', '_lines')
+
+    def __init__(self, job_id: str, prevhash: str, coinb1: str, coinb2: str, merkle_branch: List[str],
+                 version: str, nbits: str, ntime: str, clean_jobs: bool = False):
+        self.job_id = job_id
+        self.prevhash = prevhash
+        self.coinb1 = coinb1
+        self.coinb2 = coinb2
+        self.merkle_branch = merkle_branch
+        self.version = version
+        self.nbits = nbits
+        self.ntime = ntime
+        self.clean_jobs = clean_jobs
+        self.created_at = time.monotonic()
+        self.prepared: Optional[PreparedJob] = None
+        self._lines: Dict[bool, bytes] = {}
+
+    def notify_line(self, clean_jobs: Optional[bool] = None) -> bytes:
+        clean = self.clean_jobs if clean_jobs is None else clean_jobs
+        line = self._lines.get(clean)
+        if line is None:
+            line = self._lines[clean] = encode_line({
+                'id': None,
+                'method': 'mining.notify',
+                'params': [self.job_id, self.prevhash, self.coinb1, self.coinb2, self.merkle_branch,
+                           self.version, self.nbits, self.ntime, clean]
+            })
+        return line
+
+
+class Share:
+    """A submitted share, as handed to share callbacks"""
+
+    __slots__ = ('wallet', 'worker', 'job_id', 'extranonce1', 'extranonce2', 'ntime', 'nonce',
+                 'version_bits', 'version_mask', 'difficulty', 'submitted_at', 'received_at', 'hash',
+                 'actual_difficulty', 'is_block', 'block')
+
+    def __init__(self, wallet: str, worker: str, job_id: str, extranonce1: str, extranonce2: str,
+                 ntime: str, nonce: str, version_bits: Optional[str], version_mask: int, difficulty: float,
+                 received_at: Optional[float] = None):
+        self.wallet = wallet
+        self.worker = worker
+        self.job_id = job_id
+        self.extranonce1 = extranonce1
+        self.extranonce2 = extranonce2
+        self.ntime = ntime
+        self.nonce = nonce
+        self.version_bits = version_bits
+        self.version_mask = version_mask
+        self.difficulty = difficulty  # assigned difficulty the share is credited at
+        self.submitted_at = time.time()
+        self.received_at = time.monotonic() if received_at is None else received_at  # socket read
+        self.hash: Optional[str] = None
+        self.actual_difficulty = 0.0
+        self.is_block = False
+        self.block = None  # (header, coinbase) bytes for block candidates
+
+
+class StratumConnection(asyncio.Protocol):
+    """Per-miner protocol state"""
+
+    __slots__ = ('server', 'transport', 'buffer', 'peer', 'session', 'extranonce1', 'subscribed', 'authorized',
+                 'wallet', 'worker', 'difficulty', 'vardiff', 'version_mask', 'reading_paused',
+                 'last_activity', 'accepted', 'rejected', 'held')
+
+    def __init__(self, server: 'StratumServer'):
+        self.server = server
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        self.peer = None
+        self.session = None
+        self.extranonce1 = ''
+        self.subscribed = False
+        self.authorized = False
+        self.wallet = ''
+        self.worker = ''
+        self.difficulty = server.default_difficulty
+        self.vardiff = None
+        self.version_mask = 0
+        self.reading_paused = False
+        self.last_activity = time.monotonic()
+        self.accepted = 0
+        self.rejected = 0
+        self.held = False  # requests wait in the buffer until release()
+
+    # -- asyncio callbacks
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.peer = transport.get_extra_info('peername')
+        transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        self.server.connections.add(self)
+        if self.server.intake_paused:
+            transport.pause_reading()
+
+    def connection_lost(self, exc):
+        self.server.connections.discard(self)
+        if self.session is not None:
+            self.server.sessions.detach(self.session, self.difficulty, self.vardiff, self.wallet, self.worker)
+        if self.authorized:
+            self.server.worker_disconnected(self)
+
+    def pause_writing(self):
+        # The miner is not reading our responses; stop reading its requests
+        if not self.reading_paused:
+            self.reading_paused = True
+            self.transport.pause_reading()
+
+    def resume_writing(self):
+        if self.reading_paused:
+            self.reading_paused = False
+            if not self.server.intake_paused and not self.held:
+                self.transport.resume_reading()
+
+    def data_received(self, data: bytes):
+        self.last_activity = time.monotonic()
+        buffer = self.buffer
+        buffer += data
+        start = 0
+        while not self.held:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = bytes(buffer[start:end]).strip()
+            start = end + 1
+            if line:
+                self.handle_line(line)
+            if self.transport.is_closing():
+                return
+        if start:
+            del buffer[:start]
+        if len(buffer) > MAX_LINE_LENGTH:
+            logger.debug(f"Dropping {self.peer}: request line too long")
+            self.transport.abort()
+
+    def hold(self):
+        """Stop handling requests, in order, until release() (e.g. while a reply waits on another process)"""
+        self.held = True
+        self.transport.pause_reading()
+
+    def release(self):
+        self.held = False
+        if self.transport.is_closing():
+            return
+        if not self.reading_paused and not self.server.intake_paused:
+            self.transport.resume_reading()
+        self.data_received(b'')  # requests that arrived behind the held one
+
+    # -- output
+
+    def send(self, message: Dict[str, Any]):
+        self.write(encode_line(message))
+
+    def write(self, data: bytes):
+        if not self.transport.is_closing():
+            self.transport.write(data)
+
+    def reply(self, msg_id, result=None, error: Optional[StratumError] = None):
+        self.send({'id': msg_id, 'result': result, 'error': error.to_json() if error else None})
+
+    def set_difficulty(self, difficulty: float):
+        self.difficulty = difficulty
+        self.send({'id': None, 'method': 'mining.set_difficulty', 'params': [difficulty]})
+
+    # -- requests
+
+    def handle_line(self, line: bytes):
+        try:
+            request = json.loads(line)
+            msg_id = request.get('id')
+            method = request['method']
+            params = request.get('params') or []
+        except (ValueError, KeyError, AttributeError, TypeError):
+            logger.debug(f"Malformed Stratum request from {self.peer}")
+            self.transport.abort()
+            return
+
+        deferred = self.server.deferred_handlers.get(method)
+        if deferred is not None:
+            deferred(self, msg_id, params)
+            return
+
+        handler = self.server.handlers.get(method)
+        if handler is None:
+            self.reply(msg_id, None, StratumError(ERROR_OTHER, f"Unknown method {method}"))
+            return
+        self.run_handler(handler, msg_id, method, params)
+
+    def run_handler(self, handler: Callable[['StratumConnection', list], Any], msg_id, method: str, params: list):
+        """Answer a request from a synchronous handler"""
+        try:
+            result = handler(self, params)
+        except StratumError as e:
+            self.reply(msg_id, None, e)
+        except (ValueError, TypeError, IndexError) as e:
+            self.reply(msg_id, None, StratumError(ERROR_OTHER, f"Invalid params: {e}"))
+        else:
+            self.reply(msg_id, result)
+            self.server.after_request(self, method)
+
+
+class StratumServer:
+    """Stratum V1 endpoint: subscribe/authorize/configure/submit, notify and set_difficulty"""
+
+    connection_class = StratumConnection
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 3333, default_difficulty: Optional[float] = None,
+                 extranonce2_size: int = 4, max_jobs: int = 8, idle_timeout: Optional[float] = None,
+                 backlog: int = 4096, spool: Optional[ShareSpool] = None, reuse_port: bool = False,
+                 extranonce1_range: Optional[Tuple[int, int]] = None):
+        self.host = host
+        self.port = port
+        self.default_difficulty = default_difficulty or float(os.environ.get('STRATUM_DEFAULT_DIFFICULTY', 512))
+        self.min_difficulty = float(os.environ.get('STRATUM_MIN_DIFFICULTY', 1))
+        self.extranonce2_size = extranonce2_size
+        self.max_jobs = max_jobs
+        self.idle_timeout = idle_timeout or float(os.environ.get('STRATUM_IDLE_TIMEOUT', 600))
+        self.backlog = backlog
+        self.reuse_port = reuse_port  # several worker processes listening on one port
+        self.validator = ShareValidator()
+        self.duplicates = DuplicateFilter(
+            mode=os.environ.get('STRATUM_DUPLICATE_FILTER', 'exact'),
+            bloom_capacity=int(os.environ.get('STRATUM_DUPLICATE_BLOOM_CAPACITY', 1000000))
+        )
+        self.vardiff: Optional[VardiffController] = None
+        if os.environ.get('STRATUM_VARDIFF_ENABLED', 'true').lower() == 'true':
+            self.vardiff = VardiffController(
+                shares_per_minute=float(os.environ.get('STRATUM_VARDIFF_SHARES_PER_MINUTE', 12)),
+                retarget_interval=float(os.environ.get('STRATUM_VARDIFF_RETARGET_INTERVAL', 30)),
+                variance=float(os.environ.get('STRATUM_VARDIFF_VARIANCE', 0.3)),
+                max_step=float(os.environ.get('STRATUM_VARDIFF_MAX_STEP', 4)),
+                min_difficulty=self.min_difficulty,
+                max_difficulty=float(os.environ.get('STRATUM_MAX_DIFFICULTY', 2 ** 40))
+            )
+
+        self.spool = spool
+        if spool is None and os.environ.get('DATABASE_URL') and \
+                os.environ.get('STRATUM_SHARE_SPOOL', 'true').lower() == 'true':
+            self.spool = ShareSpool.from_env()
+
+        self.connections = set()
+        self.jobs: 'OrderedDict[str, StratumJob]' = OrderedDict()
+        self.current_job: Optional[StratumJob] = None
+        self.block_submitter: Optional[BlockSubmitter] = None
+        self.share_callbacks: List[Callable[[Share], None]] = []
+        self.worker_callbacks: List[Callable[[str, str, str], None]] = []
+        # extranonce1_range (first, count) is the slice of the 32-bit space this process hands out
+        self.sessions = SessionTable(Extranonce1Allocator(*(extranonce1_range or (0, 1 << 32))),
+                                     ttl=float(os.environ.get('STRATUM_SESSION_TTL', 600)))
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._pending_submits = []
+        self._flush_scheduled = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.intake_paused = False
+        self.stats = {'accepted': 0, 'rejected': 0, 'dropped_slow': 0, 'dropped_idle': 0, 'jobs': 0,
+                      'blocks': 0, 'batches': 0}
+
+        self.handlers: Dict[str, Callable[[StratumConnection, list], Any]] = {
+            'mining.subscribe': self.handle_subscribe,
+            'mining.authorize': self.handle_authorize,
+            'mining.configure': self.handle_configure,
+            'mining.suggest_difficulty': self.handle_suggest_difficulty,
+            'mining.extranonce.subscribe': lambda conn, params: True
+        }
+        # Handlers that answer later, given (conn, msg_id, params)
+        self.deferred_handlers: Dict[str, Callable[[StratumConnection, Any, list], None]] = {
+            'mining.submit': self.queue_submit
+        }
+
+    # -- lifecycle
+
+    async def start(self):
+        """Listen and serve until cancelled"""
+        loop = self._loop = asyncio.get_running_loop()
+        if self.spool is not None:
+            self.spool.on_congestion = self._spool_congestion
+            self.spool.start()
+            self.share_callbacks.append(self.spool.append)
+        self._server = await loop.create_server(
+            lambda: self.connection_class(self), self.host, self.port,
+            reuse_address=True, reuse_port=self.reuse_port or None, backlog=self.backlog
+        )
+        logger.info(f"Stratum server listening on {self.host}:{self.port}")
+        async with self._server:
+            await asyncio.gather(self._server.serve_forever(), self._sweep_loop())
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for conn in tuple(self.connections):
+            conn.transport.close()
+        if self.spool is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.spool.stop)
+
+    def _spool_congestion(self, congested: bool):
+        # Called from the spool writer thread when it drains
+        self._loop.call_soon_threadsafe(self.set_intake_paused, congested)
+
+    def set_intake_paused(self, paused: bool):
+        """Stop (or resume) reading from every miner while share storage catches up"""
+        if paused == self.intake_paused:
+            return
+        self.intake_paused = paused
+        for conn in tuple(self.connections):
+            if conn.transport.is_closing() or conn.reading_paused or conn.held:
+                continue
+            if paused:
+                conn.transport.pause_reading()
+            else:
+                conn.transport.resume_reading()
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(30)
+            now = time.monotonic()
+            cutoff = now - self.idle_timeout
+            for conn in tuple(self.connections):
+                if conn.last_activity < cutoff and not self.intake_paused:
+                    self.stats['dropped_idle'] += 1
+                    conn.transport.close()
+                elif conn.vardiff is not None:
+                    difficulty = self.vardiff.check_idle(conn.vardiff, now)
+                    if difficulty is not None:
+                        conn.set_difficulty(difficulty)
+            self.sessions.expire(now)
+
+    # -- jobs
+
+    def set_job(self, job: StratumJob):
+        """Make job current and broadcast mining.notify to every authorized miner"""
+        if job.prepared is None:
+            job.prepared = self.validator.prepare(job)
+        if job.clean_jobs:
+            self.jobs.clear()
+            self.duplicates.clear()
+        self.jobs[job.job_id] = job
+        while len(self.jobs) > self.max_jobs:
+            stale_id, _ = self.jobs.popitem(last=False)
+            self.duplicates.drop(stale_id)
+        self.current_job = job
+        self.stats['jobs'] += 1
+        self.broadcast(job.notify_line())
+
+    def broadcast(self, line: bytes, connections=None):
+        for conn in tuple(self.connections if connections is None else connections):
+            if not conn.authorized:
+                continue
+            transport = conn.transport
+            if transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+                self.stats['dropped_slow'] += 1
+                transport.abort()
+                continue
+            if not transport.is_closing():
+                transport.write(line)
+
+    # -- handlers
+
+    def handle_subscribe(self, conn: StratumConnection, params: list):
+        if conn.session is None:
+            session = None
+            if len(params) > 1 and params[1]:
+                session = self.sessions.resume(str(params[1]))
+            if session is not None:
+                self.resume_session(conn, session)
+            else:
+                session = self.sessions.open()
+            conn.session = session
+            conn.extranonce1 = session.extranonce1
+        conn.subscribed = True
+        subscription_id = conn.session.session_id
+        return [
+            [['mining.set_difficulty', subscription_id], ['mining.notify', subscription_id]],
+            conn.extranonce1,
+            self.extranonce2_size
+        ]
+
+    def resume_session(self, conn: StratumConnection, session):
+        """Carry difficulty, vardiff window and identity over from the miner's previous connection"""
+        conn.difficulty = session.difficulty
+        if session.vardiff is not None and self.vardiff is not None:
+            conn.vardiff = session.vardiff
+            self.vardiff.resume(conn.vardiff, time.monotonic())
+        if session.wallet:
+            # Shares still in flight from the old connection are credited as before;
+            # the miner's own mining.authorize follows and confirms or replaces this
+            conn.wallet = session.wallet
+            conn.worker = session.worker
+            conn.authorized = True
+
+    def handle_authorize(self, conn: StratumConnection, params: list):
+        username = str(params[0]) if params else ''
+        password = str(params[1]) if len(params) > 1 and params[1] is not None else ''
+        wallet, _, worker = username.partition('.')
+        if not _WALLET_RE.match(wallet):
+            raise StratumError(ERROR_UNAUTHORIZED, 'Username must be a Bitcoin address')
+        # The pool's config generator puts the worker name in the password field
+        if not worker:
+            worker = password if password and password.lower() not in ('x', 'd') else 'default'
+        conn.wallet = wallet
+        conn.worker = _CONTROL_RE.sub('', worker)[:64] or 'default'
+        conn.authorized = True
+        if self.vardiff and conn.vardiff is None:
+            conn.vardiff = self.vardiff.new_state(conn.difficulty)
+            conn.difficulty = conn.vardiff.difficulty
+        return True
+
+    def handle_configure(self, conn: StratumConnection, params: list):
+        extensions, options = params[0], params[1] if len(params) > 1 else {}
+        result = {}
+        for extension in extensions:
+            if extension == 'version-rolling':
+                requested = int(options.get('version-rolling.mask', 'ffffffff'), 16)
+                conn.version_mask = requested & VERSION_ROLLING_MASK
+                result['version-rolling'] = True
+                result['version-rolling.mask'] = f"{conn.version_mask:08x}"
+            else:
+                result[extension] = False
+        return result
+
+    def handle_suggest_difficulty(self, conn: StratumConnection, params: list):
+        difficulty = max(self.min_difficulty, float(params[0]))
+        if conn.vardiff is not None:
+            difficulty = self.vardiff.clamp(difficulty)
+            self.vardiff.set_difficulty(conn.vardiff, difficulty, time.monotonic())
+        if conn.subscribed:
+            conn.set_difficulty(difficulty)
+        else:
+            conn.difficulty = difficulty
+        return True
+
+    def queue_submit(self, conn: StratumConnection, msg_id, params: list):
+        """Check a submission's structure now and hash it with the current batch"""
+        try:
+            if not conn.subscribed:
+                raise StratumError(ERROR_NOT_SUBSCRIBED)
+            if not conn.authorized:
+                raise StratumError(ERROR_UNAUTHORIZED)
+            worker_name, job_id, extranonce2, ntime, nonce = (str(p) for p in params[:5])
+            version_bits = str(params[5]) if len(params) > 5 else None
+            share = self.check_share(conn, job_id, extranonce2, ntime, nonce, version_bits)
+        except (ValueError, TypeError) as e:
+            self.reject(conn, msg_id, StratumError(ERROR_OTHER, f"Invalid params: {e}"))
+            return
+        except StratumError as e:
+            self.reject(conn, msg_id, e)
+            return
+
+        self._pending_submits.append((conn, msg_id, share, self.jobs[job_id].prepared))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush_submits)
+
+    def flush_submits(self):
+        """Validate every queued submission in one batch and answer each miner"""
+        batch, self._pending_submits = self._pending_submits, []
+        self._flush_scheduled = False
+        if not batch:
+            return
+        target_for = self.validator.target_for
+        results = self.validator.validate_batch([
+            (prepared, share.extranonce1, share.extranonce2, share.ntime, share.nonce,
+             share.version_bits, share.version_mask, target_for(share.difficulty))
+            for conn, msg_id, share, prepared in batch
+        ])
+        self.stats['batches'] += 1
+
+        candidates = False
+        for (conn, msg_id, share, prepared), result in zip(batch, results):
+            if result.is_block:
+                candidates = True
+                share.hash = result.hash_hex
+                share.is_block = True
+                share.block = (result.header, result.coinbase)
+                self.stats['blocks'] += 1
+                logger.warning(f"Block candidate {share.hash} from {share.wallet}.{share.worker}")
+                if self.block_submitter is not None:
+                    self.block_submitter.submit(share)
+        if candidates:
+            # Let the submitblock requests reach the wire before replies and accounting
+            asyncio.get_running_loop().call_soon(self.finish_batch, batch, results)
+        else:
+            self.finish_batch(batch, results)
+
+    def finish_batch(self, batch: list, results: list):
+        for (conn, msg_id, share, prepared), result in zip(batch, results):
+            share.hash = result.hash_hex
+            share.actual_difficulty = result.difficulty
+            if not result.is_block and not result.valid:
+                self.reject(conn, msg_id, StratumError(ERROR_LOW_DIFFICULTY))
+                continue
+            self.accept(conn, msg_id, share)
+
+    def accept(self, conn: StratumConnection, msg_id, share: Share):
+        conn.accepted += 1
+        self.stats['accepted'] += 1
+        conn.reply(msg_id, True)
+        for callback in self.share_callbacks:
+            try:
+                callback(share)
+            except Exception as e:
+                logger.error(f"Share callback failed: {e}")
+        if conn.vardiff is not None:
+            difficulty = self.vardiff.record_share(conn.vardiff, time.monotonic())
+            if difficulty is not None:
+                conn.set_difficulty(difficulty)
+
+    def reject(self, conn: StratumConnection, msg_id, error: StratumError):
+        conn.rejected += 1
+        self.stats['rejected'] += 1
+        conn.reply(msg_id, None, error)
+
+    def check_share(self, conn: StratumConnection, job_id: str, extranonce2: str, ntime: str,
+                    nonce: str, version_bits: Optional[str]) -> Share:
+        """Structural checks on a submission; raises StratumError to reject it"""
+        if job_id not in self.jobs:
+            raise StratumError(ERROR_JOB_NOT_FOUND)
+        if len(extranonce2) != self.extranonce2_size * 2 or len(ntime) != 8 or len(nonce) != 8:
+            raise StratumError(ERROR_OTHER, 'Invalid field length')
+        if not _HEX_RE.match(extranonce2 + ntime + nonce + (version_bits or '')):
+            raise StratumError(ERROR_OTHER, 'Invalid hex')
+        if version_bits is not None and int(version_bits, 16) & ~conn.version_mask:
+            raise StratumError(ERROR_OTHER, 'Version bits outside negotiated mask')
+        share_time = int(ntime, 16)
+        if share_time < int(self.jobs[job_id].ntime, 16) or share_time > time.time() + MAX_NTIME_DRIFT:
+            raise StratumError(ERROR_OTHER, 'ntime out of range')
+        version = header_version(self.jobs[job_id].prepared.version, version_bits, conn.version_mask)
+        if not self.duplicates.add(job_id, conn.extranonce1, extranonce2.lower(), ntime.lower(), nonce.lower(),
+                                   version):
+            raise StratumError(ERROR_DUPLICATE)
+        difficulty = conn.difficulty
+        if conn.vardiff is not None:
+            # Shares still in flight at the old difficulty count right after a retarget
+            difficulty = self.vardiff.credited_difficulty(conn.vardiff, time.monotonic())
+        return Share(conn.wallet, conn.worker, job_id, conn.extranonce1, extranonce2,
+                     ntime, nonce, version_bits, conn.version_mask, difficulty, conn.last_activity)
+
+    def after_request(self, conn: StratumConnection, method: str):
+        """Follow-up notifications once a request has been answered"""
+        if method == 'mining.authorize' and conn.subscribed:
+            conn.set_difficulty(conn.difficulty)
+            if self.current_job:
+                conn.write(self.current_job.notify_line(clean_jobs=True))
+            self._worker_status(conn, 'online')
+
+    def worker_disconnected(self, conn: StratumConnection):
+        self._worker_status(conn, 'offline')
+
+    def _worker_status(self, conn: StratumConnection, status: str):
+        for callback in self.worker_callbacks:
+            try:
+                callback(conn.wallet, conn.worker, status)
+            except Exception as e:
+                logger.error(f"Worker status callback failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(
+            self.stats,
+            connections=len(self.connections),
+            authorized=sum(1 for conn in self.connections if conn.authorized),
+            current_job=self.current_job.job_id if self.current_job else None,
+            validator={'validated': self.validator.validated, 'cache_hits': self.validator.cache_hits},
+            vardiff_retargets=self.vardiff.retargets if self.vardiff else 0,
+            duplicates=self.duplicates.get_stats(),
+            sessions=self.sessions.get_stats(),
+            block_submitter=self.block_submitter.get_stats() if self.block_submitter else None,
+            spool=self.spool.get_stats() if self.spool else None,
+            intake_paused=self.intake_paused,
+            port=self.port
+        )
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(StratumServer(port=int(os.environ.get('STRATUM_PORT', 3333))).start())
@@ -0,0 +1,344 @@
+"""
+BLGV BTC Mining Pool - Stratum V2 Framing
+Binary SV2 frames and Mining Protocol messages, parsed in place from memoryviews
+
+A frame is a 6-byte header (extension_type U16 with the channel_msg bit,
+msg_type U8, msg_length U24, all little-endian) followed by the payload.
+Message classes declare their fields in spec order and are tuples of their
+values; consecutive fixed-size fields are compiled into a single
+struct.Struct, so decoding SubmitSharesStandard is one unpack_from call. U256,
+B0_x and STR0_255 fields are returned as memoryview slices of the receive
+buffer rather than copies: a handler that keeps one past the current read must
+copy it (bytes(view)).
+
+FrameReader is the receive side for an asyncio.BufferedProtocol: the event
+loop reads straight into its fixed buffer, frames are decoded where they
+landed, and only a trailing partial frame is moved to the front.
+"""
+
+import struct
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+HEADER = struct.Struct('<HBHB')  # extension_type, msg_type, msg_length as U16 low + U8 high
+HEADER_SIZE = HEADER.size
+CHANNEL_MSG_BIT = 0x8000
+MAX_PAYLOAD = 0xffffff
+
+# Mining Protocol message types
+SETUP_CONNECTION = 0x00
+SETUP_CONNECTION_SUCCESS = 0x01
+SETUP_CONNECTION_ERROR = 0x02
+OPEN_STANDARD_MINING_CHANNEL = 0x10
+OPEN_STANDARD_MINING_CHANNEL_SUCCESS = 0x11
+OPEN_MINING_CHANNEL_ERROR = 0x12
+NEW_MINING_JOB = 0x15
+SUBMIT_SHARES_STANDARD = 0x1a
+SUBMIT_SHARES_SUCCESS = 0x1c
+SUBMIT_SHARES_ERROR = 0x1d
+SET_NEW_PREV_HASH = 0x20
+SET_TARGET = 0x21
+
+PROTOCOL_MINING = 0
+
+_FIXED = {'U8': 'B', 'BOOL': '?', 'U16': 'H', 'U32': 'I', 'F32': 'f', 'U64': 'Q'}
+_LENGTH_PREFIX = {'U256': 0, 'B0_32': 1, 'B0_255': 1, 'STR0_255': 1, 'B0_64K': 2}
+_MAX_LENGTH = {'B0_32': 32, 'B0_255': 255, 'STR0_255': 255, 'B0_64K': 0xffff}
+
+
+class Sv2Error(ValueError):
+    """Malformed frame or payload"""
+
+
+def _compile(fields: Tuple[Tuple[str, str], ...]) -> List[Tuple[str, Any]]:
+    """Turn a field list into steps: ('fixed', Struct, count) runs and single variable fields"""
+    steps, run = [], ''
+    for _, kind in fields:
+        if kind in _FIXED:
+            run += _FIXED[kind]
+            continue
+        if run:
+            steps.append(('fixed', struct.Struct('<' + run), len(run)))
+            run = ''
+        if kind not in _LENGTH_PREFIX and kind != 'OPTION_U32':
+            raise TypeError(f"Unknown SV2 field type {kind}")
+        steps.append((kind, None, 1))
+    if run:
+        steps.append(('fixed', struct.Struct('<' + run), len(run)))
+    return steps
+
+
+class Sv2Message(tuple):
+    """Base for SV2 messages: a tuple of the FIELDS values, in order, with named access
+
+    Subclasses set MSG_TYPE, CHANNEL_MSG and FIELDS. Messages made only of
+    fixed-size fields decode with one unpack_from straight into the tuple and
+    encode behind a precomputed header.
+    """
+
+    __slots__ = ()
+    MSG_TYPE = -1
+    CHANNEL_MSG = False
+    FIELDS: Tuple[Tuple[str, str], ...] = ()
+    _steps: List[Tuple[str, Any, int]] = []
+    _fixed_only: Optional[struct.Struct] = None
+    _fixed_header = b''
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._steps = _compile(cls.FIELDS)
+        for index, (name, _) in enumerate(cls.FIELDS):
+            setattr(cls, name, property(itemgetter(index)))
+        if len(cls._steps) == 1 and cls._steps[0][0] == 'fixed':
+            cls._fixed_only = cls._steps[0][1]
+            cls._fixed_header = encode_header(cls.MSG_TYPE, cls._fixed_only.size, cls.CHANNEL_MSG)
+        MESSAGES[cls.MSG_TYPE] = cls
+
+    def __new__(cls, *values):
+        if len(values) != len(cls.FIELDS):
+            raise TypeError(f"{cls.__name__} takes {len(cls.FIELDS)} fields, got {len(values)}")
+        return tuple.__new__(cls, values)
+
+    @classmethod
+    def decode(cls, payload: memoryview) -> 'Sv2Message':
+        fixed = cls._fixed_only
+        if fixed is not None:
+            try:
+                return tuple.__new__(cls, fixed.unpack_from(payload))
+            except struct.error:
+                raise Sv2Error(f"{cls.__name__} payload too short")
+
+        values = []
+        offset = 0
+        try:
+            for kind, packer, count in cls._steps:
+                if kind == 'fixed':
+                    values += packer.unpack_from(payload, offset)
+                    offset += packer.size
+                    continue
+                if kind == 'U256':
+                    value, offset = payload[offset:offset + 32], offset + 32
+                elif kind == 'OPTION_U32':
+                    if payload[offset]:
+                        value, offset = struct.unpack_from('<I', payload, offset + 1)[0], offset + 5
+                    else:
+                        value, offset = None, offset + 1
+                else:
+                    prefix = _LENGTH_PREFIX[kind]
+                    if prefix == 1:
+                        length = payload[offset]
+                    else:
+                        length = payload[offset] | payload[offset + 1] << 8
+                    if length > _MAX_LENGTH[kind]:
+                        raise Sv2Error(f"{cls.__name__}: {kind} field of {length} bytes")
+                    offset += prefix
+                    value, offset = payload[offset:offset + length], offset + length
+                if offset > len(payload):
+                    raise Sv2Error(f"{cls.__name__} payload too short")
+                values.append(value)
+        except (IndexError, struct.error):
+            raise Sv2Error(f"{cls.__name__} payload too short")
+        return tuple.__new__(cls, values)
+
+    def encode_payload(self) -> bytes:
+        if self._fixed_only is not None:
+            return self._fixed_only.pack(*self)
+        parts = []
+        values = iter(self)
+        for kind, packer, count in self._steps:
+            if kind == 'fixed':
+                parts.append(packer.pack(*(next(values) for _ in range(count))))
+                continue
+            value = next(values)
+            if kind == 'OPTION_U32':
+                parts.append(b'\x00' if value is None else struct.pack('<BI', 1, value))
+                continue
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            if kind == 'U256':
+                if len(value) != 32:
+                    raise Sv2Error(f"{type(self).__name__}: U256 field must be 32 bytes")
+                parts.append(value)
+                continue
+            if len(value) > _MAX_LENGTH[kind]:
+                raise Sv2Error(f"{type(self).__name__}: {kind} field of {len(value)} bytes")
+            parts.append(len(value).to_bytes(_LENGTH_PREFIX[kind], 'little'))
+            parts.append(value)
+        return b''.join(parts)
+
+    def encode(self) -> bytes:
+        """Complete frame: header and payload"""
+        if self._fixed_only is not None:
+            return self._fixed_header + self._fixed_only.pack(*self)
+        payload = self.encode_payload()
+        return encode_header(self.MSG_TYPE, len(payload), self.CHANNEL_MSG) + payload
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f"{name}={value!r}" for (name, _), value in zip(self.FIELDS, self))
+        return f"{type(self).__name__}({fields})"
+
+
+MESSAGES: Dict[int, type] = {}
+
+
+def encode_header(msg_type: int, length: int, channel_msg: bool = False, extension: int = 0) -> bytes:
+    if length > MAX_PAYLOAD:
+        raise Sv2Error(f"payload of {length} bytes does not fit a frame")
+    return HEADER.pack(extension | (CHANNEL_MSG_BIT if channel_msg else 0), msg_type,
+                       length & 0xffff, length >> 16)
+
+
+def iter_frames(view: memoryview) -> Iterator[Tuple[int, int, memoryview]]:
+    """(extension_type, msg_type, payload) for each complete frame; stops at a partial one"""
+    offset = 0
+    end = len(view)
+    unpack = HEADER.unpack_from
+    while end - offset >= HEADER_SIZE:
+        extension, msg_type, low, high = unpack(view, offset)
+        start = offset + HEADER_SIZE
+        stop = start + (low | high << 16)
+        if stop > end:
+            return
+        yield extension, msg_type, view[start:stop]
+        offset = stop
+
+
+def decode_message(msg_type: int, payload: memoryview) -> Sv2Message:
+    cls = MESSAGES.get(msg_type)
+    if cls is None:
+        raise Sv2Error(f"Unsupported message type 0x{msg_type:02x}")
+    return cls.decode(payload)
+
+
+class FrameReader:
+    """Receive buffer for asyncio.BufferedProtocol; frames are decoded where they were read"""
+
+    __slots__ = ('buffer', 'view', 'filled')
+
+    def __init__(self, size: int = 65536):
+        self.buffer = bytearray(size)
+        self.view = memoryview(self.buffer)
+        self.filled = 0
+
+    def get_buffer(self) -> memoryview:
+        """BufferedProtocol.get_buffer: the free tail of the buffer"""
+        if self.filled == len(self.buffer):
+            raise Sv2Error(f"frame larger than the {len(self.buffer)}-byte receive buffer")
+        return self.view[self.filled:]
+
+    def frames(self, nbytes: int) -> Iterator[Tuple[int, int, memoryview]]:
+        """BufferedProtocol.buffer_updated: yield each complete frame, then keep the partial one
+
+        Payload views point into the buffer and are only valid until iteration
+        finishes, when the trailing partial frame is moved to the front.
+        """
+        self.filled += nbytes
+        view = self.view
+        unpack = HEADER.unpack_from
+        offset = 0
+        try:
+            while self.filled - offset >= HEADER_SIZE:
+                extension, msg_type, low, high = unpack(view, offset)
+                start = offset + HEADER_SIZE
+                stop = start + (low | high << 16)
+                if stop > self.filled:
+                    if stop - offset > len(self.buffer):
+                        raise Sv2Error(f"frame of {stop - offset} bytes exceeds the receive buffer")
+                    break
+                offset = stop
+                yield extension, msg_type, view[start:stop]
+        finally:
+            remaining = self.filled - offset
+            if offset and remaining:
+                view[:remaining] = view[offset:self.filled]
+            self.filled = remaining
+
+
+# -- common messages
+
+class SetupConnection(Sv2Message):
+    MSG_TYPE = SETUP_CONNECTION
+    FIELDS = (('protocol', 'U8'), ('min_version', 'U16'), ('max_version', 'U16'), ('flags', 'U32'),
+              ('endpoint_host', 'STR0_255'), ('endpoint_port', 'U16'), ('vendor', 'STR0_255'),
+              ('hardware_version', 'STR0_255'), ('firmware', 'STR0_255'), ('device_id', 'STR0_255'))
+    __slots__ = ()
+
+
+class SetupConnectionSuccess(Sv2Message):
+    MSG_TYPE = SETUP_CONNECTION_SUCCESS
+    FIELDS = (('used_version', 'U16'), ('flags', 'U32'))
+    __slots__ = ()
+
+
+class SetupConnectionError(Sv2Message):
+    MSG_TYPE = SETUP_CONNECTION_ERROR
+    FIELDS = (('flags', 'U32'), ('error_code', 'STR0_255'))
+    __slots__ = ()
+
+
+# -- mining protocol
+
+class OpenStandardMiningChannel(Sv2Message):
+    MSG_TYPE = OPEN_STANDARD_MINING_CHANNEL
+    FIELDS = (('request_id', 'U32'), ('user_identity', 'STR0_255'), ('nominal_hash_rate', 'F32'),
+              ('max_target', 'U256'))
+    __slots__ = ()
+
+
+class OpenStandardMiningChannelSuccess(Sv2Message):
+    MSG_TYPE = OPEN_STANDARD_MINING_CHANNEL_SUCCESS
+    FIELDS = (('request_id', 'U32'), ('channel_id', 'U32'), ('target', 'U256'),
+              ('extranonce_prefix', 'B0_32'), ('group_channel_id', 'U32'))
+    __slots__ = ()
+
+
+class OpenMiningChannelError(Sv2Message):
+    MSG_TYPE = OPEN_MINING_CHANNEL_ERROR
+    FIELDS = (('request_id', 'U32'), ('error_code', 'STR0_255'))
+    __slots__ = ()
+
+
+class NewMiningJob(Sv2Message):
+    MSG_TYPE = NEW_MINING_JOB
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('job_id', 'U32'), ('min_ntime', 'OPTION_U32'), ('version', 'U32'),
+              ('merkle_root', 'B0_32'))
+    __slots__ = ()
+
+
+class SetNewPrevHash(Sv2Message):
+    MSG_TYPE = SET_NEW_PREV_HASH
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('job_id', 'U32'), ('prev_hash', 'U256'), ('min_ntime', 'U32'),
+              ('nbits', 'U32'))
+    __slots__ = ()
+
+
+class SetTarget(Sv2Message):
+    MSG_TYPE = SET_TARGET
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('maximum_target', 'U256'))
+    __slots__ = ()
+
+
+class SubmitSharesStandard(Sv2Message):
+    MSG_TYPE = SUBMIT_SHARES_STANDARD
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('sequence_number', 'U32'), ('job_id', 'U32'), ('nonce', 'U32'),
+              ('ntime', 'U32'), ('version', 'U32'))
+    __slots__ = ()
+
+
+class SubmitSharesSuccess(Sv2Message):
+    MSG_TYPE = SUBMIT_SHARES_SUCCESS
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('last_sequence_number', 'U32'), ('new_submits_accepted_count', 'U32'),
+              ('new_shares_sum', 'U64'))
+    __slots__ = ()
+
+
+class SubmitSharesError(Sv2Message):
+    MSG_TYPE = SUBMIT_SHARES_ERROR
+    CHANNEL_MSG = True
+    FIELDS = (('channel_id', 'U32'), ('sequence_number', 'U32'), ('error_code', 'STR0_255'))
+    __slots__ = ()
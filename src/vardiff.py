@@ -0,0 +1,136 @@
+"""
+BLGV BTC Mining Pool - Variable Difficulty
+Per-connection difficulty retargeting toward a configured share rate
+
+Each connection keeps its last `window` accepted-share timestamps in a fixed
+array('d') ring (a few hundred bytes per miner). Hysteresis is two-level: a
+partly filled window only triggers a retarget when the rate is off by more
+than coarse_factor (fast convergence after connect), while fine corrections
+are evaluated once per `window` fresh shares and need the rate outside +/-
+variance (at least two standard deviations of the window's Poisson noise),
+which keeps a steady miner from flapping. Steps are bounded by max_step, so a 0.5 TH/s
+Bitaxe and a 200 TH/s S21 both settle at the same shares per minute.
+"""
+
+import math
+import time
+from array import array
+from typing import Optional
+
+
+class VardiffState:
+    """Sliding window of share timestamps for one connection"""
+
+    __slots__ = ('difficulty', 'previous_difficulty', 'changed_at', 'ring', 'head', 'count',
+                 'since_check', 'window_start', 'last_share')
+
+    def __init__(self, difficulty: float, window: int, now: float):
+        self.difficulty = difficulty
+        self.previous_difficulty = difficulty
+        self.changed_at = now
+        self.ring = array('d', bytes(8 * window))
+        self.head = 0
+        self.count = 0
+        self.since_check = 0
+        self.window_start = now
+        self.last_share = now
+
+    def record(self, now: float):
+        self.ring[self.head] = now
+        self.head = (self.head + 1) % len(self.ring)
+        if self.count < len(self.ring):
+            self.count += 1
+        self.since_check += 1
+        self.last_share = now
+
+    def reset(self, now: float):
+        self.head = 0
+        self.count = 0
+        self.since_check = 0
+        self.window_start = now
+
+    def observed_rate(self, now: float) -> float:
+        """Accepted shares per second over the window"""
+        if self.count == len(self.ring):
+            start = self.ring[self.head]  # oldest entry, next to be overwritten
+        else:
+            start = self.window_start
+        return self.count / max(now - start, 1e-3)
+
+
+class VardiffController:
+    """Retargeting policy shared by every connection of a server"""
+
+    def __init__(self, shares_per_minute: float = 12.0, retarget_interval: float = 30.0,
+                 variance: float = 0.3, coarse_factor: float = 2.0, max_step: float = 4.0, window: int = 32,
+                 min_difficulty: float = 1.0, max_difficulty: float = 2 ** 40, grace: float = 15.0):
+        self.target_rate = shares_per_minute / 60.0
+        self.retarget_interval = retarget_interval
+        self.variance = max(variance, 2 / math.sqrt(window))
+        self.coarse_factor = coarse_factor
+        self.max_step = max_step
+        self.window = window
+        self.min_difficulty = min_difficulty
+        self.max_difficulty = max_difficulty
+        self.grace = grace
+        self.retargets = 0
+
+    def new_state(self, difficulty: float, now: Optional[float] = None) -> VardiffState:
+        return VardiffState(self.clamp(difficulty), self.window, time.monotonic() if now is None else now)
+
+    def clamp(self, difficulty: float) -> float:
+        difficulty = min(max(difficulty, self.min_difficulty), self.max_difficulty)
+        # Integer difficulties where possible: ESP-Miner (Bitaxe) parses them as uint32
+        return float(round(difficulty)) if difficulty >= 1 else difficulty
+
+    def credited_difficulty(self, state: VardiffState, now: float) -> float:
+        """Difficulty a share must meet; the lower of old and new right after a change"""
+        if now - state.changed_at < self.grace:
+            return min(state.difficulty, state.previous_difficulty)
+        return state.difficulty
+
+    def record_share(self, state: VardiffState, now: float) -> Optional[float]:
+        """Count an accepted share; returns the new difficulty if a retarget is due"""
+        state.record(now)
+        elapsed = now - state.changed_at
+        if state.count < len(state.ring):
+            if elapsed < self.retarget_interval or state.count < 8:
+                return None  # quiet miners are handled by check_idle
+            ratio = state.observed_rate(now) / self.target_rate
+            if 1 / self.coarse_factor <= ratio <= self.coarse_factor:
+                return None  # wait for a full window before fine-tuning
+            return self._retarget(state, ratio, now)
+        if elapsed < self.retarget_interval / 4 or state.since_check < len(state.ring):
+            return None
+        state.since_check = 0
+        return self._retarget(state, state.observed_rate(now) / self.target_rate, now)
+
+    def check_idle(self, state: VardiffState, now: float) -> Optional[float]:
+        """Lower difficulty for a miner that has gone quiet (no shares to drive record_share)"""
+        idle = now - max(state.last_share, state.changed_at)
+        if idle < max(self.retarget_interval, 3.0 / self.target_rate):
+            return None
+        # At most one share could have arrived in `idle` seconds; treat that as the rate
+        return self._retarget(state, 1.0 / idle / self.target_rate, now)
+
+    def _retarget(self, state: VardiffState, ratio: float, now: float) -> Optional[float]:
+        if 1 - self.variance <= ratio <= 1 + self.variance:
+            return None
+        ratio = min(max(ratio, 1 / self.max_step), self.max_step)
+        difficulty = self.clamp(state.difficulty * ratio)
+        if difficulty == state.difficulty:
+            return None
+        self.set_difficulty(state, difficulty, now)
+        self.retargets += 1
+        return difficulty
+
+    def resume(self, state: VardiffState, now: float):
+        """Restart the rate window after a reconnect, keeping the difficulty"""
+        state.reset(now)
+        state.last_share = now
+
+    def set_difficulty(self, state: VardiffState, difficulty: float, now: float):
+        state.previous_difficulty = state.difficulty
+        state.difficulty = difficulty
+        state.changed_at = now
+        state.reset(now)
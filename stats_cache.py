@@ -0,0 +1,163 @@
+"""
+BLGV BTC Mining Pool - Stats Snapshot Cache
+Single-flight TTL cache with stale-while-revalidate for pool statistics
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RenderedBody:
+    """JSON body serialized once per snapshot, with its validators"""
+
+    __slots__ = ('payload', 'body', 'etag', 'last_modified')
+
+    def __init__(self, payload: Dict[str, Any], last_modified: datetime):
+        self.payload = payload
+        # Same encoding as Flask's jsonify in production (compact, sorted keys)
+        self.body = json.dumps(payload, separators=(',', ':'), sort_keys=True, default=str).encode('utf-8')
+        self.etag = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+        self.last_modified = last_modified
+
+
+class StatsSnapshot:
+    """Result of one stats computation plus its pre-rendered response bodies"""
+
+    __slots__ = ('data', 'version', 'computed_at', 'created_at', 'rendered')
+
+    def __init__(self, data: Dict[str, Any], version: int):
+        self.data = data
+        self.version = version
+        self.computed_at = time.monotonic()
+        self.created_at = datetime.utcnow().replace(microsecond=0)
+        self.rendered: Dict[str, RenderedBody] = {}
+
+    def age(self) -> float:
+        return time.monotonic() - self.computed_at
+
+
+class SnapshotCache:
+    """Caches one computed snapshot shared by every caller
+
+    Fresh snapshots (younger than ttl) are returned as-is. Snapshots younger
+    than stale_ttl are returned immediately while one background refresh runs.
+    Older or missing snapshots block callers on a single shared computation, so
+    N concurrent misses cost exactly one call to compute().
+
+    Each renderer turns a snapshot into a response payload that is serialized
+    once when the snapshot changes; a recomputation yielding identical data
+    keeps the previous snapshot, so its bodies and ETags stay valid.
+    """
+
+    def __init__(self, compute: Callable[[], Dict[str, Any]], ttl: float = 5.0,
+                 stale_ttl: float = 60.0, name: str = 'stats',
+                 renderers: Optional[Dict[str, Callable[['StatsSnapshot'], Dict[str, Any]]]] = None):
+        self.compute = compute
+        self.renderers = renderers or {}
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._snapshot: Optional[StatsSnapshot] = None
+        self._refreshing = False
+        self._last_error: Optional[Exception] = None
+        self._version = 0
+        self.computations = 0
+
+    def _refresh(self):
+        """Run compute() once and publish the result to all waiters"""
+        previous = self._snapshot
+        snapshot = None
+        try:
+            data = self.compute()
+            if previous is None or data != previous.data:
+                snapshot = StatsSnapshot(data, self._version + 1)
+                for name, render in self.renderers.items():
+                    snapshot.rendered[name] = RenderedBody(render(snapshot), snapshot.created_at)
+            error = None
+        except Exception as e:
+            error = e
+            logger.error(f"{self.name} snapshot computation failed: {e}")
+
+        with self._lock:
+            self.computations += 1
+            if error is None:
+                if snapshot is None:
+                    # Unchanged data: keep bodies and validators, just renew the TTL
+                    previous.computed_at = time.monotonic()
+                    snapshot = previous
+                self._version = snapshot.version
+                self._snapshot = snapshot
+            self._last_error = error
+            self._refreshing = False
+            self._done.notify_all()
+
+    def _start_background_refresh(self):
+        threading.Thread(target=self._refresh, name=f'{self.name}-refresh', daemon=True).start()
+
+    def get(self, timeout: Optional[float] = 10.0) -> StatsSnapshot:
+        """Return the current snapshot, recomputing at most once per expiry"""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None:
+                age = snapshot.age()
+                if age < self.ttl:
+                    return snapshot
+                if age < self.stale_ttl:
+                    if not self._refreshing:
+                        self._refreshing = True
+                        self._start_background_refresh()
+                    return snapshot
+
+            leader = not self._refreshing
+            if leader:
+                self._refreshing = True
+            else:
+                self._done.wait_for(lambda: not self._refreshing, timeout)
+                if self._snapshot is not None and self._snapshot is not snapshot:
+                    return self._snapshot
+
+        if leader:
+            self._refresh()
+
+        with self._lock:
+            if self._snapshot is not None:
+                # Fall back to an expired snapshot rather than failing outright
+                return self._snapshot
+            raise RuntimeError(f"{self.name} snapshot unavailable: {self._last_error}")
+
+    def renderer(self, name: str):
+        """Decorator registering a payload renderer under the given name"""
+        def decorator(render: Callable[['StatsSnapshot'], Dict[str, Any]]):
+            self.renderers[name] = render
+            return render
+        return decorator
+
+    def get_rendered(self, name: str) -> RenderedBody:
+        """Return the pre-serialized body for one renderer"""
+        return self.get().rendered[name]
+
+    def invalidate(self):
+        """Force the next get() to recompute synchronously"""
+        with self._lock:
+            self._snapshot = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'version': self._version,
+                'computations': self.computations,
+                'age': round(self._snapshot.age(), 3) if self._snapshot else None,
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'last_error': str(self._last_error) if self._last_error else None
+            }